@@ -0,0 +1,2681 @@
+// Set from python qt ui, see blackboard_config()
+var visible = ts_config.start_visible;
+var perfectFreehand = ts_config.perfect_freehand;
+var pressureSensitivity = ts_config.pressure_sensitivity;
+var small_canvas = ts_config.small_canvas;
+var fullscreen_follow = ts_config.follow;
+var calligraphy = ts_config.calligraphy;
+var strokeDelete = false;
+var textWriting = false;
+var isDeleting = false;  // Track if currently deleting (for hold mode)
+var penStyles = ts_config.pen_colors.map((color, i) =>
+    build_pen_style(color, ts_config.pen_widths[i], ts_config.pen_opacities[i]));
+var fontFamily = ts_config.font_family;
+var fontSize = ts_config.font_size;
+var fontBold = ts_config.font_bold;
+var fontItalic = ts_config.font_italic;
+var activePenIndex = ts_config.default_pen_index;
+var undoableClears = ts_config.undoable_clears;
+var predictInk = ts_config.predicted_ink;
+var predictionLookahead = ts_config.predicted_ink_lookahead_ms;
+var measurePrediction = ts_config.predicted_ink_measure;
+var useTiles = ts_config.tiled_canvas;
+var lowLatencyInk = ts_config.low_latency;
+var useRenderWorker = ts_config.render_worker;
+var canvasMemoryBudget = ts_config.canvas_memory_mb * 1024 * 1024;
+var committedLayerScale = ts_config.committed_layer_scale;
+
+// Counters shown by the "Show drawing diagnostics" menu entry
+var ts_stats = {
+    frames: 0, // animation frames the renderer woke up for
+    idle_frames: 0, // frames which found nothing to draw
+    full_redraws: 0,
+    region_redraws: 0,
+    replayed_actions: 0, // actions drawn by the last redraw
+    checkpoint_restores: 0,
+    checkpoint_count: 0,
+    checkpoint_bytes: 0,
+    samples_per_frame: 0, // pointer samples the last preview frame drew
+    max_samples_per_frame: 0,
+    coalesced_events: 0, // pointermove events which carried more than one sample
+    dispatch_move_ns: 0, // per event, measured by ts_benchmark_dispatch()
+    dispatch_idle_ns: 0,
+    dispatch_tool_lookup_ns: 0,
+    predictions: 0, // predicted positions checked against the real ones (predicted_ink_measure)
+    prediction_mean_error: 0, // px
+    prediction_max_error: 0,
+    tile_count: 0, // tiles holding the strokes in full card mode
+    tile_bytes: 0,
+    stale_tiles: 0, // tiles freed outside the viewport, drawn again when scrolled back into view
+    canvas_mode: '', // full, follow or small
+    device_pixel_ratio: 1,
+    committed_scale: 1, // backing store pixels per css pixel of the committed strokes
+    preview_scale: 1, // and of the secondary canvas
+    canvas_bytes: 0, // backing stores of the main and secondary canvas, tiles not included
+    canvas_over_budget: false, // even the lowest scale doesn't fit in canvas_memory_mb
+    low_latency: false, // the live ink canvas has a desynchronized context
+    ink_latency_samples: 0, // frames measured by the latency probe
+    ink_input_to_draw_ms: 0, // mean, from the pointer event to the preview being drawn
+    ink_input_to_frame_ms: 0, // mean, from the pointer event to the frame after the one it was drawn in
+    ink_max_input_to_frame_ms: 0,
+    render_worker: false, // the committed strokes are drawn by RenderWorker.js
+    worker_render_ms: 0, // time the worker took for the last render
+    fit_queue: 0, // calligraphy strokes waiting for their curves
+    fit_ms: 0, // time the worker took for the last fit
+    geometry_hits: 0, // actions drawn with their cached paths
+    geometry_misses: 0, // and those whose paths had to be built
+    geometry_entries: 0,
+    geometry_bytes: 0, // estimated
+};
+
+function ts_diagnostics() {
+    var points = 0, bytes = 0;
+    lineHistory.forEach(action => {
+        if (!action.points || !action.points.data) return;
+        points += action.points.length;
+        bytes += action.points.data.byteLength;
+    });
+    ts_stats.stored_points = points;
+    ts_stats.point_bytes = bytes;
+    // what the same points took as one small array each: ~32 byte array + 16 byte backing store
+    // + 8 per number, and 8 for its slot in the list of points
+    ts_stats.point_bytes_as_arrays = lineHistory.reduce((sum, action) =>
+        sum + (action.points && action.points.data ? action.points.length * (56 + 8 * action.points.stride) : 0), 0);
+    return ts_stats;
+}
+
+function forceShowCanvas() {
+    if (visible === false) { // Only change if it's currently false
+        visible = true;
+        canvas.style.display='block';
+        secondary_canvas.style.display='block';
+        tileLayer.style.display = tiledCanvas ? 'block' : 'none';
+        if (ts_visibility_button) ts_visibility_button.className = 'active';
+        if (optionBar) optionBar.className = '';
+    }
+}
+
+function forceHideCanvas() {
+    if (visible === true) { // Only change if it's currently true
+        visible = false;
+        canvas.style.display='none';
+        secondary_canvas.style.display='none';
+        tileLayer.style.display = 'none';
+        if (ts_visibility_button) ts_visibility_button.className = '';
+        if (optionBar) optionBar.className = 'touch_disable';
+    }
+}
+
+// Everything drawing needs from a pen, worked out once when the pen changes:
+// color is the picked hex color, rgba includes the pen opacity, opaque is the
+// same color at full alpha (strokes are drawn opaque and the opacity is applied
+// to the whole canvas) and canvasOpacity is the opacity as a style value.
+function build_pen_style(color, width, opacity) {
+    return {
+        color: color,
+        rgba: hexToRgba(color, opacity),
+        opaque: hexToRgba(color, 1),
+        canvasOpacity: String(opacity),
+        width: Number(width),
+        opacity: Number(opacity),
+    };
+}
+
+// Called from python when a pen is changed in the menu, changes holds color, width and/or opacity
+function set_pen_style(index, changes) {
+    var pen = penStyles[index];
+    if (!pen) {
+        console.error("error too large index for pen selection")
+        return;
+    }
+    penStyles[index] = build_pen_style(
+        changes.color !== undefined ? changes.color : pen.color,
+        changes.width !== undefined ? changes.width : pen.width,
+        changes.opacity !== undefined ? changes.opacity : pen.opacity);
+    update_pen_settings();
+}
+
+// Helper function to convert hex color to RGBA with opacity
+function hexToRgba(hex, opacity) {
+    // Remove the hash if present
+    hex = hex.replace(/^#/, '');
+    
+    // Parse the hex values
+    let r, g, b;
+    if (hex.length === 3) {
+        r = parseInt(hex[0] + hex[0], 16);
+        g = parseInt(hex[1] + hex[1], 16);
+        b = parseInt(hex[2] + hex[2], 16);
+    } else if (hex.length === 6 || hex.length === 8) {
+        r = parseInt(hex.substring(0, 2), 16);
+        g = parseInt(hex.substring(2, 4), 16);
+        b = parseInt(hex.substring(4, 6), 16);
+    } else {
+        return hex; // Return as-is if not a valid hex color
+    }
+    
+    return `rgba(${r}, ${g}, ${b}, ${opacity})`;
+}
+
+// HTML references
+var canvas = document.getElementById('main_canvas');
+var wrapper = document.getElementById('canvas_wrapper');
+var textBox = document.getElementById('AnkiDrawTextBox');
+var optionBar = document.getElementById('pencil_button_bar');
+var ts_undo_button = document.getElementById('ts_undo_button');
+var ts_redo_button = document.getElementById('ts_redo_button');
+var renderWorker = null;// started by resize(), see sync_render_worker()
+var ctx = (can_use_render_worker() ? document.createElement('canvas') : canvas).getContext('2d');
+var secondary_canvas = document.getElementById('secondary_canvas');
+var secondary_ctx = create_preview_context(lowLatencyInk);
+var tileLayer = document.getElementById('tile_layer');
+var ts_visibility_button = document.getElementById('ts_visibility_button');
+var ts_kanji_button = document.getElementById('ts_kanji_button');
+var ts_text_button = document.getElementById('ts_text_button');
+var ts_perfect_freehand_button = document.getElementById('ts_perfect_freehand_button');
+var ts_stroke_delete_button = document.getElementById('ts_stroke_delete_button');
+var ts_switch_fullscreen_button = document.getElementById('ts_switch_fullscreen_button');
+
+
+var ts_visibility_button_path1 = document.querySelector('#ts_visibility_button > svg > path');
+var ts_visibility_button_path2 = document.querySelector('#ts_visibility_button > svg > path:nth-child(2)');
+
+var ts_switch_pen1_button_path = document.querySelector('#ts_switch_pen1_button > svg > path');
+var ts_switch_pen2_button_path = document.querySelector('#ts_switch_pen2_button > svg > path');
+var ts_switch_pen3_button_path = document.querySelector('#ts_switch_pen3_button > svg > path');
+var ts_switch_pen4_button_path = document.querySelector('#ts_switch_pen4_button > svg > path');
+
+// Arrays to save point values from strokes
+if (!visible) {
+    canvas.style.display = 'none';
+    secondary_canvas.style.display = 'none';
+    
+    if (ts_visibility_button) {
+        ts_visibility_button.className = '';
+    }
+    
+    if (optionBar) {
+        optionBar.className = 'touch_disable';
+    }
+}
+var lineHistory = [ ] // contains history of currentAction Items, defined below
+var nextActionId = 0 // given to each action by add_action_to_history(), keys its cached paths
+var redoStack = [ ]
+var clearIndices = [ ] // positions of the clear ('X') actions in lineHistory, oldest first
+var lastClearIndex = -1 // drawing starts from here, everything before the last clear is hidden
+let textCursorVisible = true;
+let cursorBlinkInterval;
+
+// Current stroke in progress
+var currentAction = {
+    points: [],
+    color: '',
+    width: '',
+    opacity: '',
+    visible: true,
+    type: '', // 'simple' 'L', 'perfect' 'P', 'calligraphy' 'C', Delete 'D', Clear 'X'
+    deletedList: [] // used only for delete actions
+};
+var currentStroke = null; // incremental outline of the perfect freehand stroke in progress
+
+var index = 0;
+
+canvas.onselectstart = function() { return false; };
+secondary_canvas.onselectstart = function() { return false; };
+wrapper.onselectstart = function() { return false; };
+
+function PlaySound(){
+    var selectors = document.querySelectorAll(".soundLink, .replaybutton")
+    if (selectors) { selectors[index++ % selectors.length].click(); }
+}
+function recolor_based_on_active_pen()
+{   
+    var color = penStyles[activePenIndex].rgba
+
+    ts_visibility_button_path1.style.stroke = color
+    ts_visibility_button_path2.style.stroke = color
+
+    ts_switch_pen1_button_path.style.stroke = penStyles[0].color
+    ts_switch_pen2_button_path.style.stroke = penStyles[1].color
+    ts_switch_pen3_button_path.style.stroke = penStyles[2].color
+    ts_switch_pen4_button_path.style.stroke = penStyles[3].color
+}
+
+function activate_pen1()
+{
+    activePenIndex = 0
+    update_pen_settings();
+}
+
+function activate_pen2()
+{
+    activePenIndex = 1
+    update_pen_settings();
+}
+
+function activate_pen3()
+{
+    activePenIndex = 2
+    update_pen_settings();
+}
+
+function activate_pen4()
+{
+    activePenIndex = 3
+    update_pen_settings();
+}
+
+function reset_drawing_modes()
+{
+    ts_kanji_button.className = '';
+    ts_perfect_freehand_button.className = '';
+    ts_stroke_delete_button.className = '';
+    ts_text_button.className = '';
+    calligraphy = false;
+    perfectFreehand = false;
+    strokeDelete = false
+    textWriting = false;
+    reset_to_main_pen_settings()
+    ts_redraw()
+}
+
+ts_kanji_button_class = '';
+ts_perfect_freehand_button_class = '';
+ts_stroke_delete_button_class = '';
+ts_text_button_class = '';
+calligraphy_activated = false;
+perfectFreehand_activated = false;
+strokeDelete_activated = false
+textWriting_activated = false;
+
+function save_drawing_modes_for_delete()
+{
+    ts_kanji_button_class = ts_kanji_button.className;
+    ts_perfect_freehand_button_class = ts_perfect_freehand_button.className;
+    ts_text_button_class = ts_text_button.className;
+    calligraphy_activated = calligraphy
+    perfectFreehand_activated = perfectFreehand
+    textWriting_activated = textWriting
+    reset_to_main_pen_settings()
+    ts_redraw()
+}
+
+function restore_drawing_modes_for_delete()
+{
+    ts_kanji_button.className = ts_kanji_button_class
+    ts_perfect_freehand_button.className = ts_perfect_freehand_button_class
+    ts_text_button.className = ts_text_button_class
+    calligraphy = calligraphy_activated
+    perfectFreehand = perfectFreehand_activated
+    textWriting = textWriting_activated
+    reset_to_main_pen_settings()
+    ts_redraw()
+}
+
+function switch_perfect_freehand()
+{
+    stop_drawing();
+    temp = !perfectFreehand;
+    reset_drawing_modes()
+    perfectFreehand = temp;
+    if(perfectFreehand)
+    {
+        ts_perfect_freehand_button.className = 'active';
+    }
+    else{
+        ts_perfect_freehand_button.className = '';
+    }
+}
+
+function switch_calligraphy_mode()
+{
+    stop_drawing();
+    temp = !calligraphy;
+    reset_drawing_modes()
+    calligraphy = temp;
+    if(calligraphy)
+    {
+        ts_kanji_button.className = 'active';
+    }
+    else{
+        ts_kanji_button.className = '';
+    }
+}
+function switch_text_writing_mode()
+{
+    stop_drawing();
+    // In toggle mode, toggle the textWriting boolean
+    temp = !textWriting;
+    reset_drawing_modes()
+    textWriting = temp;
+    if(textWriting)
+    {
+        textBox.focus()
+        ts_text_button.className = 'active';
+    }
+    else{
+        textBox.blur()
+        ts_text_button.className = '';
+    }
+}
+function switch_stroke_delete_mode()
+{
+    stop_drawing();
+    
+    // In toggle mode, toggle the strokeDelete boolean
+    strokeDelete = !strokeDelete;
+    if(strokeDelete || isDeleting)
+    {
+        save_drawing_modes_for_delete()
+        ts_stroke_delete_button.className = 'active';
+    }
+    else{
+        restore_drawing_modes_for_delete()
+        ts_stroke_delete_button.className = '';
+    }
+}
+function enter_stroke_delete_mode()
+{
+    stop_drawing();
+    strokeDelete = true;
+    isDeleting = true;
+    if(strokeDelete || isDeleting)
+    {
+        save_drawing_modes_for_delete()
+        ts_stroke_delete_button.className = 'active';
+    }
+    else{
+        restore_drawing_modes_for_delete()
+        ts_stroke_delete_button.className = '';
+    }
+}
+function exit_stroke_delete_mode()
+{
+    stop_drawing();
+    strokeDelete = false;
+    isDeleting = false
+    if(strokeDelete || isDeleting)
+    {
+        save_drawing_modes_for_delete()
+        ts_stroke_delete_button.className = 'active';
+    }
+    else{
+        restore_drawing_modes_for_delete()
+        ts_stroke_delete_button.className = '';
+    }
+}
+
+
+function switch_small_canvas()
+{
+    stop_drawing();
+    
+    small_canvas = !small_canvas;
+    if(!small_canvas)
+    {
+        ts_switch_fullscreen_button.className = 'active';
+    }
+    else{
+        ts_switch_fullscreen_button.className = '';
+    }
+    resize();
+}
+
+function switch_visibility()
+{
+	stop_drawing();
+    if (!visible) {
+        canvas.style.display='none';
+        secondary_canvas.style.display='none';
+        tileLayer.style.display = 'none';
+        ts_visibility_button.className = '';
+        optionBar.className = 'touch_disable';
+    }
+    else
+    {
+        canvas.style.display='block';
+        secondary_canvas.style.display=canvas.style.display;
+        tileLayer.style.display = tiledCanvas ? 'block' : 'none';
+        ts_visibility_button.className = 'active';
+        optionBar.className = '';
+    }
+    visible = !visible;
+}
+
+// ----------------------------------------- Pointer Dispatch -----------------------------------------
+// One listener per event routes each pointer event to the tool of the current mode.
+// The tool which started a stroke is the active tool and gets the moves and the
+// pointerup of that stroke, everything else is dropped before reaching a tool.
+// stop_drawing() (pointerup, switching modes) takes the state back to idle.
+
+var lineTool = { name: 'line', down: pointerDownLine, move: pointerMoveLine, up: pointerUpLine };
+var perfectTool = { name: 'perfect', down: pointerDownLine, move: pointerMoveLine, up: pointerUpLine };
+var calligraphyTool = { name: 'calligraphy', down: pointerDownCaligraphy, move: pointerMoveCaligraphy, up: pointerUpCaligraphy };
+var deleteTool = { name: 'delete', down: pointerDownStrokeDelete, move: pointerMoveStrokeDelete, up: pointerUpStrokeDelete };
+// text boxes go wherever the pointer goes down or up in the window, not just on the canvas
+var textTool = { name: 'text', windowDown: pointerDownLineText, windowUp: pointerDownLineText };
+var activeTool = null; // tool drawing the stroke in progress, null while idle
+
+function current_tool() {
+    if (strokeDelete) return deleteTool;
+    if (textWriting) return textTool;
+    if (calligraphy) return calligraphyTool;
+    return perfectFreehand ? perfectTool : lineTool;
+}
+
+function on_pointer_down(e) {
+    wrapper.classList.add('nopointer');
+    if (!e.isPrimary) return;
+    var tool = current_tool();
+    if (!tool.down) return;
+    tool.down(e);
+    if (!isPointerDown) return;
+    activeTool = tool;
+    if (inkInputTime < 0 && typeof e.timeStamp === 'number') inkInputTime = e.timeStamp;
+}
+
+function on_pointer_move(e) {
+    if (activeTool === null || !e.isPrimary) return;
+    if (inkInputTime < 0 && typeof e.timeStamp === 'number') inkInputTime = e.timeStamp;
+    activeTool.move(e);
+}
+
+function on_pointer_up(e) {
+    wrapper.classList.remove('nopointer');
+    if (activeTool !== null && e.isPrimary) activeTool.up(e);
+    stop_drawing();// any pointerup ends the stroke and submits pending text
+    if (textWriting && e.isPrimary) textTool.windowUp(e);
+}
+
+function on_window_pointer_down(e) {
+    if (textWriting && e.isPrimary) textTool.windowDown(e);
+}
+
+// Time n synthetic pointermoves through the dispatcher, once with a tool that does
+// nothing and once while idle, to see what every pointer event costs before any drawing
+function ts_benchmark_dispatch(n) {
+    n = n || 20000;
+    var savedTool = activeTool, savedInputTime = inkInputTime, sink = 0;
+    var probe = { name: 'probe', move: e => { sink += e.offsetX; } };
+    var e = { isPrimary: true, pointerType: 'mouse', offsetX: 1, offsetY: 1 };
+    activeTool = probe;
+    var start = performance.now();
+    for (var i = 0; i < n; i++) on_pointer_move(e);
+    ts_stats.dispatch_move_ns = (performance.now() - start) * 1e6 / n;
+    activeTool = null;
+    start = performance.now();
+    for (var i = 0; i < n; i++) on_pointer_move(e);
+    ts_stats.dispatch_idle_ns = (performance.now() - start) * 1e6 / n;
+    start = performance.now();
+    for (var i = 0; i < n; i++) sink += current_tool().name.length;
+    ts_stats.dispatch_tool_lookup_ns = (performance.now() - start) * 1e6 / n;
+    activeTool = savedTool;
+    inkInputTime = savedInputTime;// the probe events aren't ink, keep them out of the latency probe
+    return ts_stats;
+}
+
+canvas.addEventListener("pointerdown", on_pointer_down);
+canvas.addEventListener("pointermove", on_pointer_move);
+secondary_canvas.addEventListener("pointerdown", on_pointer_down);
+secondary_canvas.addEventListener("pointermove", on_pointer_move);
+window.addEventListener("pointerup", on_pointer_up);
+window.addEventListener("pointerdown", on_window_pointer_down);
+
+// Highest scale the canvases may use per mode. A full card canvas is as big as the
+// card, so it gets less than the small and follow canvases, which fit in the viewport.
+var MAX_CANVAS_SCALE = { full: 2, follow: 3, small: 3 };
+var MIN_CANVAS_SCALE = 0.5;// never lower the resolution below this to fit the budget, the committed layer below this times committed_layer_scale
+
+// Pick the backing store scale of both canvases for a css size: the device pixel ratio,
+// capped for the mode and lowered until the canvases fit in canvas_memory_mb. The
+// committed strokes are drawn at committed_layer_scale of it, the preview keeps the
+// full scale. Without the committed layer only the preview is counted (tiles have
+// the rest of the budget).
+function choose_canvas_scale(mode, width, height, withCommittedLayer) {
+    var dpr = window.devicePixelRatio || 1;
+    var full = Math.min(dpr, MAX_CANVAS_SCALE[mode]);
+    var preview = full;
+    var committed = full * committedLayerScale;
+    var bytes = width * height * 4 * (preview * preview + (withCommittedLayer ? committed * committed : 0));
+    if (bytes > canvasMemoryBudget) {
+        // the floor only stops the shrinking, it never raises a scale above what it was
+        var shrink = Math.sqrt(canvasMemoryBudget / bytes);
+        preview = Math.min(full, Math.max(MIN_CANVAS_SCALE, preview * shrink));
+        committed = Math.min(full * committedLayerScale, Math.max(MIN_CANVAS_SCALE * committedLayerScale, committed * shrink));
+        bytes = Math.round(width * height * 4 * (preview * preview + (withCommittedLayer ? committed * committed : 0)));
+    }
+    ts_stats.canvas_over_budget = bytes > canvasMemoryBudget;
+    ts_stats.canvas_mode = mode;
+    ts_stats.device_pixel_ratio = dpr;
+    ts_stats.committed_scale = committed;
+    ts_stats.preview_scale = preview;
+    return { preview: preview, committed: committed, bytes: bytes };
+}
+
+function resize() {
+    
+    var card = document.getElementsByClassName('card')[0]
+    
+    // Run again until card is loaded
+    if (!card){
+        window.setTimeout(resize, 100)
+        return;
+        
+    }
+    sync_render_worker(useTiles && !small_canvas && !fullscreen_follow);
+    // Check size of page without canvas
+    canvas_wrapper.style.display='none';
+    canvas.style["border-style"] = "none";
+    secondary_canvas.style["border-style"] = "none";
+    document.documentElement.style.setProperty('--canvas-bar-pt', '0px');
+    document.documentElement.style.setProperty('--canvas-bar-pr', '0px');
+    document.documentElement.style.setProperty('--canvas-bar-pb', 'unset');
+    document.documentElement.style.setProperty('--canvas-bar-pl', 'unset');
+    document.documentElement.style.setProperty('--canvas-bar-position', 'absolute');
+    
+    if(!small_canvas && !fullscreen_follow){
+        ctx.canvas.width = Math.max(card.scrollWidth, document.documentElement.clientWidth);
+        ctx.canvas.height = Math.max(document.documentElement.scrollHeight, document.documentElement.clientHeight);        
+    }
+    else if(small_canvas){
+        ctx.canvas.width = Math.min(document.documentElement.clientWidth, 
+        getComputedStyle(document.documentElement).getPropertyValue('--small-canvas-width'));
+        ctx.canvas.height = Math.min(document.documentElement.clientHeight, 
+        getComputedStyle(document.documentElement).getPropertyValue('--small-canvas-height'));
+        canvas.style["border-style"] = "dashed";
+        secondary_canvas.style["border-style"] = "dashed";
+        document.documentElement.style.setProperty('--canvas-bar-pt', 
+        getComputedStyle(document.documentElement).getPropertyValue('--button-bar-pt'));
+        document.documentElement.style.setProperty('--canvas-bar-pr', 
+        getComputedStyle(document.documentElement).getPropertyValue('--button-bar-pr'));
+        document.documentElement.style.setProperty('--canvas-bar-pb', 
+        getComputedStyle(document.documentElement).getPropertyValue('--button-bar-pb'));
+        document.documentElement.style.setProperty('--canvas-bar-pl', 
+        getComputedStyle(document.documentElement).getPropertyValue('--button-bar-pl'));
+        document.documentElement.style.setProperty('--canvas-bar-position', 'fixed');
+    }
+    else{
+        document.documentElement.style.setProperty('--canvas-bar-position', 'fixed');
+        ctx.canvas.width = document.documentElement.clientWidth-1;
+        ctx.canvas.height = document.documentElement.clientHeight-1;
+    }
+    tiledCanvas = useTiles && !small_canvas && !fullscreen_follow;
+    if (!tiledCanvas) release_tiles();
+    var mode = small_canvas ? 'small' : fullscreen_follow ? 'follow' : 'full';
+    secondary_ctx.canvas.width = ctx.canvas.width;
+    secondary_ctx.canvas.height = ctx.canvas.height;
+    canvas_wrapper.style.display='block';
+    
+    
+    
+    /* Resolution for the size and mode, with the device pixel ratio as upper limit */
+    var scale = tiledCanvas ?
+        choose_canvas_scale(mode,
+            Math.min(ctx.canvas.width, document.documentElement.clientWidth),
+            Math.min(ctx.canvas.height, document.documentElement.clientHeight), false) :
+        choose_canvas_scale(mode, ctx.canvas.width, ctx.canvas.height, true);
+    
+    /* CSS size is the same */
+    canvas.style.height = ctx.canvas.height + 'px';
+    wrapper.style.width = ctx.canvas.width + 'px';
+    secondary_canvas.style.height = canvas.style.height;
+    secondary_canvas.style.width = canvas.style.width;
+    
+    if (tiledCanvas) {
+        TILE_MEMORY_BUDGET = Math.max(canvasMemoryBudget - scale.bytes, 0);
+        resize_tiles(ctx.canvas.width, ctx.canvas.height, scale.committed, scale.preview);
+    }
+    else {
+        /* Increase DOM size and scale */
+        ctx.canvas.width *= scale.committed;
+        ctx.canvas.height *= scale.committed;
+        ctx.scale(scale.committed, scale.committed);
+        secondary_ctx.canvas.width *= scale.preview;
+        secondary_ctx.canvas.height *= scale.preview;
+        secondary_ctx.scale(scale.preview, scale.preview);
+    }
+    ts_stats.canvas_bytes = (ctx.canvas.width * ctx.canvas.height + secondary_canvas.width * secondary_canvas.height) * 4;
+    clear_checkpoints();
+    post_to_render_worker({ type: 'resize', width: ctx.canvas.width, height: ctx.canvas.height, scale: scale.committed });
+    
+	update_pen_settings()
+    
+}
+
+
+window.addEventListener('resize', resize);
+window.addEventListener('load', resize);
+window.addEventListener('scroll', update_viewport, { passive: true });
+request_render();
+
+var isPointerDown = false;
+var mouseX = 0;
+var mouseY = 0;
+
+function update_pen_settings(){
+    stop_drawing()
+    var pen = penStyles[activePenIndex];
+
+    if(ctx.lineJoin != 'round'){
+        ctx.lineJoin = ctx.lineCap = 'round';
+        secondary_ctx.lineJoin = secondary_ctx.lineCap = ctx.lineJoin;
+    }   
+    if(ctx.lineWidth != pen.width) {
+        ctx.lineWidth = pen.width; // pen Width
+        secondary_ctx.lineWidth = ctx.lineWidth
+    }
+    if(ctx.strokeStyle != pen.rgba){
+        ctx.strokeStyle = ctx.fillStyle = pen.rgba; // pen color
+        
+        
+    } 
+    if(secondary_ctx.strokeStyle != pen.opaque){
+        secondary_ctx.strokeStyle = secondary_ctx.fillStyle = pen.opaque;
+    }
+    
+    var previewOpacity = lowLatencyActive ? '1' : pen.canvasOpacity;// see create_preview_context
+    if(secondary_canvas.style.opacity != previewOpacity) secondary_canvas.style.opacity = previewOpacity
+    if(canvas.style.opacity != pen.canvasOpacity) canvas.style.opacity = pen.canvasOpacity
+    if(tileLayer.style.opacity != pen.canvasOpacity) tileLayer.style.opacity = pen.canvasOpacity
+    
+    recolor_based_on_active_pen()
+    ts_redraw()
+}
+
+function reset_to_main_pen_settings(){
+    var pen = penStyles[activePenIndex];
+    if(ctx.lineJoin != 'round'){
+        ctx.lineJoin = ctx.lineCap = 'round';
+        secondary_ctx.lineJoin = secondary_ctx.lineCap = ctx.lineJoin;
+    }   
+    if(ctx.lineWidth != pen.width) {
+        ctx.lineWidth = pen.width; // pen Width
+        secondary_ctx.lineWidth = ctx.lineWidth
+    }
+    if(ctx.strokeStyle != pen.rgba){
+        ctx.strokeStyle = ctx.fillStyle = pen.rgba; // pen color
+    } 
+    if(secondary_ctx.strokeStyle != pen.opaque){
+        secondary_ctx.strokeStyle = secondary_ctx.fillStyle = pen.opaque;
+    }
+    
+    var previewOpacity = lowLatencyActive ? '1' : pen.canvasOpacity;// see create_preview_context
+    if(secondary_canvas.style.opacity != previewOpacity) secondary_canvas.style.opacity = previewOpacity
+    if(canvas.style.opacity != pen.canvasOpacity) canvas.style.opacity = pen.canvasOpacity
+    if(tileLayer.style.opacity != pen.canvasOpacity) tileLayer.style.opacity = pen.canvasOpacity
+    
+}
+
+function ts_undo(){
+	stop_drawing();
+    if(lineHistory.length>0){
+        var poppedAction = lineHistory.pop()
+        drawingChanged = true
+        cancel_fit(poppedAction)
+        post_to_render_worker({ type: 'pop' })
+        redoStack.push(poppedAction)
+        if(poppedAction.type == 'X') pop_clear_index()
+        invalidate_checkpoints_from(poppedAction.type == 'D' ? Math.min(...poppedAction.deletedList) : lineHistory.length)
+        ts_redo_button.className = "active";
+        switch (poppedAction.type) {
+            case 'C'://Calligraphy
+            case 'L'://Simple Lines
+            case 'P'://Perfect Lines
+            case 'T'://Text Writing actions
+                unindex_stroke(lineHistory.length, poppedAction)
+                ts_redraw(get_action_bounds(poppedAction))
+                break;
+            case 'D'://Delete Stroke Lines
+                poppedAction.deletedList.forEach( deletedIndex => { lineHistory[deletedIndex].visible = true; index_stroke(deletedIndex) } )
+                post_to_render_worker({ type: 'visible', indices: poppedAction.deletedList, visible: true })
+                ts_redraw(get_actions_bounds(poppedAction.deletedList))
+                break;
+            case 'X'://Clear actions
+                ts_redraw()
+                break;
+            default://how did you get here??
+                ts_redraw()
+                break;
+        }
+    }
+
+    if(!lineHistory.length)
+    {
+        ts_undo_button.className = ""
+    }
+}
+function ts_redo() {
+    stop_drawing();
+    if (redoStack.length < 1) return;
+    
+    var redoAction = redoStack.pop();
+    if (redoAction.type == 'C' && !redoAction.segments) queue_fit(redoAction);
+    readd_action_to_history(redoAction)
+    ts_undo_button.className = "active";
+    switch (redoAction.type) {
+        case 'C'://Calligraphy
+        case 'L'://Simple Lines
+        case 'P'://Perfect Lines
+        case 'T'://Text Writing actions
+            break;// drawn on top by the next frame like any new action
+        case 'D'://Delete Stroke Lines
+            redoAction.deletedList.forEach( deletedIndex => { lineHistory[deletedIndex].visible = false; unindex_stroke(deletedIndex, lineHistory[deletedIndex]) } )
+            post_to_render_worker({ type: 'visible', indices: redoAction.deletedList, visible: false })
+            invalidate_checkpoints_from(Math.min(...redoAction.deletedList))
+            ts_redraw(get_actions_bounds(redoAction.deletedList))
+            break;
+        case 'X'://Clear Screen
+            ts_redraw();
+            break;
+        default://how did you get here??
+            ts_redraw();
+            break;
+    }
+    
+    if (redoStack.length === 0) {
+        ts_redo_button.className = "";
+    }
+}
+
+// Redraw the committed strokes, only inside region ({x, y, width, height}) if given
+function ts_redraw(region) {
+    if (!region || (pleaseRedrawEverything && !redrawRegion)) {
+        redrawRegion = null;
+    } else {
+        redrawRegion = redrawRegion ? union_boxes(redrawRegion, region) : region;
+    }
+	pleaseRedrawEverything = true;
+    request_render();
+}
+
+function ts_clear() {
+	pleaseRedrawEverything = true;
+    redrawRegion = null;
+    fullClear = true;
+    request_render();
+}
+
+function clear_canvas()
+{
+	//don't continue to put points into an empty array(pointermove) if clearing while drawing on the canvas
+	stop_drawing();
+    reset_history();
+    reset_redo()
+	ts_clear();
+}
+
+function add_clear_marker()
+{
+	//don't continue to put points into an empty array(pointermove) if clearing while drawing on the canvas
+	stop_drawing();
+    if(lineHistory.length && lineHistory[lineHistory.length-1].type != 'X'){
+        add_action_to_history({ type: 'X'})
+        if(undoableClears >= 0 && clearIndices.length > undoableClears){
+            // the oldest clears can't be undone anymore, so neither can anything before them
+            drop_history_before(clearIndices[clearIndices.length - undoableClears - 1] + 1)
+        }
+    }
+	ts_clear();
+}
+
+function add_action_to_history(action){
+    ts_undo_button.className = "active"
+    if(action.points && action.points.trim) action.points.trim()
+    action.id = nextActionId++
+    lineHistory.push(action)
+    drawingChanged = true
+    post_action_to_render_worker(action)
+    if(action.type == 'X') push_clear_index()
+    index_stroke(lineHistory.length - 1)
+    currentAction = {}
+    reset_redo()
+    request_render()
+}
+
+function readd_action_to_history(action){
+    ts_undo_button.className = "active"
+    lineHistory.push(action)
+    drawingChanged = true
+    post_action_to_render_worker(action)
+    if(action.type == 'X') push_clear_index()
+    index_stroke(lineHistory.length - 1)
+    currentAction = {}
+    request_render()
+}
+
+function push_clear_index(){
+    clearIndices.push(lineHistory.length - 1)
+    lastClearIndex = lineHistory.length - 1
+    clear_stroke_index()// nothing before a clear can be erased
+}
+
+function pop_clear_index(){
+    clearIndices.pop()
+    lastClearIndex = clearIndices.length ? clearIndices[clearIndices.length - 1] : -1
+    rebuild_stroke_index()
+}
+
+// Forget the first count actions of the history, they must not be referenced by
+// any action that is kept, which holds for everything before a clear.
+function drop_history_before(count){
+    if(count <= 0) return;
+    lineHistory.splice(0, count).forEach(forget_geometry)
+    post_to_render_worker({ type: 'drop', count: count })
+    clear_checkpoints()
+    clearIndices = clearIndices.filter(index => index >= count).map(index => index - count)
+    lastClearIndex = clearIndices.length ? clearIndices[clearIndices.length - 1] : -1
+    lineHistory.forEach(action => {
+        if(action.type == 'D') action.deletedList = action.deletedList.map(index => index - count)
+    })
+    nextLine = Math.max(0, nextLine - count)
+    rebuild_stroke_index()
+    if(!lineHistory.length) ts_undo_button.className = ""
+}
+
+function reset_redo(){
+    redoStack = [];
+    ts_redo_button.className = "";
+}
+
+function reset_history(){
+    lineHistory = [];
+    clear_geometry();
+    post_to_render_worker({ type: 'reset' })
+    cancel_all_fits();
+    clear_checkpoints();
+    clearIndices = [];
+    lastClearIndex = -1;
+    clear_stroke_index();
+    ts_undo_button.className = "";
+}
+
+function stop_drawing() {
+    commit_erase()
+    reset_to_main_pen_settings()
+    submitCurrentText()
+    isPointerDown = false;
+    activeTool = null;
+	drawingWithPressurePenOnly = false;
+}
+
+function start_drawing() {
+    submitCurrentText()
+    isPointerDown = true;
+    reset_redo()
+}
+
+// ----------------------------------------- Saved Drawings -----------------------------------------
+// The add-on keeps the drawing of each card. It asks for it with ts_export_drawing()
+// before the next card is shown and on the answer, and hands the drawing of a card
+// back to ts_import_drawing() when the card comes up again. Only what is visible is
+// kept, in the format of StrokeCodec.js: strokes behind a clear, erased strokes and
+// the undo history are left out.
+
+var drawingChanged = false // since the drawing was last imported or exported
+
+// The visible drawing base64 encoded, '' if there is none, null if it didn't change
+function ts_export_drawing() {
+    if (!drawingChanged) return null;
+    drawingChanged = false;
+    var actions = lineHistory.filter((action, index) =>
+        index > lastClearIndex && action.visible && 'LPCT'.includes(action.type));
+    if (!actions.length) return '';
+    var bytes = encode_drawing(actions);
+    var binary = '';
+    for (var i = 0; i < bytes.length; i += 0x8000) {
+        binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+    }
+    return btoa(binary);
+}
+
+function ts_import_drawing(data) {
+    var binary = atob(data);
+    var bytes = new Uint8Array(binary.length);
+    for (var i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+    decode_drawing(bytes).forEach(action => {
+        if (action.type == 'T') action.points = createBoxWithDiagonalPoints(action);
+        if (action.type == 'C') queue_fit(action);
+        add_action_to_history(action);
+    });
+    drawingChanged = false;
+}
+
+// ----------------------------------------- Render Scheduler -----------------------------------------
+// Nothing runs while the board is untouched. Whatever changes the committed
+// strokes asks for a frame (request_render) or marks a region dirty (ts_redraw),
+// and a single animation frame then draws everything that is pending.
+
+var renderRequested = false;
+var redrawRegion = null; // region of a pending redraw, null while the whole canvas has to be redrawn
+
+function request_render() {
+    if (renderRequested) return;
+    renderRequested = true;
+    window.requestAnimationFrame(draw_last_line_segment);
+}
+
+function union_boxes(a, b) {
+    var x = Math.min(a.x, b.x);
+    var y = Math.min(a.y, b.y);
+    return {
+        x: x,
+        y: y,
+        width: Math.max(a.x + a.width, b.x + b.width) - x,
+        height: Math.max(a.y + a.height, b.y + b.height) - y
+    };
+}
+
+// Area covered by an action's ink, padded by how far its brush reaches past the points
+function get_action_bounds(action) {
+    if (!action || !action.points || !action.points.length) return null;
+    var box = action.bounds ? bounds_to_box(action.bounds, 1) : calculateClearBox(action.points);
+    var width = Number(action.width) || 0;
+    var padding = action.type == 'C' ? width * 2 + SPLIT_THRESHOLD : width + 2;
+    return {
+        x: box.x - padding,
+        y: box.y - padding,
+        width: box.width + padding * 2,
+        height: box.height + padding * 2
+    };
+}
+
+function get_actions_bounds(indices) {
+    var region = null;
+    for (var i = 0; i < indices.length; i++) {
+        var bounds = get_action_bounds(lineHistory[indices[i]]);
+        if (!bounds) return null;// can't tell, redraw everything
+        region = region ? union_boxes(region, bounds) : bounds;
+    }
+    return region;
+}
+
+function has_pending_render() {
+    return pleaseRedrawEverything || nextLine < lineHistory.length;
+}
+
+function draw_last_line_segment() {
+    renderRequested = false;
+    ts_stats.frames++;
+    var drewPreview = draw_pending_preview();
+    if (!has_pending_render()) {
+        if (!drewPreview) ts_stats.idle_frames++;
+        return;
+    }
+    draw_upto_latest_point_async(nextLine, nextPoint, nextStroke);
+}
+
+var nextLine = 0;
+var nextPoint = 0;
+var nextStroke = 0;
+
+// ----------------------------------------- Live Preview -----------------------------------------
+// Pointer events only store their samples, the stroke in progress is drawn on the
+// secondary canvas once per frame with everything that came in since the last one.
+
+var previewPending = false;
+var previewDrawn = 0; // points of the stroke in progress already on the secondary canvas
+var pendingSamples = 0;
+
+function request_preview(samples) {
+    pendingSamples += samples;
+    previewPending = true;
+    request_render();
+}
+
+function clear_preview_canvas() {
+    secondary_ctx.save();
+    secondary_ctx.setTransform(1, 0, 0, 1, 0, 0);
+    secondary_ctx.clearRect(0, 0, secondary_canvas.width, secondary_canvas.height);
+    secondary_ctx.restore();
+}
+
+// Draw the stroke in progress again from its first point, after the secondary canvas moved
+function redraw_preview() {
+    clear_preview_canvas();
+    if (textWriting) drawTextOnCanvas();
+    if (!isPointerDown || !currentAction.points || !currentAction.points.length) return;
+    previewDrawn = 0;
+    previewSegmentBounds = [];
+    predictionBox = null;
+    if (currentAction.type == 'P') {
+        currentStroke.reset();
+        reset_preview();
+    }
+    request_preview(0);
+}
+
+// Browsers merge the samples of fast pens into one pointermove, take all of them
+function get_pointer_samples(e) {
+    var samples = typeof e.getCoalescedEvents === 'function' ? e.getCoalescedEvents() : null;
+    if (!samples || !samples.length) return [e];
+    if (samples.length > 1) ts_stats.coalesced_events++;
+    return samples;
+}
+
+function draw_pending_preview() {
+    if (!previewPending) return false;
+    previewPending = false;
+    ts_stats.samples_per_frame = pendingSamples;
+    ts_stats.max_samples_per_frame = Math.max(ts_stats.max_samples_per_frame, pendingSamples);
+    pendingSamples = 0;
+    if (!isPointerDown || !currentAction.points || !currentAction.points.length) {
+        inkInputTime = -1;
+        return true;
+    }
+    erase_prediction();
+    switch (currentAction.type) {
+        case 'P':
+            draw_freehand_preview();
+            break;
+        case 'L':
+            draw_line_preview();
+            break;
+        case 'C':
+        case 'D':
+            drawCurrentPath();
+            break;
+    }
+    draw_prediction();
+    measure_ink_latency();
+    return true;
+}
+
+// ----------------------------------------- Low Latency Ink -----------------------------------------
+// With low latency ink on, the secondary canvas gets a desynchronized context where
+// the browser supports one, so the live ink reaches the screen without waiting for
+// the page to be composited. That only works for canvases without CSS effects, so
+// the preview is drawn at full opacity (strokes are drawn in the opaque pen colors
+// anyway) and the pen opacity shows once the stroke is committed. The committed
+// layer is not affected. Browsers without desynchronized contexts get a normal one.
+
+// the secondary context really is desynchronized, no initializer: it is set by the
+// create_preview_context() call near the top of this file, before this line runs
+var lowLatencyActive;
+
+function create_preview_context(lowLatency) {
+    var context = lowLatency ?
+        secondary_canvas.getContext('2d', { desynchronized: true }) :
+        secondary_canvas.getContext('2d');
+    var attributes = lowLatency && typeof context.getContextAttributes === 'function' ? context.getContextAttributes() : {};
+    lowLatencyActive = !!attributes.desynchronized;
+    ts_stats.low_latency = lowLatencyActive;
+    return context;
+}
+
+// The attributes of a context can't change once it exists, so switching modes
+// replaces the secondary canvas with a fresh one
+function ts_set_low_latency(enabled) {
+    stop_drawing();
+    lowLatencyInk = enabled;
+    var fresh = secondary_canvas.cloneNode(false);
+    secondary_canvas.parentNode.replaceChild(fresh, secondary_canvas);
+    secondary_canvas = fresh;
+    secondary_ctx = create_preview_context(enabled);
+    secondary_canvas.addEventListener("pointerdown", on_pointer_down);
+    secondary_canvas.addEventListener("pointermove", on_pointer_move);
+    reset_ink_latency();
+    resize();
+}
+
+// Latency probe: from the pointer event which brought the oldest sample not drawn yet
+// to the preview frame drawing it, and to the frame after that one, which only starts
+// once the frame with the new ink went to the screen. Compare the modes with the
+// ink_* counters of the diagnostics.
+var inkInputTime = -1;// timeStamp of the first pointer event since the last preview frame
+var inkLatency = { count: 0, drawSum: 0, frameSum: 0 };
+
+function measure_ink_latency() {
+    if (inkInputTime < 0) return;
+    var input = inkInputTime;
+    var drawn = performance.now();
+    inkInputTime = -1;
+    window.requestAnimationFrame(frame => {
+        inkLatency.count++;
+        inkLatency.drawSum += drawn - input;
+        inkLatency.frameSum += frame - input;
+        ts_stats.ink_latency_samples = inkLatency.count;
+        ts_stats.ink_input_to_draw_ms = inkLatency.drawSum / inkLatency.count;
+        ts_stats.ink_input_to_frame_ms = inkLatency.frameSum / inkLatency.count;
+        ts_stats.ink_max_input_to_frame_ms = Math.max(ts_stats.ink_max_input_to_frame_ms, frame - input);
+    });
+}
+
+function reset_ink_latency() {
+    inkInputTime = -1;
+    inkLatency = { count: 0, drawSum: 0, frameSum: 0 };
+    ts_stats.ink_latency_samples = 0;
+    ts_stats.ink_input_to_draw_ms = 0;
+    ts_stats.ink_input_to_frame_ms = 0;
+    ts_stats.ink_max_input_to_frame_ms = 0;
+}
+
+// Redraw the part of the stroke in progress inside box, the caller clips and clears it
+function repaint_preview(box) {
+    switch (currentAction.type) {
+        case 'P':
+            previewChunks.forEach(chunk => {
+                if (bounds_intersect_box(chunk.bounds, box)) secondary_ctx.fill(chunk.path);
+            });
+            if (previewTailPath) secondary_ctx.fill(previewTailPath);
+            break;
+        case 'L':
+        case 'C':
+            previewSegmentBounds.forEach((bounds, chunk) => {
+                if (!bounds_intersect_box(bounds, box)) return;
+                var from = chunk * PREVIEW_SEGMENT_CHUNK, to = Math.min(from + PREVIEW_SEGMENT_CHUNK, previewDrawn);
+                if (currentAction.type == 'L') stroke_line_segments(from, to);
+                else stroke_guide_line(Math.max(from - 1, 0), to);
+            });
+            break;
+    }
+}
+
+// Bounds of the drawn preview segments, in chunks of PREVIEW_SEGMENT_CHUNK points
+var PREVIEW_SEGMENT_CHUNK = 32;
+var previewSegmentBounds = [];
+
+function track_preview_segment(end, from, width) {
+    var chunk = Math.floor(end / PREVIEW_SEGMENT_CHUNK);
+    var points = currentAction.points, reach = width / 2 + 1;
+    var bounds = previewSegmentBounds[chunk] || null;
+    for (var i = from; i <= end; i++) {
+        bounds = extend_bounds(bounds, points.x(i) - reach, points.y(i) - reach);
+        bounds = extend_bounds(bounds, points.x(i) + reach, points.y(i) + reach);
+    }
+    previewSegmentBounds[chunk] = bounds;
+}
+
+// ----------------------------------------- Predicted Ink -----------------------------------------
+// With predicted_ink on, the stroke in progress gets a provisional tail reaching
+// predicted_ink_lookahead_ms ahead of the last sample, from getPredictedEvents() or
+// else extrapolated from the velocity and acceleration of the last samples. The tail
+// is only drawn on the secondary canvas and erased on the next frame, predicted
+// points never become part of the action. predicted_ink_measure logs how far the
+// predictions were from where the pen actually went.
+
+var recentSamples = []; // last three real samples as {x, y, t}
+var predictedPoints = []; // [x, y] after the last real sample
+var predictionBox = null; // area of the secondary canvas the drawn prediction covers
+var predictionChecks = []; // {x, y, t} predictions waiting for the real position at t
+var predictionErrors = { count: 0, sum: 0, max: 0 };
+
+function reset_prediction() {
+    recentSamples = [];
+    predictedPoints = [];
+    predictionBox = null;
+    predictionChecks = [];
+}
+
+function track_sample(sample) {
+    var current = { x: sample.offsetX, y: sample.offsetY, t: sample.timeStamp };
+    var previous = recentSamples[recentSamples.length - 1];
+    if (predictionChecks.length && previous) {
+        predictionChecks = predictionChecks.filter(check => {
+            if (check.t > current.t) return true;
+            // where the pen was at the predicted time, between the two real samples around it
+            var f = current.t > previous.t ? Math.min(Math.max((check.t - previous.t) / (current.t - previous.t), 0), 1) : 1;
+            var error = Math.hypot(previous.x + (current.x - previous.x) * f - check.x, previous.y + (current.y - previous.y) * f - check.y);
+            predictionErrors.count++;
+            predictionErrors.sum += error;
+            predictionErrors.max = Math.max(predictionErrors.max, error);
+            return false;
+        });
+    }
+    recentSamples.push(current);
+    if (recentSamples.length > 3) recentSamples.shift();
+}
+
+function update_prediction(e) {
+    predictedPoints = [];
+    if (!predictInk || !recentSamples.length) return;
+    var last = recentSamples[recentSamples.length - 1];
+    var predicted = typeof e.getPredictedEvents === 'function' ? e.getPredictedEvents() : [];
+    if (predicted.length) {
+        var end = last.t;
+        predicted.forEach(p => {
+            if (p.timeStamp - last.t > predictionLookahead) return;
+            predictedPoints.push([p.offsetX, p.offsetY]);
+            end = p.timeStamp;
+        });
+        if (predictedPoints.length && measurePrediction) {
+            var lastPredicted = predictedPoints[predictedPoints.length - 1];
+            predictionChecks.push({ x: lastPredicted[0], y: lastPredicted[1], t: end });
+        }
+        return;
+    }
+    predictedPoints = extrapolate_samples(predictionLookahead);
+    if (predictedPoints.length && measurePrediction) {
+        var extrapolated = predictedPoints[predictedPoints.length - 1];
+        predictionChecks.push({ x: extrapolated[0], y: extrapolated[1], t: last.t + predictionLookahead });
+    }
+}
+
+// Positions at a third, two thirds and all of lookahead ms after the last sample,
+// assuming constant acceleration. The curvature part never outgrows the straight one.
+function extrapolate_samples(lookahead) {
+    var n = recentSamples.length;
+    if (n < 2) return [];
+    var s2 = recentSamples[n - 1], s1 = recentSamples[n - 2];
+    var dt2 = s2.t - s1.t;
+    if (dt2 <= 0) return [];
+    var vx = (s2.x - s1.x) / dt2, vy = (s2.y - s1.y) / dt2;
+    var ax = 0, ay = 0;
+    if (n > 2) {
+        var s0 = recentSamples[0], dt1 = s1.t - s0.t;
+        if (dt1 > 0) {
+            ax = (vx - (s1.x - s0.x) / dt1) / ((dt1 + dt2) / 2);
+            ay = (vy - (s1.y - s0.y) / dt1) / ((dt1 + dt2) / 2);
+        }
+    }
+    var points = [];
+    for (var step = 1; step <= 3; step++) {
+        var h = lookahead * step / 3;
+        var dx = vx * h, dy = vy * h;
+        var cx = ax * h * h / 2, cy = ay * h * h / 2;
+        var limit = Math.hypot(dx, dy), curve = Math.hypot(cx, cy);
+        if (curve > limit && curve > 0) {
+            cx *= limit / curve;
+            cy *= limit / curve;
+        }
+        points.push([s2.x + dx + cx, s2.y + dy + cy]);
+    }
+    return points;
+}
+
+function draw_prediction() {
+    if (!predictedPoints.length) return;
+    var points = currentAction.points, n = points.length;
+    var last = [points.x(n - 1), points.y(n - 1)];
+    var lineWidth = secondary_ctx.lineWidth;
+    secondary_ctx.save();
+    secondary_ctx.lineCap = secondary_ctx.lineJoin = 'round';
+    secondary_ctx.beginPath();
+    if (currentAction.type == 'L' && n > 1) {
+        // continue the chain of midpoint curves the preview stopped at
+        var chain = [last].concat(predictedPoints);
+        lineWidth = secondary_ctx.lineWidth = points.width(n - 1);
+        secondary_ctx.moveTo((points.x(n - 2) + last[0]) / 2, (points.y(n - 2) + last[1]) / 2);
+        for (var i = 0; i < chain.length - 1; i++) {
+            secondary_ctx.quadraticCurveTo(chain[i][0], chain[i][1], (chain[i][0] + chain[i + 1][0]) / 2, (chain[i][1] + chain[i + 1][1]) / 2);
+        }
+        secondary_ctx.lineTo(chain[chain.length - 1][0], chain[chain.length - 1][1]);
+    }
+    else {
+        if (currentAction.type == 'P') lineWidth = secondary_ctx.lineWidth = 2 * (currentStroke.radius || currentAction.width / 2);
+        else if (currentAction.type == 'L') lineWidth = secondary_ctx.lineWidth = points.width(n - 1);
+        secondary_ctx.moveTo(last[0], last[1]);
+        predictedPoints.forEach(point => secondary_ctx.lineTo(point[0], point[1]));
+    }
+    secondary_ctx.stroke();
+    secondary_ctx.restore();
+    var bounds = extend_bounds_with_points(extend_bounds(null, last[0], last[1]), predictedPoints);
+    if (n > 1) bounds = extend_bounds(bounds, points.x(n - 2), points.y(n - 2));
+    predictionBox = bounds_to_box(bounds, lineWidth / 2 + 2);
+}
+
+function erase_prediction() {
+    if (!predictionBox) return;
+    var box = predictionBox;
+    predictionBox = null;
+    secondary_ctx.save();
+    secondary_ctx.beginPath();
+    secondary_ctx.rect(box.x, box.y, box.width, box.height);
+    secondary_ctx.clip();
+    secondary_ctx.clearRect(box.x, box.y, box.width, box.height);
+    repaint_preview(box);
+    secondary_ctx.restore();
+}
+
+function report_prediction_error() {
+    if (!measurePrediction || !predictionErrors.count) return;
+    ts_stats.predictions = predictionErrors.count;
+    ts_stats.prediction_mean_error = predictionErrors.sum / predictionErrors.count;
+    ts_stats.prediction_max_error = predictionErrors.max;
+    console.log("AnkiDraw predicted ink (" + predictionLookahead + "ms ahead): mean error " +
+        ts_stats.prediction_mean_error.toFixed(2) + "px, max " + predictionErrors.max.toFixed(2) +
+        "px over " + predictionErrors.count + " predictions");
+}
+
+function is_last_path_and_currently_drawn(i){
+    return (lineHistory.length-1 < i)//the path is complete unless its the last of the array and the pointer is still down
+}
+
+function all_drawing_finished(i){
+    return (lineHistory.length-1 >= i)//the path is complete unless its the last of the array and the pointer is still down
+}
+
+var pleaseRedrawEverything = false;
+var fullClear = false;
+
+// ----------------------------------------- Render Worker -----------------------------------------
+// Where the webview has OffscreenCanvas, the main canvas is transferred to
+// RenderWorker.js, which replays the committed strokes and keeps their caches and
+// checkpoints, so a long redraw no longer holds up the pointer events. The page
+// keeps the input, the live preview and lineHistory, and posts every change of the
+// history to the worker, points as a copy of their Float32Array transferred with
+// the message. ctx then belongs to a canvas outside the page, only used for the
+// layout size and for measuring text.
+// The worker only draws the single canvas (small canvas, follow mode or tiled_canvas
+// off), tiles are drawn on the page. So it is started the first time the board has a
+// single canvas, and while the strokes are in tiles it is kept idle, without pixels
+// or a copy of the history. The main canvas never gets a context on the page as long
+// as the worker may still take it.
+
+var idleRenderWorker = null;// the worker while the strokes are in tiles
+
+function can_use_render_worker() {
+    return useRenderWorker && typeof Worker === 'function' && typeof OffscreenCanvas === 'function' &&
+        typeof canvas.transferControlToOffscreen === 'function';
+}
+
+// Start, wake or idle the worker for the coming canvas mode, called by resize()
+function sync_render_worker(tiled) {
+    if (tiled) {
+        if (!renderWorker) return;
+        post_to_render_worker({ type: 'reset' });
+        post_to_render_worker({ type: 'resize', width: 1, height: 1, scale: 1 });
+        idleRenderWorker = renderWorker;
+        renderWorker = null;
+        ts_stats.render_worker = false;
+        return;
+    }
+    if (renderWorker || !can_use_render_worker()) return;
+    renderWorker = idleRenderWorker || start_render_worker();
+    idleRenderWorker = null;
+    if (!renderWorker) {// draw on the page from now on
+        useRenderWorker = false;
+        ctx = canvas.getContext('2d');
+        return;
+    }
+    ts_stats.render_worker = true;
+    lineHistory.forEach(post_action_to_render_worker);
+}
+
+function start_render_worker() {
+    var worker = null;
+    try {
+        worker = new Worker(ts_config.render_worker_scripts[0]);
+        var offscreen = canvas.transferControlToOffscreen();
+    } catch (error) {
+        if (worker) worker.terminate();
+        return null;
+    }
+    worker.onmessage = e => Object.assign(ts_stats, e.data.stats);
+    worker.onerror = stop_render_worker;
+    worker.postMessage({ type: 'init', canvas: offscreen, scripts: ts_config.render_worker_scripts.slice(1) }, [offscreen]);
+    return worker;
+}
+
+// Go back to drawing on the page if the worker failed. The transferred canvas is
+// of no use to the page anymore, so a fresh one takes its place.
+function stop_render_worker() {
+    var worker = renderWorker || idleRenderWorker;
+    if (!worker) return;
+    worker.terminate();
+    renderWorker = idleRenderWorker = null;
+    useRenderWorker = false;
+    ts_stats.render_worker = false;
+    var fresh = canvas.cloneNode(false);
+    canvas.parentNode.replaceChild(fresh, canvas);
+    canvas = fresh;
+    ctx = canvas.getContext('2d');
+    canvas.onselectstart = function() { return false; };
+    canvas.addEventListener("pointerdown", on_pointer_down);
+    canvas.addEventListener("pointermove", on_pointer_move);
+    resize();
+}
+
+function post_to_render_worker(message, transfer) {
+    if (renderWorker) renderWorker.postMessage(message, transfer || []);
+}
+
+function post_action_to_render_worker(action) {
+    if (!renderWorker) return;
+    var copy = Object.assign({}, action);
+    var transfer = [];
+    if (action.points && action.points.data) {
+        var points = action.points;
+        copy.points = { stride: points.stride, length: points.length, data: points.data.slice(0, points.length * points.stride) };
+        transfer.push(copy.points.data.buffer);
+    }
+    renderWorker.postMessage({ type: 'add', action: copy }, transfer);
+}
+
+// Hand the pending redraw to the worker and carry on as if it was drawn
+function post_render(startLine) {
+    var full = pleaseRedrawEverything;
+    if (full) {
+        if (redrawRegion) ts_stats.region_redraws++;
+        else ts_stats.full_redraws++;
+    }
+    renderWorker.postMessage({ type: 'render', start: full ? 0 : startLine, full: full, region: redrawRegion, lastClear: lastClearIndex });
+    nextLine = fullClear ? 0 : lineHistory.length;
+    nextPoint = 0;
+    pleaseRedrawEverything = false;
+    redrawRegion = null;
+    fullClear = false;
+}
+
+// ----------------------------------------- Calligraphy Fitting -----------------------------------------
+// Fitting the curves of a calligraphy stroke (fitStroke) takes long enough on big
+// strokes to drop pointer events when it runs in a frame. Finished strokes are
+// queued for FitWorker.js at pointer up instead, one job at a time, and drawn as
+// their guide line until the control points come back as action.segments. Undoing
+// a stroke takes it out of the queue, or drops the result if it is being fitted.
+// Without workers draw_action fits the stroke itself like before.
+
+var fitWorker = start_fit_worker();
+var fitQueue = [];// actions waiting to be fitted, oldest first
+var fitJob = null;// action the worker is fitting
+
+function start_fit_worker() {
+    if (typeof Worker !== 'function') return null;
+    try {
+        var worker = new Worker(ts_config.fit_worker_scripts[0]);
+    } catch (error) {
+        return null;
+    }
+    worker.onmessage = e => finish_fit(e.data.segments, e.data.ms);
+    worker.onerror = stop_fit_worker;
+    worker.postMessage({ type: 'init', scripts: ts_config.fit_worker_scripts.slice(1) });
+    return worker;
+}
+
+// Fit whatever was left on the page if the worker failed
+function stop_fit_worker() {
+    if (!fitWorker) return;
+    fitWorker.terminate();
+    fitWorker = null;
+    var waiting = fitJob ? [fitJob].concat(fitQueue) : fitQueue;
+    fitJob = null;
+    fitQueue = [];
+    waiting.forEach(action => {
+        if (action.fitting) set_calligraphy_segments(action, fitStroke(action.points.toArray()).map(curve => curve.controlPoints));
+    });
+    ts_stats.fit_queue = 0;
+}
+
+function queue_fit(action) {
+    if (!fitWorker) return;
+    action.fitting = true;
+    fitQueue.push(action);
+    next_fit();
+}
+
+function next_fit() {
+    ts_stats.fit_queue = fitQueue.length + (fitJob ? 1 : 0);
+    if (fitJob || !fitQueue.length) return;
+    fitJob = fitQueue.shift();
+    var points = fitJob.points;
+    var data = points.data.slice(0, points.length * points.stride);
+    fitWorker.postMessage({ type: 'fit', data: data, stride: points.stride }, [data.buffer]);
+}
+
+function finish_fit(segments, ms) {
+    var action = fitJob;
+    fitJob = null;
+    ts_stats.fit_ms = ms;
+    if (action.fitting) {// not undone in the meantime
+        var queued = fitQueue.indexOf(action);
+        if (queued >= 0) fitQueue.splice(queued, 1);// undone and redone while it was being fitted
+        set_calligraphy_segments(action, segments);
+    }
+    next_fit();
+}
+
+function cancel_fit(action) {
+    if (!action.fitting) return;
+    action.fitting = false;
+    var queued = fitQueue.indexOf(action);
+    if (queued >= 0) fitQueue.splice(queued, 1);
+    ts_stats.fit_queue = fitQueue.length + (fitJob ? 1 : 0);
+}
+
+function cancel_all_fits() {
+    if (fitJob) fitJob.fitting = false;
+    fitQueue.forEach(action => action.fitting = false);
+    fitQueue = [];
+    ts_stats.fit_queue = fitJob ? 1 : 0;
+}
+
+// Replace the guide line of a stroke with its fitted curves
+function set_calligraphy_segments(action, segments) {
+    action.segments = segments;
+    action.fitting = false;
+    forget_geometry(action);
+    var index = lineHistory.lastIndexOf(action);
+    if (index < 0) return;// in the redo stack, drawn with the curves if it comes back
+    invalidate_checkpoints_from(index);
+    post_to_render_worker({ type: 'fitted', index: index, segments: segments });
+    ts_redraw(get_action_bounds(action));
+}
+
+// ----------------------------------------- Tiles -----------------------------------------
+// In full card mode a canvas as big as the card costs hundreds of megabytes on long
+// cards, so the committed strokes go into TILE_SIZE square canvases in #tile_layer
+// instead. A tile is created when a stroke first touches it and scrolls with the
+// card like any other element. Once the tiles take more than TILE_MEMORY_BUDGET
+// bytes the least recently drawn ones outside the viewport are freed, they are drawn
+// again from the history when they come back into view. The main canvas keeps the
+// size of the card for layout and pointer events with a 1x1 backing store, and the
+// secondary canvas only covers the viewport.
+
+var TILE_SIZE = 512;// css pixels
+var TILE_MEMORY_BUDGET = 192 * 1024 * 1024;// canvas_memory_mb less the secondary canvas, set by resize()
+var tiledCanvas = false;// set by resize()
+var tiles = new Map();// grid_key -> {x, y, width, height, canvas, ctx, bytes, drawn}, least recently drawn first
+var staleTiles = new Set();// keys of freed tiles which had strokes on them
+var tileBytes = 0;
+var tileDpr = 1;
+var previewScale = 1;
+var tileColumns = 0, tileRows = 0;
+var cardWidth = 0, cardHeight = 0;
+var clippedTiles = [];// tiles clipped to the region of the redraw in progress
+var viewportBox = { x: 0, y: 0, width: 0, height: 0 };// part of the card the secondary canvas covers
+
+function resize_tiles(width, height, dpr, previewDpr) {
+    if (dpr != tileDpr) release_tiles();
+    tileDpr = dpr;
+    cardWidth = width;
+    cardHeight = height;
+    tileColumns = Math.ceil(width / TILE_SIZE);
+    tileRows = Math.ceil(height / TILE_SIZE);
+    ctx.canvas.width = ctx.canvas.height = 1;
+    canvas.style.width = width + 'px';
+    tileLayer.style.width = width + 'px';
+    tileLayer.style.height = height + 'px';
+    tileLayer.style.display = canvas.style.display == 'none' ? 'none' : 'block';
+    var viewWidth = Math.min(width, document.documentElement.clientWidth);
+    var viewHeight = Math.min(height, document.documentElement.clientHeight);
+    previewScale = previewDpr;
+    secondary_canvas.width = viewWidth * previewDpr;
+    secondary_canvas.height = viewHeight * previewDpr;
+    secondary_canvas.style.width = viewWidth + 'px';
+    secondary_canvas.style.height = viewHeight + 'px';
+    secondary_canvas.style.right = 'auto';
+    secondary_canvas.style.pointerEvents = 'none';// pointer events go to the main canvas, which covers the card
+    viewportBox.width = viewWidth;
+    viewportBox.height = viewHeight;
+    update_viewport(true);
+}
+
+// Drop every tile and go back to the plain canvases
+function release_tiles() {
+    for (const [key, tile] of tiles) free_tile(key, tile);
+    staleTiles.clear();
+    update_tile_stats();
+    tileLayer.style.display = 'none';
+    canvas.style.width = '';
+    secondary_canvas.style.left = secondary_canvas.style.top = secondary_canvas.style.right = '';
+    secondary_canvas.style.pointerEvents = '';
+}
+
+// Follow the viewport with the secondary canvas and bring back the tiles scrolled into view
+function update_viewport(force) {
+    if (!tiledCanvas) return;
+    var rect = canvas.getBoundingClientRect();
+    var x = Math.min(Math.max(0, -rect.left), Math.max(0, cardWidth - viewportBox.width));
+    var y = Math.min(Math.max(0, -rect.top), Math.max(0, cardHeight - viewportBox.height));
+    if (force === true || x != viewportBox.x || y != viewportBox.y) {
+        viewportBox.x = x;
+        viewportBox.y = y;
+        secondary_canvas.style.left = (rect.left + window.scrollX + x) + 'px';
+        secondary_canvas.style.top = (rect.top + window.scrollY + y) + 'px';
+        secondary_ctx.setTransform(previewScale, 0, 0, previewScale, -x * previewScale, -y * previewScale);
+        redraw_preview();
+    }
+    var region = null;
+    staleTiles.forEach(key => {
+        var tile = tile_box(key);
+        if (!boxes_overlap(tile, viewportBox)) return;
+        staleTiles.delete(key);
+        region = region ? union_boxes(region, tile) : tile;
+    });
+    if (region) ts_redraw(region);
+}
+
+function tile_box(key) {
+    return {
+        x: (Math.floor(key / 65536) - 32768) * TILE_SIZE,
+        y: (key % 65536 - 32768) * TILE_SIZE,
+        width: TILE_SIZE,
+        height: TILE_SIZE
+    };
+}
+
+function boxes_overlap(a, b) {
+    return a.x < b.x + b.width && b.x < a.x + a.width && a.y < b.y + b.height && b.y < a.y + a.height;
+}
+
+function create_tile(key) {
+    var box = tile_box(key);
+    var tileCanvas = document.createElement('canvas');
+    tileCanvas.width = tileCanvas.height = TILE_SIZE * tileDpr;
+    tileCanvas.style.position = 'absolute';
+    tileCanvas.style.left = box.x + 'px';
+    tileCanvas.style.top = box.y + 'px';
+    tileCanvas.style.width = tileCanvas.style.height = TILE_SIZE + 'px';
+    tileLayer.appendChild(tileCanvas);
+    var tileCtx = tileCanvas.getContext('2d');
+    tileCtx.setTransform(tileDpr, 0, 0, tileDpr, -box.x * tileDpr, -box.y * tileDpr);
+    var tile = { x: box.x, y: box.y, width: TILE_SIZE, height: TILE_SIZE, canvas: tileCanvas, ctx: tileCtx,
+        bytes: tileCanvas.width * tileCanvas.height * 4, drawn: false };
+    tiles.set(key, tile);
+    tileBytes += tile.bytes;
+    return tile;
+}
+
+function free_tile(key, tile) {
+    tiles.delete(key);
+    tileBytes -= tile.bytes;
+    tile.canvas.width = tile.canvas.height = 0;// let go of the pixels right away
+    tileLayer.removeChild(tile.canvas);
+}
+
+// Free the least recently drawn tiles outside the viewport until the tiles fit the budget
+function trim_tiles() {
+    for (const [key, tile] of tiles) {
+        if (tileBytes <= TILE_MEMORY_BUDGET) break;
+        if (boxes_overlap(tile, viewportBox)) continue;
+        free_tile(key, tile);
+        staleTiles.add(key);
+    }
+}
+
+// Clear the tiles a redraw is going to draw again, only inside region if given
+function begin_tile_redraw(region) {
+    clippedTiles = [];
+    if (fullClear) staleTiles.clear();
+    for (const tile of tiles.values()) {
+        if (!region) {
+            tile.ctx.save();
+            tile.ctx.setTransform(1, 0, 0, 1, 0, 0);
+            tile.ctx.clearRect(0, 0, tile.canvas.width, tile.canvas.height);
+            tile.ctx.restore();
+            tile.drawn = false;
+        }
+        else if (boxes_overlap(tile, region)) {
+            tile.ctx.save();
+            tile.ctx.beginPath();
+            tile.ctx.rect(region.x, region.y, region.width, region.height);
+            tile.ctx.clip();
+            tile.ctx.clearRect(region.x, region.y, region.width, region.height);
+            clippedTiles.push(tile);
+        }
+    }
+}
+
+function end_tile_redraw(region) {
+    clippedTiles.forEach(tile => tile.ctx.restore());
+    clippedTiles = [];
+    if (!region) {// tiles nothing was drawn on are not needed anymore
+        for (const [key, tile] of tiles) {
+            if (!tile.drawn) free_tile(key, tile);
+        }
+    }
+    trim_tiles();
+    update_tile_stats();
+}
+
+// Draw an action on every tile its ink reaches, creating the tiles it is the first to touch.
+// Freed tiles are left alone, they are drawn completely once they are visible again.
+function draw_action_on_tiles(action, i, region) {
+    if (action.type == 'D' || action.type == 'X') return;
+    var box = get_action_bounds(action);
+    if (!box || (region && !boxes_overlap(box, region))) return;
+    var fromX = Math.max(0, Math.floor(box.x / TILE_SIZE)), toX = Math.min(tileColumns - 1, Math.floor((box.x + box.width) / TILE_SIZE));
+    var fromY = Math.max(0, Math.floor(box.y / TILE_SIZE)), toY = Math.min(tileRows - 1, Math.floor((box.y + box.height) / TILE_SIZE));
+    for (var tileY = fromY; tileY <= toY; tileY++) {
+        for (var tileX = fromX; tileX <= toX; tileX++) {
+            var key = grid_key(tileX, tileY);
+            if (region && !boxes_overlap(tile_box(key), region)) continue;
+            var tile = tiles.get(key);
+            if (!tile) {
+                if (staleTiles.has(key)) continue;
+                tile = create_tile(key);
+            }
+            else {
+                tiles.delete(key);// move to the most recently drawn end
+                tiles.set(key, tile);
+            }
+            tile.drawn = true;
+            draw_action(tile.ctx, action);
+        }
+    }
+    if (!pleaseRedrawEverything) {// strokes added since the last frame, a redraw trims when it is done
+        trim_tiles();
+        update_tile_stats();
+    }
+}
+
+function update_tile_stats() {
+    ts_stats.tile_count = tiles.size;
+    ts_stats.tile_bytes = tileBytes;
+    ts_stats.stale_tiles = staleTiles.size;
+}
+
+function draw_upto_latest_point_async(startLine, startPoint, startStroke){
+    if (renderWorker && !tiledCanvas) {
+        post_render(startLine);
+        return;
+    }
+	var fullRedraw = false;//keep track if this call started a full redraw to unset pleaseRedrawEverything flag later.
+    var region = redrawRegion;
+	if (pleaseRedrawEverything) {// erase everything and draw from start
+        fullRedraw = true;
+        startLine = 0;
+        startPoint = 0;
+        if (tiledCanvas) {
+            if (region) ts_stats.region_redraws++;
+            else ts_stats.full_redraws++;
+            begin_tile_redraw(region);
+        }
+        else if (region) {// only erase and draw inside the dirty region
+            ts_stats.region_redraws++;
+            ctx.save();
+            ctx.beginPath();
+            ctx.rect(region.x, region.y, region.width, region.height);
+            ctx.clip();
+            ctx.clearRect(region.x, region.y, region.width, region.height);
+        }
+        else {
+            ts_stats.full_redraws++;
+            ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);
+        }
+	}
+    if(lastClearIndex > startLine)startLine = lastClearIndex // the last clear is where we should start from
+    if(fullRedraw){
+        var restored = tiledCanvas ? -1 : restore_checkpoint()
+        if(restored >= 0) startLine = restored + 1
+        ts_stats.replayed_actions = lineHistory.length - startLine
+    }
+    for(var i = startLine; i < lineHistory.length; i++){ //Draw
+        actionToDraw = lineHistory[i]
+        if(!actionToDraw.visible) {
+            nextPoint = 0;
+            continue;
+        }
+
+        if (tiledCanvas) draw_action_on_tiles(actionToDraw, i, region)
+        else draw_action(ctx, actionToDraw)
+        // a region redraw leaves the outside of the region untouched, so only complete canvases are kept
+        // tiles are redrawn one by one, there is no single canvas to copy
+        if(!tiledCanvas && !region && (i + 1) % CHECKPOINT_INTERVAL == 0 && !checkpoints.has(i)) take_checkpoint(i)
+        //post loop cleanup
+        if(all_drawing_finished(i)){
+            nextLine = lineHistory.length;
+            nextPoint = 0;
+        }
+        else{
+            if(lineHistory.length == 0){
+                nextLine = 0;
+            }
+            else{
+                nextLine = lineHistory.length-1;
+            }
+        }
+    }
+    if (tiledCanvas && fullRedraw) end_tile_redraw(region);
+    else if (fullRedraw && region) ctx.restore();
+    if(!strokeDelete)reset_to_main_pen_settings()
+    
+	if (fullRedraw) {//finished full redraw, now can unset redraw all flag so no more full redraws until necessary
+        pleaseRedrawEverything = false;
+        redrawRegion = null;
+        fullRedraw = false;
+        nextPoint = lineHistory.length == 0 ? 0 : nextPoint;//reset next point if out of lines
+        nextLine = lineHistory.length == 0 ? 0 : lineHistory.length
+        if(fullClear){// start again from 0.
+            nextLine = 0;
+            fullClear = false;
+        }
+	}
+}
+
+var drawingWithPressurePenOnly = false; // hack for drawing with 2 main pointers when using a presure sensitive pen
+
+// Running bounds of a stroke, updated point by point instead of scanning all points again
+function extend_bounds(bounds, x, y) {
+    if (!bounds) return { minX: x, minY: y, maxX: x, maxY: y };
+    if (x < bounds.minX) bounds.minX = x;
+    if (x > bounds.maxX) bounds.maxX = x;
+    if (y < bounds.minY) bounds.minY = y;
+    if (y > bounds.maxY) bounds.maxY = y;
+    return bounds;
+}
+
+function extend_bounds_with_points(bounds, points) {
+    for (var i = 0; i < points.length; i++) bounds = extend_bounds(bounds, points[i][0], points[i][1]);
+    return bounds;
+}
+
+function union_bounds(a, b) {
+    if (!a) return b;
+    if (!b) return a;
+    return {
+        minX: Math.min(a.minX, b.minX),
+        minY: Math.min(a.minY, b.minY),
+        maxX: Math.max(a.maxX, b.maxX),
+        maxY: Math.max(a.maxY, b.maxY)
+    };
+}
+
+function bounds_to_box(bounds, padding) {
+    return {
+        x: bounds.minX - padding,
+        y: bounds.minY - padding,
+        width: (bounds.maxX - bounds.minX) + padding * 2,
+        height: (bounds.maxY - bounds.minY) + padding * 2
+    };
+}
+
+function bounds_intersect_box(bounds, box) {
+    return bounds.maxX >= box.x && bounds.minX <= box.x + box.width &&
+        bounds.maxY >= box.y && bounds.minY <= box.y + box.height;
+}
+
+function calculateClearBox(points) {
+    if (!points.length) return {x: 0, y: 0, width: 0, height: 0};
+    
+    // Add some padding for line caps/width
+    return bounds_to_box(points.bounds(), 1);
+}
+function drawCursor(x, y) {
+    secondary_ctx.beginPath();
+    secondary_ctx.moveTo(x, y);
+    secondary_ctx.lineTo(x, y + fontSize);
+    secondary_ctx.strokeStyle = 'red';
+    secondary_ctx.lineWidth = 2;
+    secondary_ctx.stroke();
+}
+
+function startCursorBlink() {
+    clearInterval(cursorBlinkInterval);
+    drawTextOnCanvas()
+    cursorBlinkInterval = setInterval(() => {
+        textCursorVisible = !textCursorVisible;
+        drawTextOnCanvas();
+    }, 500);
+}
+
+function createBoxWithDiagonalPoints(action) {
+    const lines = action.text.split(/(?<!\\)\n/);
+    const allBoxPoints = [];
+    
+    const padding = 1;
+    const spacing = 8;
+    const lineHeight = calculateLineHeight(action.fontSize);
+
+    var fontString = "";
+    if (action.fontBold) fontString += "bold ";
+    if (action.fontItalic) fontString += "italic ";
+    fontString += action.fontSize + "px " + action.fontFamily;
+
+    ctx.font = fontString;
+    let currentY = action.y;
+    
+    // Process each line separately
+    for (let i = 0; i < lines.length; i++) {
+        const lineText = lines[i];
+        
+        const textWidth = ctx.measureText(lineText).width;
+        
+        // Calculate box for this line
+        const x = action.x - padding;
+        const y = currentY - padding;
+        const width = textWidth + padding * 2;
+        const height = action.fontSize + padding * 2;
+        
+        // Start with box corner points for this line
+        const points = [
+            [x, y],
+            [x + width, y],  
+            [x + width, y + height],
+            [x, y + height]
+        ];
+        
+        // Calculate diagonal lines for this box
+        const diagonalLength = Math.sqrt(width * width + height * height);
+        
+        // Generate lines in both directions
+        const directions = [
+            // Direction 1: y = x + b (top-left to bottom-right)
+            (i) => ({
+                startX: x + i,
+                startY: y,
+                endX: x + i + diagonalLength,
+                endY: y + diagonalLength,
+                isOpposite: false
+            }),
+            // Direction 2: y = -x + b (top-right to bottom-left)  
+            (i) => ({
+                startX: x + diagonalLength - i,
+                startY: y,
+                endX: x - i,
+                endY: y + diagonalLength,
+                isOpposite: true
+            })
+        ];
+        
+        directions.forEach(getLine => {
+            for (let j = -diagonalLength; j < diagonalLength; j += spacing) {
+                const line = getLine(j);
+                const intersection = lineIntersectsRect(
+                    line.startX, line.startY, line.endX, line.endY, 
+                    x, y, width, height,
+                    line.isOpposite
+                );
+                
+                if (intersection) {
+                    const [segmentStart, segmentEnd] = intersection;
+                    points.push(segmentStart, segmentEnd);
+                }
+            }
+        });
+        
+        // Add this line's box points to the combined array
+        allBoxPoints.push(...points);
+        
+        // Move Y position down for next line
+        currentY += lineHeight;
+    }
+    
+    return PointBuffer.from(allBoxPoints, 2);
+}
+
+// Updated unified intersection function
+function lineIntersectsRect(x1, y1, x2, y2, rectX, rectY, rectW, rectH, isOpposite = false) {
+    // Line equation: y = mx + b where m = 1 for normal, m = -1 for opposite
+    const m = isOpposite ? -1 : 1;
+    const b = y1 - m * x1;
+    
+    const intersections = [];
+    
+    // Intersection with left edge (x = rectX)
+    const yAtLeft = m * rectX + b;
+    if (yAtLeft >= rectY && yAtLeft <= rectY + rectH) {
+        if (x1 <= rectX && rectX <= x2 || x2 <= rectX && rectX <= x1) {
+            intersections.push([rectX, yAtLeft]);
+        }
+    }
+    
+    // Intersection with right edge (x = rectX + rectW)
+    const yAtRight = m * (rectX + rectW) + b;
+    if (yAtRight >= rectY && yAtRight <= rectY + rectH) {
+        if (x1 <= rectX + rectW && rectX + rectW <= x2 || 
+            x2 <= rectX + rectW && rectX + rectW <= x1) {
+            intersections.push([rectX + rectW, yAtRight]);
+        }
+    }
+    
+    // Intersection with top edge (y = rectY)
+    const xAtTop = (rectY - b) / m;
+    if (xAtTop >= rectX && xAtTop <= rectX + rectW) {
+        if (y1 <= rectY && rectY <= y2 || y2 <= rectY && rectY <= y1) {
+            intersections.push([xAtTop, rectY]);
+        }
+    }
+    
+    // Intersection with bottom edge (y = rectY + rectH)
+    const xAtBottom = (rectY + rectH - b) / m;
+    if (xAtBottom >= rectX && xAtBottom <= rectX + rectW) {
+        if (y1 <= rectY + rectH && rectY + rectH <= y2 || 
+            y2 <= rectY + rectH && rectY + rectH <= y1) {
+            intersections.push([xAtBottom, rectY + rectH]);
+        }
+    }
+    
+    if (intersections.length >= 2) {
+        intersections.sort((a, b) => a[0] - b[0]);
+        return [intersections[0], intersections[1]];
+    }
+    
+    return null;
+}
+
+function submitCurrentText() {
+    if (currentAction && currentAction.text && currentAction.text.length > 0) {
+
+        // Create and save box around the text
+        currentAction.points = createBoxWithDiagonalPoints(currentAction);
+        // Save the text entry
+        add_action_to_history(currentAction)
+        
+        // Clear current entry
+        textBox.blur()
+        clear_preview_canvas();
+    }
+    textBox.value = ""
+}
+
+
+function pointerDownLineText(e) {
+    const rect = canvas.getBoundingClientRect();
+    // the main canvas only keeps its size for layout while the strokes are in tiles
+    const scaleX = tiledCanvas ? 1 : ctx.canvas.width / rect.width;
+    const scaleY = tiledCanvas ? 1 : ctx.canvas.height / rect.height;
+    
+    const clickX = (e.clientX - rect.left) * scaleX;
+    const clickY = (e.clientY - rect.top) * scaleY;
+    
+    submitCurrentText();
+    
+    var pen = penStyles[activePenIndex];
+    currentAction = {
+        points: [],
+        x: clickX,
+        y: clickY,
+        text: "",
+        color: pen.rgba,
+        width: pen.width,
+        opacity: pen.opacity,
+        visible: true,
+        type: 'T', // 'text'
+        fontFamily: fontFamily,
+        fontSize: fontSize,
+        fontBold: fontBold,
+        fontItalic: fontItalic
+    };
+    textBox.focus()
+};
+// Prevent arrow key cursor movement
+textBox.addEventListener('keydown', e => {
+    if(!textWriting)return
+    if (['ArrowLeft', 'ArrowRight', 'ArrowUp', 'ArrowDown'].includes(e.key)) {
+        e.preventDefault();
+    }
+    else if (e.key === 'Escape') {
+        submitCurrentText();
+    }
+    else if (e.altKey){
+        e.preventDefault()
+    }
+});
+textBox.addEventListener('input', () => {
+    if (!currentAction || !textWriting) return;
+    
+    currentAction.text = textBox.value
+    drawTextOnCanvas();
+});
+
+textBox.addEventListener('focus', () => startCursorBlink());
+textBox.addEventListener('blur', () => {clearInterval(cursorBlinkInterval); submitCurrentText();});
+// Prevent canvas click from stealing focus
+canvas_wrapper.addEventListener('pointerdown', e => {
+    if(!textWriting)return;
+    e.preventDefault(); // Prevent focus loss    
+    // Ensure textarea stays focused
+    textBox.focus();
+});
+
+// Helper functions for calculations
+function calculateCursorOffset(fontSize) {
+    // Cursor offset should be proportional to font size
+    return Math.max(1, Math.floor(fontSize / 15));
+}
+
+function drawTextOnCanvas() {
+    if(!textWriting)return;
+    clear_preview_canvas();
+        
+    // Draw current entry text (dynamic)
+    if (currentAction) {
+        var lines = drawTextFromAction(secondary_ctx, currentAction)
+        
+        // Draw cursor if visible
+        if (textCursorVisible) {
+            const textWidth = lines ? secondary_ctx.measureText(lines[lines.length-1]).width + calculateCursorOffset(currentAction.fontSize) : 0;
+            var currentLine = lines ? lines.length-1 : 0
+            drawCursor(currentAction.x + textWidth, currentAction.y + currentLine * calculateLineHeight(currentAction.fontSize));
+        }
+    }
+}
+
+function pointerDownLine(e) {
+	if (e.pointerType[0] == 'p' && pressureSensitivity) { drawingWithPressurePenOnly = true }
+	else if ( drawingWithPressurePenOnly) { return; }
+    var pen = penStyles[activePenIndex];
+    if(!isPointerDown){
+        event.preventDefault();
+        currentAction = {
+            points: new PointBuffer(4),
+            color: pen.rgba,
+            width: pen.width,
+            opacity: pen.opacity,
+            visible: true,
+            type: perfectFreehand ? 'P' : 'L', // 'simple', 'perfect'
+        };
+        previewDrawn = 0
+        previewSegmentBounds = []
+        reset_prediction()
+        push_line_point(e)
+        if(perfectFreehand){
+            currentStroke = new IncrementalStroke(getFreeDrawOptions(currentAction.points, currentAction.width))
+            reset_preview()
+        }
+        start_drawing();
+        request_preview(1)
+    }
+}
+
+// [x, y, pressure for perfect freehand, width for simple lines]
+function push_line_point(e) {
+    var penPressure = e.pointerType[0] == 'p' && pressureSensitivity;
+    currentAction.points.push(
+        e.offsetX,
+        e.offsetY,
+        penPressure ? e.pressure : 2,
+        penPressure ? (1.0 + e.pressure * currentAction.width * 2) : currentAction.width);
+    currentAction.bounds = extend_bounds(currentAction.bounds, e.offsetX, e.offsetY)
+    track_sample(e)
+}
+
+// Draw the segments the points since the last frame added to a simple line,
+// each from the midpoint before its point to the midpoint after it.
+// Segments of the same width share one stroke() call.
+function draw_line_preview() {
+    var points = currentAction.points;
+    for (var p3 = previewDrawn; p3 < points.length; p3++) track_preview_segment(p3, Math.max(p3 - 2, 0), points.width(p3));
+    stroke_line_segments(previewDrawn, points.length);
+    previewDrawn = points.length;
+}
+
+function stroke_line_segments(from, to) {
+    var points = currentAction.points;
+    var runWidth = null;
+    for (var p3 = from; p3 < to; p3++) {
+        var p1 = Math.max(p3 - 2, 0);
+        var p2 = Math.max(p3 - 1, 0);
+        if (points.width(p3) !== runWidth) {
+            if (runWidth !== null) secondary_ctx.stroke();
+            runWidth = points.width(p3);
+            secondary_ctx.lineWidth = runWidth;
+            secondary_ctx.beginPath();
+        }
+        secondary_ctx.moveTo(points.x(p1) + (points.x(p2) - points.x(p1)) / 2, points.y(p1) + (points.y(p2) - points.y(p1)) / 2);//midpoint calculation for x and y
+        secondary_ctx.quadraticCurveTo(points.x(p2), points.y(p2), points.x(p2) + (points.x(p3) - points.x(p2)) / 2, points.y(p2) + (points.y(p3) - points.y(p2)) / 2);
+    }
+    if (runWidth !== null) secondary_ctx.stroke();
+}
+
+function pointerMoveLine(e) {
+	if (e.pointerType[0] != 'p' && drawingWithPressurePenOnly) { return; }
+    var samples = get_pointer_samples(e)
+    samples.forEach(push_line_point)
+    update_prediction(e)
+    request_preview(samples.length)
+}
+
+function pointerUpLine(e) {
+    /* Needed for the last bit of the drawing. */
+	if (e.pointerType[0] != 'p' && drawingWithPressurePenOnly) { return; }
+    push_line_point(e)// the preview is cleared below, the stroke is drawn on the main canvas next frame
+    add_action_to_history(currentAction)
+    currentStroke = null
+    reset_preview()
+    report_prediction_error()
+    reset_prediction()
+    clear_preview_canvas();//clear the guide line in second canvas
+}
+
+var tempColor = ""; // The variable to change
+var eraseMode = false // Are we currently drawing the erase line?
+var intervalId = null; // To track the interval
+
+// Function to update the variable and display
+function updateVariable() {
+    variable += 1; // Increment the variable
+    status.textContent = `Variable Value: ${variable}`; // Update display
+}
+
+document.addEventListener('keydown', function(e) {
+    // For hold mode, start deleting when shift+d is pressed
+    if(textWriting)return;
+    if ((e.keyCode == 68 || e.key == "d") && e.shiftKey) {
+        e.preventDefault();
+        // Only activate if this is NOT a repeat event (first press)
+        if (!e.repeat) {
+            enter_stroke_delete_mode();
+        }
+    }
+
+});
+
+document.addEventListener('keyup', function(e) {
+    // For hold mode, stop deleting when shift+d is released
+    if ((e.keyCode == 68 || e.key == "d") && isDeleting) {
+        finishDelete()
+        exit_stroke_delete_mode();
+    }
+});
+// TODO chinese mode?
+// TODO make clear per side of card by marking which items have been cleared
+// TODO add merging of front into back for correct behaviour with saving draw info
+// TODO add toggle to not apply front card to the back one
+// TODO clear history button?
+document.addEventListener('keyup', function(e) {
+    // alt + z
+    if ((e.keyCode == 90 || e.key == "z") && e.altKey) {
+		e.preventDefault();
+        ts_undo();
+    }
+    // alt + y
+    if ((e.keyCode == 89 || e.keyCode == "y") && e.altKey) {
+        e.preventDefault();
+        ts_redo();
+    }
+    // /
+    if (e.key === ".") {
+        add_clear_marker();
+    }
+	// ,
+    if (e.key === ",") {
+        switch_visibility();
+    }
+    if ((e.keyCode == 84 || e.key == "t") && e.altKey) {
+        e.preventDefault();
+        switch_text_writing_mode();
+    }
+    if ((e.keyCode == 68 || e.key == "d") && e.altKey) {
+        e.preventDefault();
+        finishDelete()
+        switch_stroke_delete_mode();
+    }
+    // alt + c
+    if ((e.keyCode === 67 || e.key === "c") && e.altKey) {
+        e.preventDefault();
+        switch_calligraphy_mode();
+    }
+        // alt + x
+    if ((e.keyCode === 88 || e.key === "x") && e.altKey) {
+        e.preventDefault();
+        switch_perfect_freehand();
+    }
+    // alt + b
+    if ((e.keyCode === 66 || e.key === "b") && e.altKey) {
+        e.preventDefault();
+        switch_small_canvas();
+    }
+        // alt + 1
+    if ((e.keyCode === 49 || e.key === "1") && e.altKey) {
+        e.preventDefault();
+        activate_pen1();
+    }
+        // alt + 2
+    if ((e.keyCode === 50 || e.key === "2") && e.altKey) {
+        e.preventDefault();
+        activate_pen2();
+    }
+        // alt + 3
+    if ((e.keyCode === 51 || e.key === "3") && e.altKey) {
+        e.preventDefault();
+        activate_pen3();
+    }
+        // alt + 4
+    if ((e.keyCode === 52 || e.key === "4") && e.altKey) {
+        e.preventDefault();
+        activate_pen4();
+    }
+})
+
+// ----------------------------------------- Stroke Delete -----------------------------------------
+
+
+// ----------------------------------------- Spatial Index -----------------------------------------
+// The segments of the strokes the eraser can hit (visible, after the last clear) are
+// kept in a uniform grid, so an eraser segment is only tested against the segments
+// sharing a cell with it instead of every segment of every stroke.
+
+var GRID_CELL_SIZE = 32;
+var strokeGrid = new Map(); // cell key -> flat list of (history index, segment index) pairs
+
+function grid_key(cellX, cellY) {
+    return (cellX + 32768) * 65536 + (cellY + 32768);
+}
+
+// Calls visit(key) for every cell the bounding box of the segment (ax, ay)-(bx, by) touches
+function for_each_segment_cell(ax, ay, bx, by, visit) {
+    var minX = Math.floor(Math.min(ax, bx) / GRID_CELL_SIZE), maxX = Math.floor(Math.max(ax, bx) / GRID_CELL_SIZE);
+    var minY = Math.floor(Math.min(ay, by) / GRID_CELL_SIZE), maxY = Math.floor(Math.max(ay, by) / GRID_CELL_SIZE);
+    for (var cellX = minX; cellX <= maxX; cellX++) {
+        for (var cellY = minY; cellY <= maxY; cellY++) visit(grid_key(cellX, cellY));
+    }
+}
+
+function is_erasable(action) {
+    return action && action.visible && action.points && 'LPCT'.includes(action.type);
+}
+
+function index_stroke(index) {
+    var action = lineHistory[index];
+    if (index <= lastClearIndex || !is_erasable(action)) return;
+    if (!action.bounds) action.bounds = action.points.bounds();
+    var points = action.points;
+    for (let i = 0; i < points.length - 1; i++) {
+        for_each_segment_cell(points.x(i), points.y(i), points.x(i + 1), points.y(i + 1), key => {
+            var cell = strokeGrid.get(key);
+            if (!cell) strokeGrid.set(key, cell = []);
+            cell.push(index, i);
+        });
+    }
+}
+
+function unindex_stroke(index, action) {
+    if (!action.points) return;
+    var points = action.points;
+    for (let i = 0; i < points.length - 1; i++) {
+        for_each_segment_cell(points.x(i), points.y(i), points.x(i + 1), points.y(i + 1), key => {
+            var cell = strokeGrid.get(key);
+            if (!cell) return;
+            var kept = [];
+            for (var j = 0; j < cell.length; j += 2) {
+                if (cell[j] != index) kept.push(cell[j], cell[j + 1]);
+            }
+            if (kept.length) strokeGrid.set(key, kept);
+            else strokeGrid.delete(key);
+        });
+    }
+}
+
+function clear_stroke_index() {
+    strokeGrid = new Map();
+}
+
+function rebuild_stroke_index() {
+    clear_stroke_index();
+    for (let i = lastClearIndex + 1; i < lineHistory.length; i++) index_stroke(i);
+}
+
+// Add the history index of every indexed stroke crossed by the segment a-b to hits
+function hit_test_segment(a, b, hits) {
+    var segmentBounds = extend_bounds(extend_bounds(null, a[0], a[1]), b[0], b[1]);
+    for_each_segment_cell(a[0], a[1], b[0], b[1], key => {
+        var cell = strokeGrid.get(key);
+        if (!cell) return;
+        for (var j = 0; j < cell.length; j += 2) {
+            var index = cell[j];
+            if (hits.has(index)) continue;
+            var action = lineHistory[index];
+            if (!bounds_intersect_bounds(action.bounds, segmentBounds)) continue;
+            var points = action.points, segment = cell[j + 1];
+            if (segmentsIntersect(points.x(segment), points.y(segment), points.x(segment + 1), points.y(segment + 1), a[0], a[1], b[0], b[1])) hits.add(index);
+        }
+    });
+    return hits;
+}
+
+function bounds_intersect_bounds(a, b) {
+    return a.maxX >= b.minX && a.minX <= b.maxX && a.maxY >= b.minY && a.minY <= b.maxY;
+}
+
+function segmentsIntersect(x1, y1, x2, y2, x3, y3, x4, y4) {
+    // calculate the distance to intersection point
+    var uA = ((x4-x3)*(y1-y3) - (y4-y3)*(x1-x3)) / ((y4-y3)*(x2-x1) - (x4-x3)*(y2-y1));
+    var uB = ((x2-x1)*(y1-y3) - (y2-y1)*(x1-x3)) / ((y4-y3)*(x2-x1) - (x4-x3)*(y2-y1));
+
+    // if uA and uB are between 0-1, lines are colliding
+    return uA >= 0 && uA <= 1 && uB >= 0 && uB <= 1;
+}
+
+function pointerDownStrokeDelete(e) {
+    submitCurrentText()
+    event.preventDefault();
+    // Use solid red for delete mode, not transparent
+    currentAction = {
+        points: new PointBuffer(2),
+        color: "rgba(255, 0, 0, 1)",
+        width: 4,
+        opacity: '1',
+        visible: true,
+        type: 'D', // 'simple', 'perfect', or 'calligraphy'
+        deletedList: [], // filled while erasing
+    };
+    previewDrawn = 0;
+    secondary_ctx.strokeStyle = secondary_ctx.fillStyle = currentAction.color;
+    secondary_ctx.lineWidth = currentAction.width;
+
+    start_drawing();
+};
+
+function pointerMoveStrokeDelete(e) {
+    var samples = get_pointer_samples(e)
+    samples.forEach(sample => {
+        var mousePos = [sample.offsetX, sample.offsetY];
+        if(currentAction.points.length != 0) {
+            var lastPos = currentAction.points.point(currentAction.points.length-1)
+            if(getDist(mousePos,lastPos)>=MIN_MOUSE_DIST){
+                currentAction.points.push(mousePos[0], mousePos[1]);
+                erase_segment(lastPos, mousePos)
+            }
+        } else
+            currentAction.points.push(mousePos[0], mousePos[1]);
+    })
+    request_preview(samples.length)
+};
+
+// Erase what the newest eraser segment crosses right away, only that segment is tested
+function erase_segment(from, to) {
+    var hits = Array.from(hit_test_segment(from, to, new Set()))
+    if(!hits.length) return;
+    hits.forEach(lineIndex => {
+        lineHistory[lineIndex].visible = false;//mark as deleted
+        unindex_stroke(lineIndex, lineHistory[lineIndex])
+        currentAction.deletedList.push(lineIndex)//add reference for easy undo
+    })
+    invalidate_checkpoints_from(Math.min(...hits))
+    post_to_render_worker({ type: 'visible', indices: hits, visible: false })
+    ts_redraw(get_actions_bounds(hits))
+}
+
+// Everything erased since the pointer went down becomes a single delete action
+function commit_erase() {
+    if(currentAction.type != 'D' || !currentAction.deletedList || !currentAction.deletedList.length) return;
+    currentAction.deletedList.sort((a, b) => a - b)
+    add_action_to_history(currentAction);
+}
+
+function finishDelete(){
+    if (!strokeDelete || !currentAction.points || !currentAction.points.length) { return; }
+    stop_drawing();// the strokes were already erased while moving, this commits them
+    var pen = penStyles[activePenIndex]
+    secondary_ctx.strokeStyle = pen.rgba // active pen Color;
+    secondary_ctx.fillStyle = pen.rgba //active pen Color;
+    secondary_ctx.lineWidth = pen.width //active pen Color;
+    clear_preview_canvas();//clear the guide line in second canvas
+}
+
+function pointerUpStrokeDelete(e) {
+    finishDelete();
+};
+
+// ----------------------------------------- Perfect Freehand -----------------------------------------
+
+// The rest of the code gets loaded in from PerfectFreehand.js
+
+function med(A, B) {
+  return [(A[0] + B[0]) / 2, (A[1] + B[1]) / 2];
+}
+
+// Trim SVG path data so number are each two decimal points. This
+// improves SVG exports, and prevents rendering errors on points
+// with long decimals.
+const TO_FIXED_PRECISION = /(\s?[A-Z]?,?-?[0-9]*\.[0-9]{0,2})(([0-9]|e|-)*)/g;
+
+function getSvgPathFromStroke(points){
+  if (!points.length) {
+    return "";
+  }
+
+  const max = points.length - 1;
+
+  return points
+    .reduce(
+      (acc, point, i, arr) => {
+        if (i === max) {
+          acc.push(point, med(point, arr[0]), "L", arr[0], "Z");
+        } else {
+          acc.push(point, med(point, arr[i + 1]));
+        }
+        return acc;
+      },
+      ["M", points[0], "Q"],
+    )
+    .join(" ")
+    .replace(TO_FIXED_PRECISION, "$1");
+}
+
+// ----------------------------------------- Preview Compositor -----------------------------------------
+// The perfect freehand stroke in progress is drawn on the secondary canvas in chunks.
+// Outline points which can't change anymore become a chunk, overlapping the previous
+// chunk by a segment so no seams show. Every pointer event clears only the area the
+// tail covered before and covers now, repaints the chunks crossing it and fills the tail,
+// so the work doesn't grow with the length of the stroke.
+
+var PREVIEW_CHUNK_POINTS = 8; // final stroke points per chunk
+var previewChunks = []; // {path, bounds}
+var previewLeft = 0; // outline points on either side covered by the chunks
+var previewRight = 0;
+var previewCommitted = 0; // stroke points covered by the chunks
+var previewTailBounds = null;
+var previewTailPath = null;
+
+function reset_preview() {
+    previewChunks = [];
+    previewLeft = 0;
+    previewRight = 0;
+    previewCommitted = 0;
+    previewTailBounds = null;
+    previewTailPath = null;
+}
+
+function draw_freehand_preview() {
+    var outline = currentStroke.update(currentAction.points, true);
+    // committed only grows once the outline is built incrementally, until then the whole outline is the tail
+    if (currentStroke.committed - previewCommitted >= PREVIEW_CHUNK_POINTS) add_preview_chunk(currentStroke);
+    var tail = previewChunks.length ? get_preview_tail(currentStroke) : outline;
+    if (!tail.length) return;
+    var tailBounds = extend_bounds_with_points(null, tail);
+    var dirty = bounds_to_box(union_bounds(previewTailBounds, tailBounds), 2);// anti aliasing goes a bit past the outline
+    previewTailBounds = tailBounds;
+
+    secondary_ctx.save();
+    secondary_ctx.beginPath();
+    secondary_ctx.rect(dirty.x, dirty.y, dirty.width, dirty.height);
+    secondary_ctx.clip();
+    secondary_ctx.clearRect(dirty.x, dirty.y, dirty.width, dirty.height);
+    previewChunks.forEach(chunk => {
+        if (bounds_intersect_box(chunk.bounds, dirty)) secondary_ctx.fill(chunk.path);
+    });
+    previewTailPath = getPathFromStroke(tail);
+    secondary_ctx.fill(previewTailPath);
+    secondary_ctx.restore();
+}
+
+function add_preview_chunk(stroke) {
+    var points = stroke.left.slice(Math.max(previewLeft - 2, 0));
+    for (var i = stroke.right.length - 1; i >= Math.max(previewRight - 2, 0); i--) points.push(stroke.right[i]);
+    if (!previewChunks.length) points = points.concat(stroke.startCap);
+    previewChunks.push({ path: getPathFromStroke(points), bounds: extend_bounds_with_points(null, points) });
+    previewLeft = stroke.left.length;
+    previewRight = stroke.right.length;
+    previewCommitted = stroke.committed;
+}
+
+// Everything after the chunks: the rest of the committed outline points, the tail and the end cap
+function get_preview_tail(stroke) {
+    var tail = stroke.left.slice(Math.max(previewLeft - 2, 0)).concat(stroke.tailLeft, stroke.endCap);
+    for (var i = stroke.tailRight.length - 1; i >= 0; i--) tail.push(stroke.tailRight[i]);
+    for (var j = stroke.right.length - 1; j >= Math.max(previewRight - 2, 0); j--) tail.push(stroke.right[j]);
+    return tail;
+}
+
+function getFreeDrawSvgPath(inputPoints, width, complete) {
+  return getSvgPathFromStroke(getStroke(inputPoints, getFreeDrawOptions(inputPoints, width, complete)));
+}
+
+/*
+ -------------------------------- Caligrapher ------------------------------------------
+ Created By: August Toman-Yih
+ Git Repository: https://github.com/atomanyih/Calligrapher
+*/
+/* ------------------------------        script.js        -----------------------------*/
+
+// The rest of the code gets loaded in from Caligrapher.js
+
+//Modified to work with current canvas and board
+//share the same canvas with pressure drawing
+ /*var canvas = document.getElementById('canvas'),
+    width = canvas.width,
+    height = canvas.height,
+    context = canvas.getContext("2d");
+	*/
+
+//FIXME REORGANIZE EBERYTING
+//--- constants ---//
+WEIGHT = 15;
+MIN_MOUSE_DIST = 5;
+SPLIT_THRESHOLD = 8;
+SQUARE_SIZE = 300;
+
+// Continue the guide line of the current path with the points added since the last frame
+function drawCurrentPath() {
+    var points = currentAction.points;
+    var from = Math.max(previewDrawn - 1, 0);
+    if(currentAction.type == 'D') secondary_ctx.lineWidth = 4;
+    else for(var i = previewDrawn; i < points.length; i++) track_preview_segment(i, Math.max(i - 1, 0), secondary_ctx.lineWidth);
+    stroke_guide_line(from, points.length);
+    previewDrawn = points.length;
+}
+
+function stroke_guide_line(from, to) {
+    var points = currentAction.points;
+    secondary_ctx.beginPath();
+    secondary_ctx.moveTo(points.x(from),points.y(from));
+    for(var i = from + 1; i<to; i++) {
+        secondary_ctx.lineTo(points.x(i),points.y(i));
+    } 
+    secondary_ctx.stroke();
+}
+
+function pointerDownCaligraphy(e) {
+    event.preventDefault();//don't paint anything when clicking on buttons, especially for undo to work
+    var pen = penStyles[activePenIndex];
+    currentAction = {
+        points: new PointBuffer(2),
+        color: pen.rgba,
+        width: pen.width,
+        opacity: pen.opacity,
+        visible: true,
+        type: 'C', // 'simple', 'perfect', or 'calligraphy'
+    };
+    previewDrawn = 0;
+    previewSegmentBounds = [];
+    reset_prediction();
+    start_drawing();
+};
+
+function pointerMoveCaligraphy(e) {
+    var samples = get_pointer_samples(e)
+    samples.forEach(sample => {
+        var mousePos = [sample.offsetX, sample.offsetY];
+        track_sample(sample)
+        if(currentAction.points.length != 0) {
+            if(getDist(mousePos,currentAction.points.point(currentAction.points.length-1))>=MIN_MOUSE_DIST)
+                currentAction.points.push(mousePos[0], mousePos[1]);
+        } else
+            currentAction.points.push(mousePos[0], mousePos[1]);
+    })
+    update_prediction(e)
+    request_preview(samples.length)
+};
+
+function pointerUpCaligraphy(e) {
+    stop_drawing();
+    if (!currentAction.points || !currentAction.points.length) { return; }
+    
+    queue_fit(currentAction)
+    add_action_to_history(currentAction)
+    clear_preview_canvas();//clear the guide line in second canvas
+    report_prediction_error()
+    reset_prediction()
+};
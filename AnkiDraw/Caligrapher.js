@@ -52,7 +52,7 @@ BezierShape.prototype.draw = function(ctx) {
     // update_line_draw_settings(get_no_alpha(save), ctx.lineWidth)
     // ctx.globalCompositeOperation = "destination-out";
     // ctx.fill(path);
-    update_line_draw_settings(get_no_alpha(save), ctx.lineWidth)
+    update_line_draw_settings(get_no_alpha(save), ctx.lineWidth, null, ctx)
     ctx.globalCompositeOperation = "source-over";
     ctx.fill(path);
 };
@@ -405,7 +405,7 @@ Bezier.prototype.drawPlain = function(ctx) {
         // update_line_draw_settings(get_no_alpha(save), ctx.lineWidth)
         // ctx.globalCompositeOperation = "destination-out";
         // ctx.stroke(path);
-        update_line_draw_settings(get_no_alpha(save), ctx.lineWidth)
+        update_line_draw_settings(get_no_alpha(save), ctx.lineWidth, null, ctx)
         ctx.globalCompositeOperation = "source-over";
         ctx.stroke(path);
     }
@@ -554,7 +554,7 @@ function drawBezier(curve,wid,wF,ctx) {
     // ctx.globalCompositeOperation = "destination-out";
     // ctx.fill(path);
 
-    update_line_draw_settings(get_no_alpha(save), ctx.lineWidth)
+    update_line_draw_settings(get_no_alpha(save), ctx.lineWidth, null, ctx)
     ctx.globalCompositeOperation = "source-over";
     ctx.fill(path);
 }
@@ -637,45 +637,47 @@ function parameterizeByLength(chord, curve) {
     return normalizeList(ts);
 }
 
-function coefficientHelper(chord,ts) { //bad name
-    var c00 = 0, c01 = 0, c02x = 0, c02y = 0,
-        c10 = 0, c11 = 0, c12x = 0, c12y = 0,
-        x0 = chord[0][0],
-        y0 = chord[0][1],
-        x3 = chord[chord.length-1][0],
-        y3 = chord[chord.length-1][1];
-        
+// Fit the two inner control points to the chord by least squares, the end points
+// stay where the chord starts and ends. The normal equations are one symmetric 2x2
+// system shared by x and y, so its Bernstein basis sums are taken in a single pass
+// over the chord and solved in closed form, without building any matrix.
+function leastSquaresFit(chord,ts) {
+    var first = chord[0],
+        last = chord[chord.length-1];
+    if(chord.length < 4)
+        return straightBezier(first,last);
+    var x0 = first[0], y0 = first[1],
+        x3 = last[0], y3 = last[1],
+        a00 = 0, a01 = 0, a11 = 0,
+        rx1 = 0, ry1 = 0, rx2 = 0, ry2 = 0;
     for(var i = 0; i<ts.length; i++) {
         var t = ts[i],
-            px = chord[i][0],
-            py = chord[i][1];
-        c00 += 3*Math.pow(t,2)*Math.pow(1-t,4); //I'm doing it the dumb way cause it's easier to read
-        c01 += 3*Math.pow(t,3)*Math.pow(1-t,3);
-        c02x += t*Math.pow(1-t,2)*(px - Math.pow(1-t,3) * x0 - Math.pow(t,3) * x3);
-        c02y += t*Math.pow(1-t,2)*(py - Math.pow(1-t,3) * y0 - Math.pow(t,3) * y3);
-        
-        c10 += 3*Math.pow(t,3)*Math.pow(1-t,3);
-        c11 += 3*Math.pow(t,4)*Math.pow(1-t,2);
-        c12x += Math.pow(t,2)*(1-t)*(px - Math.pow(1-t,3) * x0 - Math.pow(t,3) * x3);
-        c12y += Math.pow(t,2)*(1-t)*(py - Math.pow(1-t,3) * y0 - Math.pow(t,3) * y3);
+            u = 1-t,
+            b0 = u*u*u,
+            b1 = 3*t*u*u,
+            b2 = 3*t*t*u,
+            b3 = t*t*t,
+            px = chord[i][0] - b0*x0 - b3*x3,
+            py = chord[i][1] - b0*y0 - b3*y3;
+        a00 += b1*b1;
+        a01 += b1*b2;
+        a11 += b2*b2;
+        rx1 += b1*px;
+        ry1 += b1*py;
+        rx2 += b2*px;
+        ry2 += b2*py;
     }
-    return [[[c00,c01,c02x],[c10,c11,c12x]],
-            [[c00,c01,c02y],[c10,c11,c12y]]];
+    var det = a00*a11 - a01*a01;
+    if(!(Math.abs(det) > 0)) //all points at the same parameter, nothing to fit
+        return straightBezier(first,last);
+    return new Bezier([first,
+        [(rx1*a11 - a01*rx2)/det, (ry1*a11 - a01*ry2)/det],
+        [(a00*rx2 - a01*rx1)/det, (a00*ry2 - a01*ry1)/det],
+        last]);
 }
 
-function leastSquaresFit(chord,ts) { //IT FUCKIN WORKS FUCK YEAAAAAAAH
-    if(chord.length < 4) {
-        var c1 = chord[0],
-            c4 = chord[chord.length-1],
-            c2 = midpoint(c1,c4,0.25),
-            c3 = midpoint(c1,c4,0.75);
-        return new Bezier([c1,c2,c3,c4]);
-    }
-    var cs = coefficientHelper(chord,ts),
-        xs = gaussianElimination(cs[0]),
-        ys = gaussianElimination(cs[1]);
-    
-    return new Bezier([chord[0], [xs[0],ys[0]], [xs[1],ys[1]], chord[chord.length-1]]);
+function straightBezier(c1,c4) {
+    return new Bezier([c1,midpoint(c1,c4,0.25),midpoint(c1,c4,0.75),c4]);
 }
 
 function getMaxErrorPoint(chord,ts,curve) {
@@ -837,11 +839,20 @@ Stroke.prototype.drawPlain = function(ctx) {
     // ctx.globalCompositeOperation = "destination-out";
     // ctx.stroke(path);
 
-    update_line_draw_settings(get_no_alpha(save), ctx.lineWidth)
+    update_line_draw_settings(get_no_alpha(save), ctx.lineWidth, null, ctx)
     ctx.globalCompositeOperation = "source-over";
     ctx.stroke(path);
 };
 
+// Drawing a stroke evaluates the corner rules and samples the width of every curve,
+// so it is drawn once on an OutlineRecorder and the paths it filled are kept. Filling
+// them in order gives the same stroke without any of that work.
+Stroke.prototype.getOutline = function(width) {
+    var recorder = new OutlineRecorder();
+    this.draw(width, recorder);
+    return recorder.paths;
+};
+
 Stroke.prototype.draw = function(width, ctx) {
     if(this.segments.length == 1){ //Basic Stroke
         drawBasicStroke(this.segments[0],width,ctx);
@@ -850,6 +861,70 @@ Stroke.prototype.draw = function(width, ctx) {
     }
 };
 
+/**
+ * Stands in for the canvas context while a stroke is drawn and keeps every path
+ * passed to fill(), with the transform of the moment applied (corners are drawn
+ * translated, rotated and scaled). Paths built on the context itself are never
+ * filled by the stroke drawing code, so those calls do nothing here.
+ */
+function OutlineRecorder() {
+    this.paths = [];
+    this.transform = {a: 1, b: 0, c: 0, d: 1, e: 0, f: 0};
+    this.stack = [];
+    this.strokeStyle = this.fillStyle = "rgba(0,0,0,1)";
+    this.lineWidth = 1;
+    this.lineJoin = this.lineCap = "round";
+    this.globalCompositeOperation = "source-over";
+}
+
+OutlineRecorder.prototype.fill = function(path) {
+    var m = this.transform;
+    if(m.a == 1 && m.b == 0 && m.c == 0 && m.d == 1 && m.e == 0 && m.f == 0) {
+        this.paths.push(path);
+        return;
+    }
+    var transformed = new Path2D();
+    transformed.addPath(path, m);
+    this.paths.push(transformed);
+};
+
+OutlineRecorder.prototype.save = function() {
+    this.stack.push(Object.assign({}, this.transform));
+};
+
+OutlineRecorder.prototype.restore = function() {
+    if(this.stack.length) this.transform = this.stack.pop();
+};
+
+OutlineRecorder.prototype.translate = function(x,y) {
+    var m = this.transform;
+    m.e += m.a*x + m.c*y;
+    m.f += m.b*x + m.d*y;
+};
+
+OutlineRecorder.prototype.rotate = function(angle) {
+    var m = this.transform,
+        cos = Math.cos(angle),
+        sin = Math.sin(angle),
+        a = m.a, b = m.b;
+    m.a = a*cos + m.c*sin;
+    m.b = b*cos + m.d*sin;
+    m.c = m.c*cos - a*sin;
+    m.d = m.d*cos - b*sin;
+};
+
+OutlineRecorder.prototype.scale = function(x,y) {
+    var m = this.transform;
+    m.a *= x;
+    m.b *= x;
+    m.c *= y;
+    m.d *= y;
+};
+
+OutlineRecorder.prototype.beginPath = OutlineRecorder.prototype.moveTo =
+OutlineRecorder.prototype.lineTo = OutlineRecorder.prototype.bezierCurveTo =
+OutlineRecorder.prototype.closePath = function() {};
+
 function drawCompoundStroke(stroke,width,ctx) { //FIXME copypasta
     var numSegments = stroke.segments.length;
 
@@ -0,0 +1,20 @@
+/* ------------------------------         FitWorker          ------------------------------*/
+// Fits the curves of finished calligraphy strokes for the page, see queue_fit() in
+// Blackboard.js. A job is the flat points of one stroke, the answer the control
+// points of its curves. Caligrapher.js is loaded on 'init'.
+
+self.onmessage = function (e) {
+    var message = e.data;
+    switch (message.type) {
+        case 'init':
+            importScripts.apply(self, message.scripts);
+            break;
+        case 'fit':
+            var start = performance.now();
+            var chord = [];
+            for (var i = 0; i < message.data.length; i += message.stride) chord.push([message.data[i], message.data[i + 1]]);
+            var segments = fitStroke(chord).map(curve => curve.controlPoints);
+            self.postMessage({ segments: segments, ms: performance.now() - start });
+            break;
+    }
+};
@@ -49,28 +49,68 @@ var FIXED_PI = PI + 0.0001;
  */
  function getStrokeOutlinePoints(points, options) {
     if (options === void 0) { options = {}; }
-    var _a = options.size, size = _a === void 0 ? 16 : _a, _b = options.smoothing, smoothing = _b === void 0 ? 0.5 : _b, _c = options.thinning, thinning = _c === void 0 ? 0.5 : _c, _d = options.simulatePressure, simulatePressure = _d === void 0 ? true : _d, _e = options.easing, easing = _e === void 0 ? function (t) { return t; } : _e, _f = options.start, start = _f === void 0 ? {} : _f, _g = options.end, end = _g === void 0 ? {} : _g, _h = options.last, isComplete = _h === void 0 ? false : _h;
-    var _j = start.cap, capStart = _j === void 0 ? true : _j, _k = start.taper, taperStart = _k === void 0 ? 0 : _k, _l = start.easing, taperStartEase = _l === void 0 ? function (t) { return t * (2 - t); } : _l;
-    var _m = end.cap, capEnd = _m === void 0 ? true : _m, _o = end.taper, taperEnd = _o === void 0 ? 0 : _o, _p = end.easing, taperEndEase = _p === void 0 ? function (t) { return --t * t * t + 1; } : _p;
+    var o = getOutlineOptions(options);
     // We can't do anything with an empty array or a stroke with negative size.
-    if (points.length === 0 || size <= 0) {
+    if (points.length === 0 || o.size <= 0) {
         return [];
     }
     // The total length of the line
     var totalLength = points[points.length - 1].runningLength;
-    // The minimum allowed distance between points (squared)
-    var minDistance = Math.pow(size * smoothing, 2);
-    // Our collected left and right points
-    var leftPts = [];
-    var rightPts = [];
+    var state = startOutline(points, o);
+    /*
+      Find the outline's left and right points
+  
+      Iterating through the points and populate the rightPts and leftPts arrays,
+      skipping the first and last pointsm, which will get caps later on.
+    */
+    for (var i = 0; i < points.length; i++) {
+        addOutlinePoint(points, i, totalLength, state, o);
+    }
+    var caps = getOutlineCaps(points, state, state.leftPts[0], state.rightPts[0], o);
+    if (caps.dot) {
+        return caps.dot;
+    }
+    /*
+      Return the points in the correct winding order: begin on the left side, then
+      continue around the end cap, then come back along the right side, and finally
+      complete the start cap.
+    */
+    return state.leftPts.concat(caps.endCap, state.rightPts.reverse(), caps.startCap);
+}
+/**
+ * ## getOutlineOptions
+ * @description Fill in the defaults for the options of `getStrokeOutlinePoints`.
+ * @param options An object with options.
+ * @internal
+ */
+function getOutlineOptions(options) {
+    var _a = options.size, size = _a === void 0 ? 16 : _a, _b = options.smoothing, smoothing = _b === void 0 ? 0.5 : _b, _c = options.thinning, thinning = _c === void 0 ? 0.5 : _c, _d = options.simulatePressure, simulatePressure = _d === void 0 ? true : _d, _e = options.easing, easing = _e === void 0 ? function (t) { return t; } : _e, _f = options.start, start = _f === void 0 ? {} : _f, _g = options.end, end = _g === void 0 ? {} : _g, _h = options.last, isComplete = _h === void 0 ? false : _h;
+    var _j = start.cap, capStart = _j === void 0 ? true : _j, _k = start.taper, taperStart = _k === void 0 ? 0 : _k, _l = start.easing, taperStartEase = _l === void 0 ? function (t) { return t * (2 - t); } : _l;
+    var _m = end.cap, capEnd = _m === void 0 ? true : _m, _o = end.taper, taperEnd = _o === void 0 ? 0 : _o, _p = end.easing, taperEndEase = _p === void 0 ? function (t) { return --t * t * t + 1; } : _p;
+    return {
+        size: size, smoothing: smoothing, thinning: thinning, simulatePressure: simulatePressure, easing: easing, isComplete: isComplete,
+        capStart: capStart, taperStart: taperStart, taperStartEase: taperStartEase,
+        capEnd: capEnd, taperEnd: taperEnd, taperEndEase: taperEndEase,
+        // The minimum allowed distance between points (squared)
+        minDistance: Math.pow(size * smoothing, 2),
+    };
+}
+/**
+ * ## startOutline
+ * @description Get the state `addOutlinePoint` starts from.
+ * @param points An array of StrokePoints as returned from `getStrokePoints`.
+ * @param o The options as returned from `getOutlineOptions`.
+ * @internal
+ */
+function startOutline(points, o) {
     // Previous pressure (start with average of first five pressures,
     // in order to prevent fat starts for every line. Drawn lines
     // almost always start slow!
     var prevPressure = points.slice(0, 10).reduce(function (acc, curr) {
         var pressure = curr.pressure;
-        if (simulatePressure) {
+        if (o.simulatePressure) {
             // Speed of change - how fast should the the pressure changing?
-            var sp = min(1, curr.distance / size);
+            var sp = min(1, curr.distance / o.size);
             // Rate of change - how much of a change is there?
             var rp = min(1, 1 - sp);
             // Accelerate the pressure
@@ -78,126 +118,147 @@ var FIXED_PI = PI + 0.0001;
         }
         return (acc + pressure) / 2;
     }, points[0].pressure);
-    // The current radius
-    var radius = getStrokeRadius(size, thinning, points[points.length - 1].pressure, easing);
-    // The radius of the first saved point
-    var firstRadius = undefined;
-    // Previous vector
-    var prevVector = points[0].vector;
-    // Previous left and right points
-    var pl = points[0].point;
-    var pr = pl;
+    return {
+        // Our collected left and right points
+        leftPts: [],
+        rightPts: [],
+        prevPressure: prevPressure,
+        // The current radius
+        radius: getStrokeRadius(o.size, o.thinning, points[points.length - 1].pressure, o.easing),
+        // The radius of the first saved point
+        firstRadius: undefined,
+        // Previous vector
+        prevVector: points[0].vector,
+        // Previous left and right points
+        pl: points[0].point,
+        pr: points[0].point,
+    };
+}
+/**
+ * ## addOutlinePoint
+ * @description Add the left and right outline points of the stroke point at index i to the state.
+ * @param points An array of StrokePoints as returned from `getStrokePoints`.
+ * @param i The index of the point to add.
+ * @param totalLength The running length of the last point of the line.
+ * @param state The state as returned from `startOutline`, updated in place.
+ * @param o The options as returned from `getOutlineOptions`.
+ * @internal
+ */
+function addOutlinePoint(points, i, totalLength, state, o) {
+    var pressure = points[i].pressure;
+    var _q = points[i], point = _q.point, vector = _q.vector, distance = _q.distance, runningLength = _q.runningLength;
     // Temporary left and right points
-    var tl = pl;
-    var tr = pr;
-    // let short = true
+    var tl, tr;
+    // Removes noise from the end of the line
+    if (i < points.length - 1 && totalLength - runningLength < 3) {
+        return;
+    }
     /*
-      Find the outline's left and right points
-  
-      Iterating through the points and populate the rightPts and leftPts arrays,
-      skipping the first and last pointsm, which will get caps later on.
+      Calculate the radius
+
+      If not thinning, the current point's radius will be half the size; or
+      otherwise, the size will be based on the current (real or simulated)
+      pressure.
     */
-    for (var i = 0; i < points.length; i++) {
-        var pressure = points[i].pressure;
-        var _q = points[i], point = _q.point, vector = _q.vector, distance = _q.distance, runningLength = _q.runningLength;
-        // Removes noise from the end of the line
-        if (i < points.length - 1 && totalLength - runningLength < 3) {
-            continue;
-        }
-        /*
-          Calculate the radius
-    
-          If not thinning, the current point's radius will be half the size; or
-          otherwise, the size will be based on the current (real or simulated)
-          pressure.
-        */
-        if (thinning) {
-            if (simulatePressure) {
-                // If we're simulating pressure, then do so based on the distance
-                // between the current point and the previous point, and the size
-                // of the stroke. Otherwise, use the input pressure.
-                var sp = min(1, distance / size);
-                var rp = min(1, 1 - sp);
-                pressure = min(1, prevPressure + (rp - prevPressure) * (sp * RATE_OF_PRESSURE_CHANGE));
-            }
-            radius = getStrokeRadius(size, thinning, pressure, easing);
-        }
-        else {
-            radius = size / 2;
-        }
-        if (firstRadius === undefined) {
-            firstRadius = radius;
-        }
-        /*
-          Apply tapering
-    
-          If the current length is within the taper distance at either the
-          start or the end, calculate the taper strengths. Apply the smaller
-          of the two taper strengths to the radius.
-        */
-        var ts = runningLength < taperStart
-            ? taperStartEase(runningLength / taperStart)
-            : 1;
-        var te = totalLength - runningLength < taperEnd
-            ? taperEndEase((totalLength - runningLength) / taperEnd)
-            : 1;
-        radius = Math.max(0.01, radius * Math.min(ts, te));
-        /* Add points to left and right */
-        // Handle the last point
-        if (i === points.length - 1) {
-            var offset_1 = mul(per(vector), radius);
-            leftPts.push(sub(point, offset_1));
-            rightPts.push(add(point, offset_1));
-            continue;
-        }
-        var nextVector = points[i + 1].vector;
-        var nextDpr = dpr(vector, nextVector);
-        /*
-          Handle sharp corners
-    
-          Find the difference (dot product) between the current and next vector.
-          If the next vector is at more than a right angle to the current vector,
-          draw a cap at the current point.
-        */
-        if (nextDpr < 0) {
-            // It's a sharp corner. Draw a rounded cap and move on to the next point
-            // Considering saving these and drawing them later? So that we can avoid
-            // crossing future points.
-            var offset_2 = mul(per(prevVector), radius);
-            for (var step = 1 / 13, t = 0; t <= 1; t += step) {
-                tl = rotAround(sub(point, offset_2), point, FIXED_PI * t);
-                leftPts.push(tl);
-                tr = rotAround(add(point, offset_2), point, FIXED_PI * -t);
-                rightPts.push(tr);
-            }
-            pl = tl;
-            pr = tr;
-            continue;
-        }
-        /*
-          Add regular points
-    
-          Project points to either side of the current point, using the
-          calculated size as a distance. If a point's distance to the
-          previous point on that side greater than the minimum distance
-          (or if the corner is kinda sharp), add the points to the side's
-          points array.
-        */
-        var offset = mul(per(lrp(nextVector, vector, nextDpr)), radius);
-        tl = sub(point, offset);
-        if (i <= 1 || dist2(pl, tl) > minDistance) {
-            leftPts.push(tl);
-            pl = tl;
+    if (o.thinning) {
+        if (o.simulatePressure) {
+            // If we're simulating pressure, then do so based on the distance
+            // between the current point and the previous point, and the size
+            // of the stroke. Otherwise, use the input pressure.
+            var sp = min(1, distance / o.size);
+            var rp = min(1, 1 - sp);
+            pressure = min(1, state.prevPressure + (rp - state.prevPressure) * (sp * RATE_OF_PRESSURE_CHANGE));
         }
-        tr = add(point, offset);
-        if (i <= 1 || dist2(pr, tr) > minDistance) {
-            rightPts.push(tr);
-            pr = tr;
+        state.radius = getStrokeRadius(o.size, o.thinning, pressure, o.easing);
+    }
+    else {
+        state.radius = o.size / 2;
+    }
+    if (state.firstRadius === undefined) {
+        state.firstRadius = state.radius;
+    }
+    /*
+      Apply tapering
+
+      If the current length is within the taper distance at either the
+      start or the end, calculate the taper strengths. Apply the smaller
+      of the two taper strengths to the radius.
+    */
+    var ts = runningLength < o.taperStart
+        ? o.taperStartEase(runningLength / o.taperStart)
+        : 1;
+    var te = totalLength - runningLength < o.taperEnd
+        ? o.taperEndEase((totalLength - runningLength) / o.taperEnd)
+        : 1;
+    var radius = state.radius = Math.max(0.01, state.radius * Math.min(ts, te));
+    /* Add points to left and right */
+    // Handle the last point
+    if (i === points.length - 1) {
+        var offset_1 = mul(per(vector), radius);
+        state.leftPts.push(sub(point, offset_1));
+        state.rightPts.push(add(point, offset_1));
+        return;
+    }
+    var nextVector = points[i + 1].vector;
+    var nextDpr = dpr(vector, nextVector);
+    /*
+      Handle sharp corners
+
+      Find the difference (dot product) between the current and next vector.
+      If the next vector is at more than a right angle to the current vector,
+      draw a cap at the current point.
+    */
+    if (nextDpr < 0) {
+        // It's a sharp corner. Draw a rounded cap and move on to the next point
+        // Considering saving these and drawing them later? So that we can avoid
+        // crossing future points.
+        var offset_2 = mul(per(state.prevVector), radius);
+        for (var step = 1 / 13, t = 0; t <= 1; t += step) {
+            tl = rotAround(sub(point, offset_2), point, FIXED_PI * t);
+            state.leftPts.push(tl);
+            tr = rotAround(add(point, offset_2), point, FIXED_PI * -t);
+            state.rightPts.push(tr);
         }
-        // Set variables for next iteration
-        prevPressure = pressure;
-        prevVector = vector;
+        state.pl = tl;
+        state.pr = tr;
+        return;
+    }
+    /*
+      Add regular points
+
+      Project points to either side of the current point, using the
+      calculated size as a distance. If a point's distance to the
+      previous point on that side greater than the minimum distance
+      (or if the corner is kinda sharp), add the points to the side's
+      points array.
+    */
+    var offset = mul(per(lrp(nextVector, vector, nextDpr)), radius);
+    tl = sub(point, offset);
+    if (i <= 1 || dist2(state.pl, tl) > o.minDistance) {
+        state.leftPts.push(tl);
+        state.pl = tl;
+    }
+    tr = add(point, offset);
+    if (i <= 1 || dist2(state.pr, tr) > o.minDistance) {
+        state.rightPts.push(tr);
+        state.pr = tr;
     }
+    // Set variables for next iteration
+    state.prevPressure = pressure;
+    state.prevVector = vector;
+}
+/**
+ * ## getOutlineCaps
+ * @description Get the start and end caps of the outline, or the dot to draw instead of it.
+ * @param points An array of StrokePoints as returned from `getStrokePoints`.
+ * @param state The state after adding every point with `addOutlinePoint`.
+ * @param firstLeft The first point on the left side of the outline.
+ * @param firstRight The first point on the right side of the outline.
+ * @param o The options as returned from `getOutlineOptions`.
+ * @internal
+ */
+function getOutlineCaps(points, state, firstLeft, firstRight, o) {
+    var radius = state.radius;
     /*
       Drawing caps
       
@@ -220,13 +281,13 @@ var FIXED_PI = PI + 0.0001;
       we can just return those points.
     */
     if (convertDotStrokes == true && points.length === 1) {
-        if (!(taperStart || taperEnd) || isComplete) {
-            var start_1 = prj(firstPoint, uni(per(sub(firstPoint, lastPoint))), -(firstRadius || radius));
+        if (!(o.taperStart || o.taperEnd) || o.isComplete) {
+            var start_1 = prj(firstPoint, uni(per(sub(firstPoint, lastPoint))), -(state.firstRadius || radius));
             var dotPts = [];
             for (var step = 1 / 13, t = step; t <= 1; t += step) {
                 dotPts.push(rotAround(start_1, firstPoint, FIXED_PI * 2 * t));
             }
-            return dotPts;
+            return { dot: dotPts };
         }
     }
     else {
@@ -238,19 +299,19 @@ var FIXED_PI = PI + 0.0001;
         the distance between the second left and right point for the cap's radius.
         Finally remove the first left and right points. :psyduck:
       */
-        if (taperStart || (taperEnd && points.length === 1)) {
+        if (o.taperStart || (o.taperEnd && points.length === 1)) {
             // The start point is tapered, noop
         }
-        else if (capStart) {
+        else if (o.capStart) {
             // Draw the round cap - add thirteen points rotating the right point around the start point to the left point
             for (var step = 1 / 13, t = step; t <= 1; t += step) {
-                var pt = rotAround(rightPts[0], firstPoint, FIXED_PI * t);
+                var pt = rotAround(firstRight, firstPoint, FIXED_PI * t);
                 startCap.push(pt);
             }
         }
         else {
             // Draw the flat cap - add a point to the left and right of the start point
-            var cornersVector = sub(leftPts[0], rightPts[0]);
+            var cornersVector = sub(firstLeft, firstRight);
             var offsetA = mul(cornersVector, 0.5);
             var offsetB = mul(cornersVector, 0.51);
             startCap.push(sub(firstPoint, offsetA), sub(firstPoint, offsetB), add(firstPoint, offsetB), add(firstPoint, offsetA));
@@ -265,11 +326,11 @@ var FIXED_PI = PI + 0.0001;
         sharp end turns.
       */
         var direction = per(neg(points[points.length - 1].vector));
-        if (taperEnd || (taperStart && points.length === 1)) {
+        if (o.taperEnd || (o.taperStart && points.length === 1)) {
             // Tapered end - push the last point to the line
             endCap.push(lastPoint);
         }
-        else if (capEnd) {
+        else if (o.capEnd) {
             // Draw the round end cap
             var start_2 = prj(lastPoint, direction, radius);
             for (var step = 1 / 29, t = step; t < 1; t += step) {
@@ -281,12 +342,7 @@ var FIXED_PI = PI + 0.0001;
             endCap.push(add(lastPoint, mul(direction, radius)), add(lastPoint, mul(direction, radius * 0.99)), sub(lastPoint, mul(direction, radius * 0.99)), sub(lastPoint, mul(direction, radius)));
         }
     }
-    /*
-      Return the points in the correct winding order: begin on the left side, then
-      continue around the end cap, then come back along the right side, and finally
-      complete the start cap.
-    */
-    return leftPts.concat(endCap, rightPts.reverse(), startCap);
+    return { startCap: startCap, endCap: endCap };
 }
 
 function getStrokePoints(points, options) {
@@ -296,6 +352,9 @@ function getStrokePoints(points, options) {
     // If we don't have any points, return an empty array.
     if (points.length === 0)
         return [];
+    // Points stored in a PointBuffer of the board
+    if (typeof points.toArray === 'function')
+        points = points.toArray(3);
     // Find the interpolation level between points.
     var t = 0.15 + (1 - streamline) * 0.85;
     // Whatever the input is, make sure that the points are in number[][].
@@ -389,6 +448,166 @@ function getStrokeRadius(size, thinning, pressure, easing) {
     return size * easing(0.5 - thinning * (0.5 - pressure));
 }
 
+/**
+ * ## IncrementalStroke
+ * @description Get the same outline as `getStroke` for a line which is still being drawn, without
+ * redoing the whole line for every new input point. Every input point but the last one is final, so
+ * their stroke points are only streamlined once. The outline points of a stroke point are final once
+ * the next stroke point is final and it is far enough from the end of the line not to be dropped as
+ * noise, those are kept in `left` and `right`. Only the tail after them and the caps are redone.
+ * Tapered ends depend on the total length of the line, those are always computed from scratch.
+ * @param options An object with the same options as `getStroke`, `last` is given to `update` instead.
+ */
+function IncrementalStroke(options) {
+    if (options === void 0) { options = {}; }
+    this.options = options;
+    this.outlineOptions = getOutlineOptions(options);
+    var _a = options.streamline, streamline = _a === void 0 ? 0.5 : _a, _b = options.size, size = _b === void 0 ? 16 : _b;
+    this.size = size;
+    // Find the interpolation level between points.
+    this.t = 0.15 + (1 - streamline) * 0.85;
+    this.reset();
+}
+IncrementalStroke.prototype.reset = function () {
+    // The stroke points of the final input points
+    this.strokePoints = [];
+    this.nextInput = 0;
+    this.prev = null;
+    this.runningLength = 0;
+    this.hasReachedMinimumLength = false;
+    // The outline state after the final stroke points, with their left and right points
+    this.state = null;
+    this.committed = 0;
+    this.left = [];
+    this.right = [];
+};
+/**
+ * ## update
+ * @description Get the outline of the line, as `getStroke(points, options)` would.
+ * @param points The `[x, y, pressure]` input points, the same array with new points pushed at the end since the last call.
+ * @param isComplete Whether to handle the points as a completed stroke.
+ */
+IncrementalStroke.prototype.update = function (points, isComplete) {
+    var o = this.outlineOptions;
+    // Points stored in a PointBuffer of the board are read one by one
+    var input = typeof points.point === 'function'
+        ? function (i) { return points.point(i); }
+        : function (i) { return points[i]; };
+    if (points.length < this.nextInput) {
+        this.reset();
+    }
+    // Short lines get extra points added in getStrokePoints, tapered ends change along the whole line
+    if (points.length < 3 || o.size <= 0 || o.taperEnd) {
+        return getStroke(points, Object.assign({}, this.options, { last: isComplete }));
+    }
+    var max = points.length - 1;
+    if (this.nextInput === 0) {
+        var first = input(0);
+        // The first point needs no adjustment.
+        this.prev = {
+            point: [first[0], first[1]],
+            pressure: first[2] >= 0 ? first[2] : 0.25,
+            vector: [1, 1],
+            distance: 0,
+            runningLength: 0,
+        };
+        this.strokePoints.push(this.prev);
+        this.nextInput = 1;
+    }
+    for (; this.nextInput < max; this.nextInput++) {
+        this.addStrokePoint(input(this.nextInput));
+    }
+    var strokePoints = this.strokePoints;
+    var stableCount = strokePoints.length;
+    // The last input point is only final once the line is complete or the next point comes in
+    var last = input(max);
+    var point = isComplete
+        ? last.slice(0, 2)
+        : lrp(this.prev.point, last, this.t);
+    if (!isEqual(this.prev.point, point)) {
+        var distance = dist(point, this.prev.point);
+        strokePoints.push({
+            point: point,
+            pressure: last[2] >= 0 ? last[2] : 0.5,
+            vector: uni(sub(this.prev.point, point)),
+            distance: distance,
+            runningLength: this.runningLength + distance,
+        });
+    }
+    // Set the vector of the first point to be the same as the second point.
+    strokePoints[0].vector = strokePoints.length > 1 ? strokePoints[1].vector : [0, 0];
+    var outline;
+    // The starting pressure averages the first ten stroke points
+    if (stableCount <= 10) {
+        outline = getStrokeOutlinePoints(strokePoints, Object.assign({}, this.options, { last: isComplete }));
+    }
+    else {
+        this.commitOutlinePoints(stableCount);
+        outline = this.getTailOutline(strokePoints, isComplete);
+    }
+    strokePoints.length = stableCount;
+    return outline;
+};
+IncrementalStroke.prototype.addStrokePoint = function (input) {
+    var point = lrp(this.prev.point, input, this.t);
+    // If the new point is the same as the previous point, skip ahead.
+    if (isEqual(this.prev.point, point))
+        return;
+    var distance = dist(point, this.prev.point);
+    this.runningLength += distance;
+    // At the start of the line, we wait until the new point is a
+    // certain distance away from the original point, to avoid noise
+    if (!this.hasReachedMinimumLength) {
+        if (this.runningLength < this.size)
+            return;
+        this.hasReachedMinimumLength = true;
+    }
+    this.prev = {
+        point: point,
+        pressure: input[2] >= 0 ? input[2] : 0.5,
+        vector: uni(sub(this.prev.point, point)),
+        distance: distance,
+        runningLength: this.runningLength,
+    };
+    this.strokePoints.push(this.prev);
+};
+IncrementalStroke.prototype.commitOutlinePoints = function (stableCount) {
+    var strokePoints = this.strokePoints;
+    // The line only gets longer, so points this far from the last final one are never dropped as noise
+    var stableLength = strokePoints[stableCount - 1].runningLength;
+    if (this.state === null) {
+        this.state = startOutline(strokePoints, this.outlineOptions);
+        this.state.leftPts = this.left;
+        this.state.rightPts = this.right;
+    }
+    while (this.committed < stableCount - 1 && stableLength - strokePoints[this.committed].runningLength >= 3) {
+        addOutlinePoint(strokePoints, this.committed, stableLength, this.state, this.outlineOptions);
+        this.committed++;
+    }
+};
+IncrementalStroke.prototype.getTailOutline = function (strokePoints, isComplete) {
+    var o = isComplete === this.outlineOptions.isComplete
+        ? this.outlineOptions
+        : Object.assign({}, this.outlineOptions, { isComplete: isComplete });
+    var state = Object.assign({}, this.state, { leftPts: [], rightPts: [] });
+    var totalLength = strokePoints[strokePoints.length - 1].runningLength;
+    for (var i = this.committed; i < strokePoints.length; i++) {
+        addOutlinePoint(strokePoints, i, totalLength, state, o);
+    }
+    var left = this.left, right = this.right;
+    var caps = getOutlineCaps(strokePoints, state, left.length ? left[0] : state.leftPts[0], right.length ? right[0] : state.rightPts[0], o);
+    this.tailLeft = state.leftPts;
+    this.tailRight = state.rightPts;
+    this.startCap = caps.startCap;
+    this.endCap = caps.endCap;
+    this.radius = state.radius;
+    // Same winding order as getStrokeOutlinePoints
+    var outline = left.concat(state.leftPts, caps.endCap);
+    for (var j = state.rightPts.length - 1; j >= 0; j--) outline.push(state.rightPts[j]);
+    for (var k = right.length - 1; k >= 0; k--) outline.push(right[k]);
+    return outline.concat(caps.startCap);
+};
+
 /**
  * Negate a vector.
  * @param A
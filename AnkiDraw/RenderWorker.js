@@ -0,0 +1,111 @@
+/* ------------------------------        RenderWorker        ------------------------------*/
+// Draws the committed strokes on the main canvas once the page transferred it, see
+// start_render_worker() in Blackboard.js. The page posts every change of its history,
+// so lineHistory here matches the page's one index for index, and a render message
+// for each frame with something to draw. The drawing code itself is shared with the
+// page through Renderer.js, loaded with the other scripts on 'init'.
+
+var ctx = null;
+var lineHistory = [];
+var lastClearIndex = -1;
+var ts_stats = {
+    replayed_actions: 0,
+    checkpoint_restores: 0,
+    checkpoint_count: 0,
+    checkpoint_bytes: 0,
+    worker_render_ms: 0,
+    geometry_hits: 0,
+    geometry_misses: 0,
+    geometry_entries: 0,
+    geometry_bytes: 0,
+};
+
+self.onmessage = function (e) {
+    var message = e.data;
+    switch (message.type) {
+        case 'init':
+            importScripts.apply(self, message.scripts);
+            ctx = message.canvas.getContext('2d');
+            break;
+        case 'resize':
+            ctx.canvas.width = message.width;
+            ctx.canvas.height = message.height;
+            ctx.scale(message.scale, message.scale);
+            clear_checkpoints();
+            break;
+        case 'add':
+            lineHistory.push(receive_action(message.action));
+            break;
+        case 'pop':
+            lineHistory.pop();
+            invalidate_checkpoints_from(lineHistory.length);
+            break;
+        case 'visible':
+            message.indices.forEach(index => lineHistory[index].visible = message.visible);
+            invalidate_checkpoints_from(Math.min(...message.indices));
+            break;
+        case 'drop':
+            lineHistory.splice(0, message.count).forEach(forget_geometry);
+            clear_checkpoints();
+            break;
+        case 'reset':
+            lineHistory = [];
+            clear_geometry();
+            clear_checkpoints();
+            break;
+        case 'fitted':
+            lineHistory[message.index].segments = message.segments;
+            lineHistory[message.index].fitting = false;
+            forget_geometry(lineHistory[message.index]);
+            invalidate_checkpoints_from(message.index);
+            break;
+        case 'render':
+            render(message);
+            break;
+    }
+};
+
+// Put the points of a posted action back into a PointBuffer
+function receive_action(action) {
+    if (action.points && action.points.data) {
+        var points = new PointBuffer(action.points.stride, 1);
+        points.data = action.points.data;
+        points.length = action.points.length;
+        action.points = points;
+    }
+    return action;
+}
+
+// Same replay as draw_upto_latest_point_async() on the page, without tiles
+function render(message) {
+    var start = performance.now();
+    var region = message.region;
+    var startLine = message.start;
+    lastClearIndex = message.lastClear;
+    if (message.full) {
+        if (region) {// only erase and draw inside the dirty region
+            ctx.save();
+            ctx.beginPath();
+            ctx.rect(region.x, region.y, region.width, region.height);
+            ctx.clip();
+            ctx.clearRect(region.x, region.y, region.width, region.height);
+        }
+        else {
+            ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);
+        }
+    }
+    if (lastClearIndex > startLine) startLine = lastClearIndex;
+    if (message.full) {
+        var restored = restore_checkpoint();
+        if (restored >= 0) startLine = restored + 1;
+        ts_stats.replayed_actions = lineHistory.length - startLine;
+    }
+    for (var i = startLine; i < lineHistory.length; i++) {
+        if (!lineHistory[i].visible) continue;
+        draw_action(ctx, lineHistory[i]);
+        if (!region && (i + 1) % CHECKPOINT_INTERVAL == 0 && !checkpoints.has(i)) take_checkpoint(i);
+    }
+    if (message.full && region) ctx.restore();
+    ts_stats.worker_render_ms = performance.now() - start;
+    self.postMessage({ stats: ts_stats });
+}
@@ -0,0 +1,391 @@
+/* ------------------------------          Renderer          ------------------------------*/
+// Everything needed to draw committed actions, without touching the page. It is
+// loaded by the reviewer before Blackboard.js and by RenderWorker.js, which both
+// provide the globals it draws with: ctx, lineHistory, lastClearIndex and ts_stats.
+
+RESOLUTION = 4; // calligraphy curve sampling, used by Caligrapher.js
+var convertDotStrokes = true; // single point perfect freehand strokes become dots, used by PerfectFreehand.js
+
+// ----------------------------------------- Point Buffer -----------------------------------------
+// Stroke points are stored flat in a growable Float32Array instead of one small array
+// per point. Lines keep [x, y, pressure, width] per point (stride 4), calligraphy,
+// eraser and text boxes only [x, y] (stride 2).
+
+function PointBuffer(stride, capacity) {
+    this.stride = stride;
+    this.data = new Float32Array(stride * (capacity || 64));
+    this.length = 0;
+}
+
+PointBuffer.from = function (points, stride) {
+    var buffer = new PointBuffer(stride, points.length);
+    points.forEach(point => buffer.push(point[0], point[1], point[2], point[3]));
+    return buffer;
+};
+
+PointBuffer.prototype.push = function (x, y, pressure, width) {
+    if ((this.length + 1) * this.stride > this.data.length) {
+        var grown = new Float32Array(Math.max(this.data.length * 2, this.stride * 64));
+        grown.set(this.data);
+        this.data = grown;
+    }
+    var offset = this.length++ * this.stride;
+    this.data[offset] = x;
+    this.data[offset + 1] = y;
+    if (this.stride > 2) {
+        this.data[offset + 2] = pressure;
+        this.data[offset + 3] = width;
+    }
+};
+
+PointBuffer.prototype.x = function (i) { return this.data[i * this.stride]; };
+PointBuffer.prototype.y = function (i) { return this.data[i * this.stride + 1]; };
+PointBuffer.prototype.pressure = function (i) { return this.data[i * this.stride + 2]; };
+PointBuffer.prototype.width = function (i) { return this.data[i * this.stride + 3]; };
+
+// Point i as a new array, [x, y, pressure, width] or [x, y]
+PointBuffer.prototype.point = function (i) {
+    return Array.from(this.data.subarray(i * this.stride, (i + 1) * this.stride));
+};
+
+// All points as arrays of their first components, for code working on [x, y] arrays
+PointBuffer.prototype.toArray = function (components) {
+    components = components || this.stride;
+    var points = new Array(this.length);
+    for (var i = 0; i < this.length; i++) {
+        points[i] = Array.from(this.data.subarray(i * this.stride, i * this.stride + components));
+    }
+    return points;
+};
+
+PointBuffer.prototype.bounds = function () {
+    var bounds = null;
+    for (var i = 0; i < this.length; i++) bounds = extend_bounds(bounds, this.x(i), this.y(i));
+    return bounds;
+};
+
+// Let go of the spare capacity once the stroke is finished
+PointBuffer.prototype.trim = function () {
+    if (this.data.length > this.length * this.stride) this.data = this.data.slice(0, this.length * this.stride);
+};
+
+// ----------------------------------------- Drawing -----------------------------------------
+
+function update_line_draw_settings(color, width, opacity, paramCtx){
+    paramCtx = paramCtx || ctx;
+    paramCtx.lineJoin = paramCtx.lineCap = 'round';
+    if(paramCtx.lineWidth != width)paramCtx.lineWidth = width
+    if(paramCtx.fillStyle != color)paramCtx.fillStyle = paramCtx.strokeStyle = color
+}
+
+// Stroke colors come from the few pen styles, so the opaque versions are remembered
+var noAlphaColors = new Map();
+
+function get_no_alpha(line_color){
+    var color = noAlphaColors.get(line_color);
+    if (color === undefined) {
+        color = line_color.replace(/[\d\.]+\)$/g, '1)');
+        noAlphaColors.set(line_color, color);
+    }
+    return color;
+}
+
+// A simple ('L') stroke is a chain of quadratic segments between the midpoints
+// of its points, each segment with the width of its last point. Segments are
+// batched into one Path2D per width, so a constant width stroke is a single
+// stroke() call and a pressure stroke one call per width it used.
+var LINE_WIDTH_STEP = 0.25;// pressure widths are snapped to this step so they can share a batch
+
+function build_line_batches(points, width) {
+    var batches = new Map();
+    var runWidth = null;
+    var runPath = null;
+    var p1, p2 = 0, p3 = 0;
+    for (var j = 0; j < points.length; j++) {
+        p1 = p2;
+        p2 = p3;
+        p3 = j;
+        var pointWidth = points.width(p3);
+        var segmentWidth = pointWidth == width ? pointWidth : Math.round(pointWidth / LINE_WIDTH_STEP) * LINE_WIDTH_STEP;
+        if (segmentWidth !== runWidth) {// start a new run, continuing the batch of that width
+            runWidth = segmentWidth;
+            runPath = batches.get(runWidth);
+            if (!runPath) {
+                runPath = new Path2D();
+                batches.set(runWidth, runPath);
+            }
+            runPath.moveTo(points.x(p1) + (points.x(p2) - points.x(p1)) / 2, points.y(p1) + (points.y(p2) - points.y(p1)) / 2);
+        }
+        runPath.quadraticCurveTo(points.x(p2), points.y(p2), points.x(p2) + (points.x(p3) - points.x(p2)) / 2, points.y(p2) + (points.y(p3) - points.y(p2)) / 2);
+    }
+    return Array.from(batches, ([batchWidth, path]) => ({ width: batchWidth, path: path }));
+}
+
+function draw_line_batches(paramCtx, batches) {
+    for (var k = 0; k < batches.length; k++) {
+        paramCtx.lineWidth = batches[k].width;
+        paramCtx.stroke(batches[k].path);
+    }
+}
+
+function build_calligraphy_outline(action) {
+    return new Stroke(get_calligraphy_segments(action)).getOutline(action.width);
+}
+
+function build_perfect_freehand_path(action) {
+    return getFreeDrawPath2D(action.points, action.width, true);
+}
+
+function build_action_line_batches(action) {
+    return build_line_batches(action.points, action.width);
+}
+
+function draw_action(paramCtx, actionToDraw) {
+    // strokes are drawn opaque, the opacity is applied to the whole canvas
+    update_line_draw_settings(get_no_alpha(actionToDraw.color), actionToDraw.width, actionToDraw.opacity, paramCtx)
+    paramCtx.globalCompositeOperation = "source-over";
+    switch (actionToDraw.type) {
+        case 'C'://Calligraphy
+                if(actionToDraw.fitting) {// the curves are still being fitted, see queue_fit() in Blackboard.js
+                    stroke_polyline(paramCtx, actionToDraw.points)
+                    break;
+                }
+                var outline = get_geometry(actionToDraw, build_calligraphy_outline)
+                for(var k = 0; k < outline.length; k++) paramCtx.fill(outline[k]);
+            break;
+        case 'L'://Simple Lines
+            //sadly per stroke opacity doesnt work well with windows, as it leaves circle outlines due to alpha blending
+            draw_line_batches(paramCtx, get_geometry(actionToDraw, build_action_line_batches))
+            break;
+        case 'P'://Perfect Lines
+            paramCtx.fill(get_geometry(actionToDraw, build_perfect_freehand_path));
+            break;
+        case 'D'://Delete Stroke Lines
+            break;
+        case 'X'://Clear Screen
+            break;
+        case 'T'://Write Text
+            drawTextFromAction(paramCtx, actionToDraw)
+            break;
+        default://how did you get here??
+            break;
+    }
+}
+
+// Curves of a calligraphy action, fitted here unless they came with the action
+function get_calligraphy_segments(action) {
+    if (!action.segments) return fitStroke(action.points.toArray());
+    return action.segments.map(controlPoints => new Bezier(controlPoints));
+}
+
+function stroke_polyline(paramCtx, points) {
+    paramCtx.beginPath();
+    paramCtx.moveTo(points.x(0), points.y(0));
+    for (var i = 1; i < points.length; i++) paramCtx.lineTo(points.x(i), points.y(i));
+    paramCtx.stroke();
+}
+
+// Same outline as getSvgPathFromStroke (Blackboard.js), built straight into a Path2D for drawing.
+// The SVG string is only needed for exporting.
+function getPathFromStroke(points){
+  const path = new Path2D();
+  if (!points.length) {
+    return path;
+  }
+
+  const max = points.length - 1;
+  path.moveTo(points[0][0], points[0][1]);
+  for (let i = 0; i < max; i++) {
+    const a = points[i], b = points[i + 1];
+    path.quadraticCurveTo(a[0], a[1], (a[0] + b[0]) / 2, (a[1] + b[1]) / 2);
+  }
+  const last = points[max], first = points[0];
+  path.quadraticCurveTo(last[0], last[1], (last[0] + first[0]) / 2, (last[1] + first[1]) / 2);
+  path.lineTo(first[0], first[1]);
+  path.closePath();
+  return path;
+}
+
+function getFreeDrawPath2D(inputPoints, width, complete) {
+  return getPathFromStroke(getStroke(inputPoints, getFreeDrawOptions(inputPoints, width, complete)));
+}
+
+function getFreeDrawOptions(inputPoints, width, complete) {
+  // Consider changing the options for simulated pressure vs real pressure
+
+  return {
+    simulatePressure: inputPoints.pressure(0) > 1,
+    size: width,
+    thinning: 0.6,
+    smoothing: 0.5,
+    streamline: 0.5,
+    easing: (t) => Math.sin((t * Math.PI) / 2), // https://easings.net/#easeOutSine
+    last: complete, // LastCommittedPoint is added on pointerup
+  };
+}
+
+function drawTextFromAction(paramCtx, action){
+    var lines = null
+    if (action && action.type == 'T') {
+        if(action.text){
+            var lines = action.text.split(/(?<!\\)\n/);
+            for(var i = 0; i< lines.length; i++){
+                var fontString = "";
+                if (action.fontBold) fontString += "bold ";
+                if (action.fontItalic) fontString += "italic ";
+                fontString += action.fontSize + "px " + action.fontFamily;
+                
+                paramCtx.font = fontString;
+                paramCtx.textBaseline = 'top';
+                paramCtx.fillText(lines[i], action.x , action.y + i * calculateLineHeight(action.fontSize));
+            }
+        }
+    }
+    return lines
+}
+
+function calculateLineHeight(fontSize) {
+    // Line height = font size + appropriate spacing
+    // For small fonts: add more relative spacing
+    // For large fonts: add less relative spacing
+    if (fontSize < 12) {
+        return fontSize + 8; // More spacing for small text
+    } else if (fontSize < 24) {
+        return fontSize + 6; // Medium spacing
+    } else {
+        return fontSize + 4; // Less spacing for large text
+    }
+}
+
+// ----------------------------------------- Geometry Cache -----------------------------------------
+// The paths built from the points of an action (line batches, perfect freehand and
+// calligraphy outlines) are kept by action id and width, so undo, redo, erasing and
+// clear markers draw the action again without building anything. Ids are given by
+// add_action_to_history() on the page and travel with the action to the render worker.
+// Paths are in css pixels and the context scale takes care of the pixel ratio, so a
+// resize keeps them as well. Entries are dropped least recently used first once their
+// estimated size is over GEOMETRY_MEMORY_BUDGET bytes.
+
+var GEOMETRY_MEMORY_BUDGET = 32 * 1024 * 1024;
+var GEOMETRY_BYTES_PER_POINT = 64;// about two path points of two doubles and a verb per stored point
+var geometryCache = new Map(); // "id/width" -> {geometry, bytes}, least recently used first
+var geometryBytes = 0;
+
+// The cached paths of action, made with build(action) if there are none
+function get_geometry(action, build) {
+    if (action.id === undefined) return build(action);
+    var key = action.id + '/' + action.width;
+    var entry = geometryCache.get(key);
+    if (entry) {
+        geometryCache.delete(key);// move to the most recently used end
+        geometryCache.set(key, entry);
+        ts_stats.geometry_hits++;
+        return entry.geometry;
+    }
+    ts_stats.geometry_misses++;
+    entry = { geometry: build(action), bytes: 256 + GEOMETRY_BYTES_PER_POINT * (action.points ? action.points.length : 0) };
+    geometryCache.set(key, entry);
+    geometryBytes += entry.bytes;
+    for (const [oldKey, oldEntry] of geometryCache) {
+        if (geometryBytes <= GEOMETRY_MEMORY_BUDGET) break;
+        drop_geometry(oldKey, oldEntry);
+    }
+    update_geometry_stats();
+    return entry.geometry;
+}
+
+function drop_geometry(key, entry) {
+    geometryCache.delete(key);
+    geometryBytes -= entry.bytes;
+}
+
+// Forget the paths of an action which changed shape or can't come back
+function forget_geometry(action) {
+    var key = action.id + '/' + action.width;
+    var entry = geometryCache.get(key);
+    if (entry) drop_geometry(key, entry);
+    update_geometry_stats();
+}
+
+function clear_geometry() {
+    geometryCache.clear();
+    geometryBytes = 0;
+    update_geometry_stats();
+}
+
+function update_geometry_stats() {
+    ts_stats.geometry_entries = geometryCache.size;
+    ts_stats.geometry_bytes = geometryBytes;
+}
+
+// ----------------------------------------- Checkpoints -----------------------------------------
+// Every CHECKPOINT_INTERVAL actions a copy of the committed layer is kept, keyed by
+// the index of the last action it contains. A redraw restores the newest checkpoint
+// that is still valid and replays only the actions after it. Checkpoints are dropped
+// least recently used first once they take more than CHECKPOINT_MEMORY_BUDGET bytes.
+// Tiled canvases take none, a redraw there only repaints the tiles that went stale.
+
+var CHECKPOINT_INTERVAL = 25;
+var CHECKPOINT_MEMORY_BUDGET = 128 * 1024 * 1024;
+var checkpoints = new Map(); // history index -> {canvas, bytes}, least recently used first
+var checkpointBytes = 0;
+
+function take_checkpoint(index) {
+    var bytes = ctx.canvas.width * ctx.canvas.height * 4;
+    if (!bytes || bytes > CHECKPOINT_MEMORY_BUDGET / 2) return;// too big to be worth it
+    var snapshot = typeof OffscreenCanvas === 'function' ?
+        new OffscreenCanvas(ctx.canvas.width, ctx.canvas.height) : document.createElement('canvas');
+    snapshot.width = ctx.canvas.width;
+    snapshot.height = ctx.canvas.height;
+    snapshot.getContext('2d').drawImage(ctx.canvas, 0, 0);
+    checkpoints.set(index, { canvas: snapshot, bytes: bytes });
+    checkpointBytes += bytes;
+    for (const [oldIndex, checkpoint] of checkpoints) {
+        if (checkpointBytes <= CHECKPOINT_MEMORY_BUDGET) break;
+        drop_checkpoint(oldIndex, checkpoint);
+    }
+    update_checkpoint_stats();
+}
+
+function drop_checkpoint(index, checkpoint) {
+    checkpoints.delete(index);
+    checkpointBytes -= checkpoint.bytes;
+    checkpoint.canvas.width = checkpoint.canvas.height = 0;// let go of the pixels right away
+}
+
+// Restore the newest checkpoint between the last clear and the end of the history,
+// returns the index of the last action it contains or -1 if there is none.
+function restore_checkpoint() {
+    var best = -1;
+    for (const index of checkpoints.keys()) {
+        if (index > best && index >= lastClearIndex && index < lineHistory.length) best = index;
+    }
+    if (best < 0) return -1;
+    var checkpoint = checkpoints.get(best);
+    checkpoints.delete(best);// move to the most recently used end
+    checkpoints.set(best, checkpoint);
+    ctx.save();
+    ctx.setTransform(1, 0, 0, 1, 0, 0);
+    ctx.globalCompositeOperation = "source-over";
+    ctx.drawImage(checkpoint.canvas, 0, 0);
+    ctx.restore();
+    ts_stats.checkpoint_restores++;
+    return best;
+}
+
+// Forget checkpoints which contain the action at index or anything after it
+function invalidate_checkpoints_from(index) {
+    for (const [checkpointIndex, checkpoint] of checkpoints) {
+        if (checkpointIndex >= index) drop_checkpoint(checkpointIndex, checkpoint);
+    }
+    update_checkpoint_stats();
+}
+
+function clear_checkpoints() {
+    invalidate_checkpoints_from(0);
+}
+
+function update_checkpoint_stats() {
+    ts_stats.checkpoint_count = checkpoints.size;
+    ts_stats.checkpoint_bytes = checkpointBytes;
+}
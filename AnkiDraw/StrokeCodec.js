@@ -0,0 +1,178 @@
+/* ------------------------------        StrokeCodec        ------------------------------*/
+// Binary format the drawing of a card is saved in, see ts_export_drawing() in
+// Blackboard.js. stroke_codec.py reads and writes the same bytes, keep both in step.
+//
+//   'A' 'D' version                   header, version is STROKE_CODEC_VERSION
+//   varint count                      number of actions, then for each:
+//     flags                           bits 0-1 type (L, P, C, T), 2 pressure, 3 bold, 4 italic
+//     r g b opacity                   bytes, opacity in hundredths
+//     varint width                    in hundredths of a pixel
+//     text:   zigzag x, zigzag y      in eighths of a pixel
+//             varint font size, string font family, string text
+//     others: varint n, n times zigzag dx, zigzag dy from the previous point (the first
+//             from 0, 0) in eighths of a pixel, then n pressure bytes if the flag is set
+//
+// Varints are unsigned LEB128, zigzag maps signed to unsigned (0, -1, 1, -2 ...) and a
+// string is a varint byte length and its UTF-8. Line widths per point are not stored,
+// they are worked out from the pressure the same way push_line_point() does.
+
+var STROKE_CODEC_VERSION = 1;
+var STROKE_CODEC_TYPES = 'LPCT';
+var STROKE_CODEC_QUANTUM = 8; // stored steps per pixel
+var STROKE_CODEC_NO_PRESSURE = 2; // what push_line_point() stores without a pen
+
+function encode_drawing(actions) {
+    var out = new ByteWriter();
+    out.byte(65); out.byte(68); out.byte(STROKE_CODEC_VERSION);
+    out.varint(actions.length);
+    actions.forEach(action => {
+        var type = STROKE_CODEC_TYPES.indexOf(action.type);
+        if (type < 0) throw new Error('can\'t encode action ' + action.type);
+        var points = action.points;
+        var pressure = type < 2 && points.length > 0 && points.pressure(0) != STROKE_CODEC_NO_PRESSURE;
+        out.byte(type | (pressure ? 4 : 0) | (action.fontBold ? 8 : 0) | (action.fontItalic ? 16 : 0));
+        var rgb = action.color.match(/\d+/g);
+        out.byte(+rgb[0]); out.byte(+rgb[1]); out.byte(+rgb[2]);
+        out.byte(Math.min(Math.max(Math.round(action.opacity * 100), 0), 100));
+        out.varint(Math.round(action.width * 100));
+        if (action.type == 'T') {
+            out.zigzag(Math.round(action.x * STROKE_CODEC_QUANTUM));
+            out.zigzag(Math.round(action.y * STROKE_CODEC_QUANTUM));
+            out.varint(Math.round(action.fontSize));
+            out.string(action.fontFamily);
+            out.string(action.text);
+            return;
+        }
+        out.varint(points.length);
+        var lastX = 0, lastY = 0;
+        for (var i = 0; i < points.length; i++) {
+            var x = Math.round(points.x(i) * STROKE_CODEC_QUANTUM),
+                y = Math.round(points.y(i) * STROKE_CODEC_QUANTUM);
+            out.zigzag(x - lastX);
+            out.zigzag(y - lastY);
+            lastX = x;
+            lastY = y;
+        }
+        if (pressure) {
+            for (var i = 0; i < points.length; i++) out.byte(Math.min(Math.max(Math.round(points.pressure(i) * 255), 0), 255));
+        }
+    });
+    return out.bytes();
+}
+
+// Actions as add_action_to_history() takes them, text boxes without their points
+function decode_drawing(bytes) {
+    var input = new ByteReader(bytes);
+    if (input.byte() != 65 || input.byte() != 68) throw new Error('not a drawing');
+    var version = input.byte();
+    if (version != STROKE_CODEC_VERSION) throw new Error('unknown drawing version ' + version);
+    var actions = new Array(input.varint());
+    for (var a = 0; a < actions.length; a++) {
+        var flags = input.byte();
+        var r = input.byte(), g = input.byte(), b = input.byte(), opacity = input.byte() / 100;
+        var action = {
+            type: STROKE_CODEC_TYPES[flags & 3],
+            color: `rgba(${r}, ${g}, ${b}, ${opacity})`,
+            width: input.varint() / 100,
+            opacity: opacity,
+            visible: true,
+        };
+        if (action.type == 'T') {
+            action.x = input.zigzag() / STROKE_CODEC_QUANTUM;
+            action.y = input.zigzag() / STROKE_CODEC_QUANTUM;
+            action.fontSize = input.varint();
+            action.fontFamily = input.string();
+            action.text = input.string();
+            action.fontBold = !!(flags & 8);
+            action.fontItalic = !!(flags & 16);
+            actions[a] = action;
+            continue;
+        }
+        var n = input.varint();
+        var points = action.points = new PointBuffer(action.type == 'C' ? 2 : 4, n);
+        var x = 0, y = 0;
+        for (var i = 0; i < n; i++) {
+            x += input.zigzag();
+            y += input.zigzag();
+            points.push(x / STROKE_CODEC_QUANTUM, y / STROKE_CODEC_QUANTUM, STROKE_CODEC_NO_PRESSURE, action.width);
+        }
+        if (flags & 4) {
+            for (var i = 0; i < n; i++) {
+                var pressure = input.byte() / 255;
+                points.data[i * 4 + 2] = pressure;
+                points.data[i * 4 + 3] = 1.0 + pressure * action.width * 2;
+            }
+        }
+        actions[a] = action;
+    }
+    return actions;
+}
+
+function ByteWriter() {
+    this.buffer = new Uint8Array(1024);
+    this.length = 0;
+}
+
+ByteWriter.prototype.byte = function (value) {
+    if (this.length == this.buffer.length) {
+        var grown = new Uint8Array(this.buffer.length * 2);
+        grown.set(this.buffer);
+        this.buffer = grown;
+    }
+    this.buffer[this.length++] = value;
+};
+
+ByteWriter.prototype.varint = function (value) {
+    while (value >= 128) {
+        this.byte(value % 128 + 128);
+        value = Math.floor(value / 128);
+    }
+    this.byte(value);
+};
+
+ByteWriter.prototype.zigzag = function (value) {
+    this.varint(value >= 0 ? value * 2 : -value * 2 - 1);
+};
+
+ByteWriter.prototype.string = function (text) {
+    var utf8 = new TextEncoder().encode(text);
+    this.varint(utf8.length);
+    utf8.forEach(value => this.byte(value));
+};
+
+ByteWriter.prototype.bytes = function () {
+    return this.buffer.slice(0, this.length);
+};
+
+function ByteReader(bytes) {
+    this.bytes = bytes;
+    this.offset = 0;
+}
+
+ByteReader.prototype.byte = function () {
+    if (this.offset >= this.bytes.length) throw new Error('drawing is cut short');
+    return this.bytes[this.offset++];
+};
+
+ByteReader.prototype.varint = function () {
+    var value = 0, scale = 1, part;
+    do {
+        part = this.byte();
+        value += (part & 127) * scale;
+        scale *= 128;
+    } while (part & 128);
+    return value;
+};
+
+ByteReader.prototype.zigzag = function () {
+    var value = this.varint();
+    return value % 2 ? -(value + 1) / 2 : value / 2;
+};
+
+ByteReader.prototype.string = function () {
+    var length = this.varint();
+    if (this.offset + length > this.bytes.length) throw new Error('drawing is cut short');
+    var text = new TextDecoder().decode(this.bytes.subarray(this.offset, this.offset + length));
+    this.offset += length;
+    return text;
+};
@@ -24,25 +24,48 @@ Important parts of Javascript code inspired by http://creativejs.com/tutorials/p
 __addon_name__ = "AnkiDraw"
 __version__ = "1.7"
 
+import base64
+import functools
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import closing
 from pathlib import Path
 
 from aqt import mw
-from aqt.utils import showWarning
+from aqt.utils import showWarning, showInfo
 
 from anki.lang import _
 from anki.hooks import addHook
+from anki.utils import ids2str
 
 from aqt.qt import QAction, QMenu, QColorDialog, QMessageBox, QInputDialog, QLabel,\
    QPushButton, QDialog, QVBoxLayout, QComboBox, QHBoxLayout, QSpinBox, QCheckBox, QFontDialog, QFont
-from aqt.qt import QKeySequence,QColor
+from aqt.qt import QKeySequence,QColor,QTimer
 from aqt.qt import pyqtSlot as slot
 
-# Load extra JS libraries from external files to simplify the __init__.py
+from . import stroke_codec
+
+# The drawing engine lives in static files next to this one, they are served
+# to the reviewer through the add-on's web exports instead of being inlined.
 file = Path(__file__)
-with open(file.with_name("Caligrapher.js"), encoding="utf8") as f:
-    caligrapher_js = f.read()
-with open(file.with_name("PerfectFreehand.js"), encoding="utf8") as f:
-    perfect_freehand_js = f.read()
+addon_package = mw.addonManager.addonFromModule(__name__)
+mw.addonManager.setWebExports(__name__, r".+\.js")
+web_assets = ["Renderer.js", "StrokeCodec.js", "Blackboard.js", "Caligrapher.js", "PerfectFreehand.js"]
+# Each worker script first, then the scripts it loads
+render_worker_assets = ["RenderWorker.js", "Renderer.js", "Caligrapher.js", "PerfectFreehand.js"]
+fit_worker_assets = ["FitWorker.js", "Caligrapher.js"]
+
+@functools.lru_cache(maxsize=None)
+def web_asset_url(name):
+    """
+    Return the URL of a web exported file, versioned with a hash of its
+    content so an updated file is never served from a stale cache.
+    The files don't change while Anki is running, so each is hashed once.
+    """
+    digest = hashlib.sha1(file.with_name(name).read_bytes()).hexdigest()[:10]
+    return f"/_addons/{addon_package}/{name}?v={digest}"
 # This declarations are there only to be sure that in case of troubles
 # with "profileLoaded" hook everything will work.
 
@@ -56,6 +79,7 @@ saved_value_defaults = {
     'ts_default_small_canvas': False,
     'ts_zen_mode': False,
     'ts_follow': False,
+    'ts_low_latency': False,
     'ts_pressure_sensitivity': True,
     'ts_orient_vertical': True,
     'ts_y_offset': 2,
@@ -113,11 +137,13 @@ def ts_load():
         globals()[key] = mw.pm.profile.get(key, default)
 
     ts_profile_loaded = True
+    ts_invalidate_payload()
     ts_menu_auto_hide.setChecked(ts_auto_hide)
     ts_menu_auto_hide_pointer.setChecked(ts_auto_hide_pointer)
     ts_menu_small_default.setChecked(ts_default_small_canvas)
     ts_menu_zen_mode.setChecked(ts_zen_mode)
     ts_menu_follow.setChecked(ts_follow)
+    ts_menu_low_latency.setChecked(ts_low_latency)
     ts_menu_pressure.setChecked(ts_pressure_sensitivity)
     if ts_state_on:
         ts_on()
@@ -141,6 +167,9 @@ def clear_blackboard():
     assure_plugged_in()
 
     if ts_state_on:
+        # the new card's drawing is read once the last one is stored, in case it is the same card again
+        ts_save_drawing(then=functools.partial(ts_load_drawing, mw.reviewer.card))
+        ts_drawings.card_id = None
         execute_js("if (typeof clear_canvas === 'function') { clear_canvas(); }")
         # is qFade the reason for having to wait?
         execute_js("if (typeof resize === 'function') { setTimeout(resize, 101); }");
@@ -151,6 +180,7 @@ def blackboard_html():
     <textarea id="AnkiDrawTextBox" style="width: 0;height: 0;opacity: 0;"></textarea>
     <canvas id="secondary_canvas" width="100" height="100" ></canvas>
     <canvas id="main_canvas" width="100" height="100"></canvas>
+    <div id="tile_layer"></div>
     
     <div id="pencil_button_bar">
         <!-- SVG icons from https://github.com/tabler/tabler-icons/ -->
@@ -288,12 +318,20 @@ def get_css_for_zen_mode(hide):
 def get_css_for_auto_hide_pointer(auto_hide):
     return "none" if auto_hide else "default"
 
-def blackboard_css():
+def blackboard_css_config():
     return u"""
 <style>
 :root {
   """ + get_css_for_toolbar_location( ts_location, ts_x_offset, ts_y_offset, ts_orient_vertical, ts_small_width, ts_small_height, ts_background_color) + """
+  --button-bar-display: """ + get_css_for_zen_mode(ts_zen_mode) + """;
+  --nopointer-cursor: """ + get_css_for_auto_hide_pointer(ts_auto_hide_pointer) + """;
+  --nopointer-button-bar-display: """ + get_css_for_auto_hide(ts_auto_hide, ts_zen_mode) + """;
 }
+</style>"""
+
+def blackboard_css():
+    return u"""
+<style>
 body {
   overflow-x: hidden; /* Hide horizontal scrollbar */
 }
@@ -302,7 +340,7 @@ body {
     pointercancel events. See:
     https://stackoverflow.com/questions/59010779/pointer-event-issue-pointercancel-with-pressure-input-pen
 */
-#main_canvas, #secondary_canvas {
+#main_canvas, #secondary_canvas, #tile_layer {
    z-index: 998;/* add toggle?*/
   touch-action: none;/*add toggle*/
   
@@ -315,6 +353,11 @@ body {
   #canvas_wrapper, #secondary_canvas {
    z-index: 999;
   }
+#tile_layer {
+  display: none;
+  overflow: hidden;
+  pointer-events: none;
+}
 #main_canvas, #secondary_canvas {
   background: var(--background-color);
   border-style: none;
@@ -322,7 +365,7 @@ body {
 }
 #pencil_button_bar {
   position: fixed;
-  display: """+get_css_for_zen_mode(ts_zen_mode)+""";
+  display: var(--button-bar-display);
   flex-direction: var(--button-bar-orientation);
   opacity: .5;
   top: var(--button-bar-pt);
@@ -349,1559 +392,269 @@ body {
   /*stroke: #888;*/
 }
 .nopointer {
-  cursor: """+get_css_for_auto_hide_pointer(ts_auto_hide_pointer)+""" !important;
+  cursor: var(--nopointer-cursor) !important;
 } 
 .touch_disable > button:not(:first-child){
     display: none;
 }
 .nopointer #pencil_button_bar
 {
-  display: """+get_css_for_auto_hide(ts_auto_hide, ts_zen_mode)+""";
+  display: var(--nopointer-button-bar-display);
 }
 </style>"""
 
-def blackboard_js():
-    config = mw.addonManager.getConfig(__name__)
-    start_vis = str(config.get('start_visible', False)).lower()
-    start_pen = str(config.get('default_pen_index', 1))
-
-    return u"""
-<script>
-// Set from python qt ui
-var visible = """ + start_vis + """;
-var perfectFreehand = """ + ts_default_PerfFreehand +""";
-var pressureSensitivity = """ + str(ts_pressure_sensitivity).lower() + """;
-var small_canvas = """ +  str(ts_default_small_canvas).lower() + """;
-var fullscreen_follow = """ + str(ts_follow).lower() + """;
-var calligraphy = """ + ts_default_Calligraphy + """;
-var strokeDelete = false;
-var textWriting = false;
-var isDeleting = false;  // Track if currently deleting (for hold mode)
-var pen1Color = """ + "\'" + str(ts_pen1_color) + "\'" + """;
-var pen1Width = """ + str(ts_pen1_width) + """;
-var pen2Color = """ + "\'" + str(ts_pen2_color) + "\'" + """;
-var pen2Width = """ + str(ts_pen2_width) + """;
-var pen3Color = """ + "\'" + str(ts_pen3_color) + "\'" + """;
-var pen3Width = """ + str(ts_pen3_width) + """;
-var pen4Color = """ + "\'" + str(ts_pen4_color) + "\'" + """;
-var pen4Width = """ + str(ts_pen4_width) + """;
-var pen1Opacity = """ + str(ts_pen1_opacity) + """;
-var pen2Opacity = """ + str(ts_pen2_opacity) + """;
-var pen3Opacity = """ + str(ts_pen3_opacity) + """;
-var pen4Opacity = """ + str(ts_pen4_opacity) + """;
-var fontFamily = """ + "\'" + str(ts_font_family) + "\'" + """;
-var fontSize = """ + str(ts_font_size) + """;
-var fontBold = """ + str(ts_font_bold).lower() + """;
-var fontItalic = """ + str(ts_font_italic).lower() + """;
-var activePenIndex = """ + start_pen + """;
-var convertDotStrokes = true
-
-function forceShowCanvas() {
-    if (visible === false) { // Only change if it's currently false
-        visible = true;
-        canvas.style.display='block';
-        secondary_canvas.style.display='block';
-        if (ts_visibility_button) ts_visibility_button.className = 'active';
-        if (optionBar) optionBar.className = '';
-    }
-}
-
-function forceHideCanvas() {
-    if (visible === true) { // Only change if it's currently true
-        visible = false;
-        canvas.style.display='none';
-        secondary_canvas.style.display='none';
-        if (ts_visibility_button) ts_visibility_button.className = '';
-        if (optionBar) optionBar.className = 'touch_disable';
-    }
-}
-
-function getPenColorAndWidthByIndex(index){
-    switch (index) {
-        case 0:
-            return [hexToRgba(pen1Color, pen1Opacity), pen1Width, pen1Opacity];
-        break;
-        case 1:
-            return [hexToRgba(pen2Color, pen2Opacity), pen2Width, pen2Opacity];
-        break;
-        case 2:
-            return [hexToRgba(pen3Color, pen3Opacity), pen3Width, pen3Opacity];
-        break;
-        case 3:
-            return [hexToRgba(pen4Color, pen4Opacity), pen4Width, pen4Opacity];
-        break;
-        default:
-            console.error("error too large index for pen selection")
-            break;
-    }
-}
-
-// Helper function to convert hex color to RGBA with opacity
-function hexToRgba(hex, opacity) {
-    // Remove the hash if present
-    hex = hex.replace(/^#/, '');
-    
-    // Parse the hex values
-    let r, g, b;
-    if (hex.length === 3) {
-        r = parseInt(hex[0] + hex[0], 16);
-        g = parseInt(hex[1] + hex[1], 16);
-        b = parseInt(hex[2] + hex[2], 16);
-    } else if (hex.length === 6 || hex.length === 8) {
-        r = parseInt(hex.substring(0, 2), 16);
-        g = parseInt(hex.substring(2, 4), 16);
-        b = parseInt(hex.substring(4, 6), 16);
-    } else {
-        return hex; // Return as-is if not a valid hex color
-    }
-    
-    return `rgba(${r}, ${g}, ${b}, ${opacity})`;
-}
-
-// HTML references
-var canvas = document.getElementById('main_canvas');
-var wrapper = document.getElementById('canvas_wrapper');
-var textBox = document.getElementById('AnkiDrawTextBox');
-var optionBar = document.getElementById('pencil_button_bar');
-var ts_undo_button = document.getElementById('ts_undo_button');
-var ts_redo_button = document.getElementById('ts_redo_button');
-var ctx = canvas.getContext('2d');
-var secondary_canvas = document.getElementById('secondary_canvas');
-var secondary_ctx = secondary_canvas.getContext('2d');
-var ts_visibility_button = document.getElementById('ts_visibility_button');
-var ts_kanji_button = document.getElementById('ts_kanji_button');
-var ts_text_button = document.getElementById('ts_text_button');
-var ts_perfect_freehand_button = document.getElementById('ts_perfect_freehand_button');
-var ts_stroke_delete_button = document.getElementById('ts_stroke_delete_button');
-var ts_switch_fullscreen_button = document.getElementById('ts_switch_fullscreen_button');
-
-
-var ts_visibility_button_path1 = document.querySelector('#ts_visibility_button > svg > path');
-var ts_visibility_button_path2 = document.querySelector('#ts_visibility_button > svg > path:nth-child(2)');
-
-var ts_switch_pen1_button_path = document.querySelector('#ts_switch_pen1_button > svg > path');
-var ts_switch_pen2_button_path = document.querySelector('#ts_switch_pen2_button > svg > path');
-var ts_switch_pen3_button_path = document.querySelector('#ts_switch_pen3_button > svg > path');
-var ts_switch_pen4_button_path = document.querySelector('#ts_switch_pen4_button > svg > path');
-
-// Arrays to save point values from strokes
-if (!visible) {
-    canvas.style.display = 'none';
-    secondary_canvas.style.display = 'none';
-    
-    if (ts_visibility_button) {
-        ts_visibility_button.className = '';
-    }
-    
-    if (optionBar) {
-        optionBar.className = 'touch_disable';
-    }
-}
-var stroke_cache = [ ];
-var lineHistory = [ ] // contains history of currentAction Items, defined below
-var redoStack = [ ]
-let textCursorVisible = true;
-let cursorBlinkInterval;
-
-// Current stroke in progress
-var currentAction = {
-    points: [],
-    color: '',
-    width: '',
-    opacity: '',
-    visible: true,
-    type: '', // 'simple' 'L', 'perfect' 'P', 'calligraphy' 'C', Delete 'D', Clear 'X'
-    deletedList: [] // used only for delete actions
-};
-
-var index = 0;
-
-canvas.onselectstart = function() { return false; };
-secondary_canvas.onselectstart = function() { return false; };
-wrapper.onselectstart = function() { return false; };
-
-function PlaySound(){
-    var selectors = document.querySelectorAll(".soundLink, .replaybutton")
-    if (selectors) { selectors[index++ % selectors.length].click(); }
-}
-function recolor_based_on_active_pen()
-{   
-    var color = getPenColorAndWidthByIndex(activePenIndex)[0]
-
-    ts_visibility_button_path1.style.stroke = color
-    ts_visibility_button_path2.style.stroke = color
-
-    ts_switch_pen1_button_path.style.stroke = pen1Color
-    ts_switch_pen2_button_path.style.stroke = pen2Color
-    ts_switch_pen3_button_path.style.stroke = pen3Color
-    ts_switch_pen4_button_path.style.stroke = pen4Color
-}
-
-function activate_pen1()
-{
-    activePenIndex = 0
-    update_pen_settings();
-}
-
-function activate_pen2()
-{
-    activePenIndex = 1
-    update_pen_settings();
-}
-
-function activate_pen3()
-{
-    activePenIndex = 2
-    update_pen_settings();
-}
-
-function activate_pen4()
-{
-    activePenIndex = 3
-    update_pen_settings();
-}
-
-function reset_drawing_modes()
-{
-    ts_kanji_button.className = '';
-    ts_perfect_freehand_button.className = '';
-    ts_stroke_delete_button.className = '';
-    ts_text_button.className = '';
-    calligraphy = false;
-    perfectFreehand = false;
-    strokeDelete = false
-    textWriting = false;
-    reset_to_main_pen_settings()
-    ts_redraw()
-}
-
-ts_kanji_button_class = '';
-ts_perfect_freehand_button_class = '';
-ts_stroke_delete_button_class = '';
-ts_text_button_class = '';
-calligraphy_activated = false;
-perfectFreehand_activated = false;
-strokeDelete_activated = false
-textWriting_activated = false;
-
-function save_drawing_modes_for_delete()
-{
-    ts_kanji_button_class = ts_kanji_button.className;
-    ts_perfect_freehand_button_class = ts_perfect_freehand_button.className;
-    ts_text_button_class = ts_text_button.className;
-    calligraphy_activated = calligraphy
-    perfectFreehand_activated = perfectFreehand
-    textWriting_activated = textWriting
-    reset_to_main_pen_settings()
-    ts_redraw()
-}
-
-function restore_drawing_modes_for_delete()
-{
-    ts_kanji_button.className = ts_kanji_button_class
-    ts_perfect_freehand_button.className = ts_perfect_freehand_button_class
-    ts_text_button.className = ts_text_button_class
-    calligraphy = calligraphy_activated
-    perfectFreehand = perfectFreehand_activated
-    textWriting = textWriting_activated
-    reset_to_main_pen_settings()
-    ts_redraw()
-}
-
-function switch_perfect_freehand()
-{
-    stop_drawing();
-    temp = !perfectFreehand;
-    reset_drawing_modes()
-    perfectFreehand = temp;
-    if(perfectFreehand)
-    {
-        ts_perfect_freehand_button.className = 'active';
-    }
-    else{
-        ts_perfect_freehand_button.className = '';
-    }
-}
-
-function switch_calligraphy_mode()
-{
-    stop_drawing();
-    temp = !calligraphy;
-    reset_drawing_modes()
-    calligraphy = temp;
-    if(calligraphy)
-    {
-        ts_kanji_button.className = 'active';
-    }
-    else{
-        ts_kanji_button.className = '';
-    }
-}
-function switch_text_writing_mode()
-{
-    stop_drawing();
-    // In toggle mode, toggle the textWriting boolean
-    temp = !textWriting;
-    reset_drawing_modes()
-    textWriting = temp;
-    if(textWriting)
-    {
-        textBox.focus()
-        ts_text_button.className = 'active';
-    }
-    else{
-        textBox.blur()
-        ts_text_button.className = '';
-    }
-}
-function switch_stroke_delete_mode()
-{
-    stop_drawing();
-    
-    // In toggle mode, toggle the strokeDelete boolean
-    strokeDelete = !strokeDelete;
-    if(strokeDelete || isDeleting)
-    {
-        save_drawing_modes_for_delete()
-        ts_stroke_delete_button.className = 'active';
-    }
-    else{
-        restore_drawing_modes_for_delete()
-        ts_stroke_delete_button.className = '';
-    }
-}
-function enter_stroke_delete_mode()
-{
-    stop_drawing();
-    strokeDelete = true;
-    isDeleting = true;
-    if(strokeDelete || isDeleting)
-    {
-        save_drawing_modes_for_delete()
-        ts_stroke_delete_button.className = 'active';
-    }
-    else{
-        restore_drawing_modes_for_delete()
-        ts_stroke_delete_button.className = '';
-    }
-}
-function exit_stroke_delete_mode()
-{
-    stop_drawing();
-    strokeDelete = false;
-    isDeleting = false
-    if(strokeDelete || isDeleting)
-    {
-        save_drawing_modes_for_delete()
-        ts_stroke_delete_button.className = 'active';
-    }
-    else{
-        restore_drawing_modes_for_delete()
-        ts_stroke_delete_button.className = '';
-    }
-}
-
-
-function switch_small_canvas()
-{
-    stop_drawing();
-    
-    small_canvas = !small_canvas;
-    if(!small_canvas)
-    {
-        ts_switch_fullscreen_button.className = 'active';
-    }
-    else{
-        ts_switch_fullscreen_button.className = '';
-    }
-    resize();
-}
-
-function switch_visibility()
-{
-	stop_drawing();
-    if (!visible) {
-        canvas.style.display='none';
-        secondary_canvas.style.display='none';
-        ts_visibility_button.className = '';
-        optionBar.className = 'touch_disable';
-    }
-    else
-    {
-        canvas.style.display='block';
-        secondary_canvas.style.display=canvas.style.display;
-        ts_visibility_button.className = 'active';
-        optionBar.className = '';
-    }
-    visible = !visible;
-}
-
-//Initialize event listeners at the start;
-canvas.addEventListener("pointerdown", pointerDownLine);
-canvas.addEventListener("pointermove", pointerMoveLine);
-secondary_canvas.addEventListener("pointerdown", pointerDownLine);
-secondary_canvas.addEventListener("pointermove", pointerMoveLine);
-window.addEventListener("pointerup", pointerUpLine);
-canvas.addEventListener("pointerdown", pointerDownCaligraphy);
-canvas.addEventListener("pointermove", pointerMoveCaligraphy);
-secondary_canvas.addEventListener("pointerdown", pointerDownCaligraphy);
-secondary_canvas.addEventListener("pointermove", pointerMoveCaligraphy);
-window.addEventListener("pointerup", pointerUpCaligraphy);
-canvas.addEventListener("pointerdown", pointerDownStrokeDelete);
-canvas.addEventListener("pointermove", pointerMoveStrokeDelete);
-secondary_canvas.addEventListener("pointerdown", pointerDownStrokeDelete);
-secondary_canvas.addEventListener("pointermove", pointerMoveStrokeDelete);
-window.addEventListener("pointerup", pointerUpStrokeDelete);
-
-window.addEventListener("pointerup", pointerDownLineText);
-window.addEventListener("pointerdown", pointerDownLineText);
-
-function resize() {
-    
-    var card = document.getElementsByClassName('card')[0]
-    
-    // Run again until card is loaded
-    if (!card){
-        window.setTimeout(resize, 100)
-        return;
-        
-    }
-    // Check size of page without canvas
-    canvas_wrapper.style.display='none';
-    canvas.style["border-style"] = "none";
-    secondary_canvas.style["border-style"] = "none";
-    document.documentElement.style.setProperty('--canvas-bar-pt', '0px');
-    document.documentElement.style.setProperty('--canvas-bar-pr', '0px');
-    document.documentElement.style.setProperty('--canvas-bar-pb', 'unset');
-    document.documentElement.style.setProperty('--canvas-bar-pl', 'unset');
-    document.documentElement.style.setProperty('--canvas-bar-position', 'absolute');
-    
-    if(!small_canvas && !fullscreen_follow){
-        ctx.canvas.width = Math.max(card.scrollWidth, document.documentElement.clientWidth);
-        ctx.canvas.height = Math.max(document.documentElement.scrollHeight, document.documentElement.clientHeight);        
-    }
-    else if(small_canvas){
-        ctx.canvas.width = Math.min(document.documentElement.clientWidth, 
-        getComputedStyle(document.documentElement).getPropertyValue('--small-canvas-width'));
-        ctx.canvas.height = Math.min(document.documentElement.clientHeight, 
-        getComputedStyle(document.documentElement).getPropertyValue('--small-canvas-height'));
-        canvas.style["border-style"] = "dashed";
-        secondary_canvas.style["border-style"] = "dashed";
-        document.documentElement.style.setProperty('--canvas-bar-pt', 
-        getComputedStyle(document.documentElement).getPropertyValue('--button-bar-pt'));
-        document.documentElement.style.setProperty('--canvas-bar-pr', 
-        getComputedStyle(document.documentElement).getPropertyValue('--button-bar-pr'));
-        document.documentElement.style.setProperty('--canvas-bar-pb', 
-        getComputedStyle(document.documentElement).getPropertyValue('--button-bar-pb'));
-        document.documentElement.style.setProperty('--canvas-bar-pl', 
-        getComputedStyle(document.documentElement).getPropertyValue('--button-bar-pl'));
-        document.documentElement.style.setProperty('--canvas-bar-position', 'fixed');
-    }
-    else{
-        document.documentElement.style.setProperty('--canvas-bar-position', 'fixed');
-        ctx.canvas.width = document.documentElement.clientWidth-1;
-        ctx.canvas.height = document.documentElement.clientHeight-1;
-    }
-    secondary_ctx.canvas.width = ctx.canvas.width;
-    secondary_ctx.canvas.height = ctx.canvas.height;
-    canvas_wrapper.style.display='block';
-    
-    
-    
-    /* Get DPR with 1 as fallback */
-    var dpr = window.devicePixelRatio || 1;
-    
-    /* CSS size is the same */
-    canvas.style.height = ctx.canvas.height + 'px';
-    wrapper.style.width = ctx.canvas.width + 'px';
-    secondary_canvas.style.height = canvas.style.height;
-    secondary_canvas.style.width = canvas.style.width;
-    
-    /* Increase DOM size and scale */
-    ctx.canvas.width *= dpr;
-    ctx.canvas.height *= dpr;
-    ctx.scale(dpr, dpr);
-    secondary_ctx.canvas.width *= dpr;
-    secondary_ctx.canvas.height *= dpr;
-    secondary_ctx.scale(dpr, dpr);
-    
-	update_pen_settings()
-    
-}
-
-
-window.addEventListener('resize', resize);
-window.addEventListener('load', resize);
-window.requestAnimationFrame(draw_last_line_segment);
-
-var isPointerDown = false;
-var mouseX = 0;
-var mouseY = 0;
-
-function update_pen_settings(){
-    stop_drawing()
-    var pen = getPenColorAndWidthByIndex(activePenIndex);
-
-    if(ctx.lineJoin != 'round'){
-        ctx.lineJoin = ctx.lineCap = 'round';
-        secondary_ctx.lineJoin = secondary_ctx.lineCap = ctx.lineJoin;
-    }   
-    if(ctx.lineWidth != pen[1]) {
-        ctx.lineWidth = pen[1]; // pen Width
-        secondary_ctx.lineWidth = ctx.lineWidth
-    }
-    if(ctx.strokeStyle != pen[0]){
-        ctx.strokeStyle = ctx.fillStyle = pen[0]; // pen color
-        
-        
-    } 
-    var pencolorNoAlpha = pen[0].replace(/[\d\.]+\)$/g, '1)');
-    if(secondary_ctx.strokeStyle != pencolorNoAlpha){
-        secondary_ctx.strokeStyle = secondary_ctx.fillStyle = pencolorNoAlpha;
-    }
-    
-    if(secondary_canvas.style.opacity != pen[2]) secondary_canvas.style.opacity = pen[2]
-    if(canvas.style.opacity != pen[2]) canvas.style.opacity = pen[2]
-    
-    recolor_based_on_active_pen()
-    ts_redraw()
-}
-
-function reset_to_main_pen_settings(){
-    var pen = getPenColorAndWidthByIndex(activePenIndex);
-    if(ctx.lineJoin != 'round'){
-        ctx.lineJoin = ctx.lineCap = 'round';
-        secondary_ctx.lineJoin = secondary_ctx.lineCap = ctx.lineJoin;
-    }   
-    if(ctx.lineWidth != pen[1]) {
-        ctx.lineWidth = pen[1]; // pen Width
-        secondary_ctx.lineWidth = ctx.lineWidth
-    }
-    if(ctx.strokeStyle != pen[0]){
-        ctx.strokeStyle = ctx.fillStyle = pen[0]; // pen color
-    } 
-    var pencolorNoAlpha = pen[0].replace(/[\d\.]+\)$/g, '1)');
-    if(secondary_ctx.strokeStyle != pencolorNoAlpha){
-        secondary_ctx.strokeStyle = secondary_ctx.fillStyle = pencolorNoAlpha;
-    }
-    
-    if(secondary_canvas.style.opacity != pen[2]) secondary_canvas.style.opacity = pen[2]
-    if(canvas.style.opacity != pen[2]) canvas.style.opacity = pen[2]
-    
-}
-
-function update_line_draw_settings(color, width, opacity){
-    ctx.lineJoin = ctx.lineCap = 'round';
-    if(ctx.lineWidth != width)ctx.lineWidth = width
-    if(ctx.fillStyle != color)ctx.fillStyle = ctx.strokeStyle = color
-}
-
-function get_no_alpha(line_color){
-    return ctx.strokeStyle.replace(/[\d\.]+\)$/g, '1)');
-}
-
-function ts_undo(){
-	stop_drawing();
-    if(lineHistory.length>0){
-        var poppedAction = lineHistory.pop()
-        redoStack.push(poppedAction)
-        ts_redo_button.className = "active";
-        stroke_cache[lineHistory.length] = null;
-        switch (poppedAction.type) {
-            case 'C'://Calligraphy
-                break;
-            case 'L'://Simple Lines
-                break;
-            case 'P'://Perfect Lines
-                break;
-            case 'D'://Delete Stroke Lines
-                poppedAction.deletedList.forEach( deletedIndex => { lineHistory[deletedIndex].visible = true } )
-                break;
-            case 'X'://Clear actions
-                break;
-            case 'T'://Text Writing actions
-                break;
-            default://how did you get here??
-                break;
-        }
-    }
-
-    if(!lineHistory.length)
-    {
-        ts_undo_button.className = ""
-    }
-    ts_redraw()
-}
-function ts_redo() {
-    stop_drawing();
-    if (redoStack.length < 1) return;
-    
-    var redoAction = redoStack.pop();
-    readd_action_to_history(redoAction)
-    ts_undo_button.className = "active";
-    switch (redoAction.type) {
-        case 'C'://Calligraphy
-            break;
-        case 'L'://Simple Lines
-            break;
-        case 'D'://Delete Stroke Lines
-            redoAction.deletedList.forEach( deletedIndex => { lineHistory[deletedIndex].visible = false } )
-            break;
-        case 'X'://Delete Stroke Lines
-            break;
-        default://how did you get here??
-            break;
-    }
-    
-    ts_redraw();
-    if (redoStack.length === 0) {
-        ts_redo_button.className = "";
-    }
-}
-
-function ts_redraw() {
-	pleaseRedrawEverything = true;
-}
-
-function ts_clear() {
-	pleaseRedrawEverything = true;
-    fullClear = true;
-}
-
-function clear_canvas()
-{
-	//don't continue to put points into an empty array(pointermove) if clearing while drawing on the canvas
-	stop_drawing();
-    reset_history();
-    reset_redo()
-	ts_clear();
-}
-
-function add_clear_marker()
-{
-	//don't continue to put points into an empty array(pointermove) if clearing while drawing on the canvas
-	stop_drawing();
-    if(lineHistory.length && lineHistory[lineHistory.length-1].type != 'X')add_action_to_history({ type: 'X'})
-	ts_clear();
-}
-
-function add_action_to_history(action){
-    ts_undo_button.className = "active"
-    lineHistory.push(action)
-    currentAction = {}
-    reset_redo()
-}
-
-function readd_action_to_history(action){
-    ts_undo_button.className = "active"
-    lineHistory.push(action)
-    currentAction = {}
-}
-
-function reset_redo(){
-    redoStack = [];
-    ts_redo_button.className = "";
-}
-
-function reset_history(){
-    lineHistory = [];
-    stroke_cache = [];
-    ts_undo_button.className = "";
-}
-
-function stop_drawing() {
-    reset_to_main_pen_settings()
-    submitCurrentText()
-    isPointerDown = false;
-	drawingWithPressurePenOnly = false;
-}
-
-function start_drawing() {
-    submitCurrentText()
-    isPointerDown = true;
-    reset_redo()
-}
-
-function draw_last_line_segment() {
-    window.requestAnimationFrame(draw_last_line_segment);
-    draw_upto_latest_point_async(nextLine, nextPoint, nextStroke);
-}
-
-var nextLine = 0;
-var nextPoint = 0;
-var nextStroke = 0;
-var p1,p2,p3;
-
-function is_last_path_and_currently_drawn(i){
-    return (lineHistory.length-1 < i)//the path is complete unless its the last of the array and the pointer is still down
-}
-
-function all_drawing_finished(i){
-    return (lineHistory.length-1 >= i)//the path is complete unless its the last of the array and the pointer is still down
-}
-
-async function draw_path_at_some_point_async(startX, startY, midX, midY, endX, endY, lineWidth) {
-		ctx.beginPath();
-		ctx.moveTo((startX + (midX - startX) / 2), (startY + (midY - startY)/ 2));//midpoint calculation for x and y
-		ctx.quadraticCurveTo(midX, midY, (midX + (endX - midX) / 2), (midY + (endY - midY)/ 2));
-        ctx.lineWidth = lineWidth;
-		ctx.stroke();
-};
-async function draw_secondary_path_at_some_point_async(startX, startY, midX, midY, endX, endY, lineWidth) {
-		secondary_ctx.beginPath();
-		secondary_ctx.moveTo((startX + (midX - startX) / 2), (startY + (midY - startY)/ 2));//midpoint calculation for x and y
-		secondary_ctx.quadraticCurveTo(midX, midY, (midX + (endX - midX) / 2), (midY + (endY - midY)/ 2));
-        secondary_ctx.lineWidth = lineWidth;
-		secondary_ctx.stroke();
-};
-
-var pleaseRedrawEverything = false;
-var fullClear = false;
-
-async function draw_upto_latest_point_async(startLine, startPoint, startStroke){
-	var fullRedraw = false;//keep track if this call started a full redraw to unset pleaseRedrawEverything flag later.
-	if (pleaseRedrawEverything) {// erase everything and draw from start
-        fullRedraw = true;
-        startLine = 0;
-        startPoint = 0;
-        ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);
-	}
-    for (let index = lineHistory.length-1; index > 0; index--) {//go thrught the history in reverse
-        if(lineHistory[index].type == 'X'){// the first clear we find is where we should start from 
-            if(index>startLine)startLine = index // if it's later than what we intend to draw
-            break;
-        }
-    }
-    for(var i = startLine; i < lineHistory.length; i++){ //Draw
-        actionToDraw = lineHistory[i]
-        if(!actionToDraw.visible) {
-            nextPoint = 0;
-            continue;
-        }
-
-        update_line_draw_settings(actionToDraw.color, actionToDraw.width, actionToDraw.opacity)
-        switch (actionToDraw.type) {
-            case 'C'://Calligraphy
-                    var calligraphyStroke = !stroke_cache[i] ? new Stroke(fitStroke(actionToDraw.points)) : stroke_cache[i]
-                    stroke_cache[i] = calligraphyStroke
-                    calligraphyStroke.draw(actionToDraw.width, ctx);
-                break;
-            case 'L'://Simple Lines
-                ///0,0,0; 0,0,1; 0,1,2 or x+1,x+2,x+3
-                //take the 2 previous points in addition to current one at the start of the loop.
-                p2 = actionToDraw.points[startPoint > 1 ? startPoint-2 : 0];
-                p3 = actionToDraw.points[startPoint > 0 ? startPoint-1 : 0];
-                for(var j = startPoint; j < actionToDraw.points.length; j++){
-                    nextPoint = j + 1;
-                    p1 = p2;
-                    p2 = p3;
-                    p3 = actionToDraw.points[j];
-                    var save = ctx.strokeStyle
-                    //sadly this doesnt work well with windows, as it leaves circle outlines due to alpha blending, so abandon per stroke opacty dreams
-                    // update_line_draw_settings(get_no_alpha(save), actionToDraw.width, actionToDraw.opacity)
-                    // ctx.globalCompositeOperation = "destination-out";
-                    // draw_path_at_some_point_async(p1[0],p1[1],p2[0],p2[1],p3[0],p3[1],p3[3]);
-
-                    update_line_draw_settings(get_no_alpha(save), actionToDraw.width, actionToDraw.opacity)
-
-                    ctx.globalCompositeOperation = "source-over";
-                    draw_path_at_some_point_async(p1[0],p1[1],p2[0],p2[1],p3[0],p3[1],p3[3]);
-                }
-                
-                break;
-            case 'P'://Perfect Lines
-                var path = !stroke_cache[i] ? new Path2D(getFreeDrawSvgPath(actionToDraw.points, actionToDraw.width, true)) : stroke_cache[i]
-                stroke_cache[i] = path
-                var save = ctx.strokeStyle
-                // update_line_draw_settings(get_no_alpha(save), actionToDraw.width, actionToDraw.opacity)
-                // ctx.globalCompositeOperation = "destination-out";
-                // ctx.fill(path);
-
-                update_line_draw_settings(get_no_alpha(save), actionToDraw.width, actionToDraw.opacity)
-                ctx.globalCompositeOperation = "source-over";
-                ctx.fill(path);
-                break;
-            case 'D'://Delete Stroke Lines
-                break;
-            case 'X'://Clear Screen
-                break;
-            case 'T'://Write Text
-                var save = ctx.strokeStyle
-                // update_line_draw_settings(get_no_alpha(save), actionToDraw.width, actionToDraw.opacity)
-                // ctx.globalCompositeOperation = "destination-out";
-                // drawTextFromAction(ctx, actionToDraw)
-
-                update_line_draw_settings(get_no_alpha(save), actionToDraw.width, actionToDraw.opacity)
-                ctx.globalCompositeOperation = "source-over";
-                drawTextFromAction(ctx, actionToDraw)
-                break;
-            default://how did you get here??
-                break;
-        }
-        //post loop cleanup
-        if(all_drawing_finished(i)){
-            nextLine = lineHistory.length;
-            nextPoint = 0;
-        }
-        else{
-            if(lineHistory.length == 0){
-                nextLine = 0;
-            }
-            else{
-                nextLine = lineHistory.length-1;
-            }
-        }
-    }
-    if(!strokeDelete)reset_to_main_pen_settings()
-    
-	if (fullRedraw) {//finished full redraw, now can unset redraw all flag so no more full redraws until necessary
-        pleaseRedrawEverything = false;
-        fullRedraw = false;
-        nextPoint = lineHistory.length == 0 ? 0 : nextPoint;//reset next point if out of lines
-        nextLine = lineHistory.length == 0 ? 0 : lineHistory.length
-        if(fullClear){// start again from 0.
-            nextLine = 0;
-            fullClear = false;
-        }
-	}
-}
-
-var drawingWithPressurePenOnly = false; // hack for drawing with 2 main pointers when using a presure sensitive pen
-
-function calculateClearBox(pointsArray) {
-    if (!pointsArray.length) return {x: 0, y: 0, width: 0, height: 0};
-    
-    let minX = Infinity, minY = Infinity;
-    let maxX = -Infinity, maxY = -Infinity;
-    
-    pointsArray.forEach(point => {
-        if (point[0] < minX) minX = point[0];
-        if (point[0] > maxX) maxX = point[0];
-        if (point[1] < minY) minY = point[1];
-        if (point[1] > maxY) maxY = point[1];
-    });
-    
-    // Add some padding for line caps/width
-    const padding = 1;
-    
+def blackboard_config():
+    """
+    Collect every setting the drawing script needs. This is the only part
+    of the reviewer payload that changes with the settings.
+    """
+    config = ts_payload.addon_config()
     return {
-        x: minX - padding,
-        y: minY - padding,
-        width: (maxX - minX) + padding * 2,
-        height: (maxY - minY) + padding * 2
-    };
-}
-function drawCursor(x, y) {
-    secondary_ctx.beginPath();
-    secondary_ctx.moveTo(x, y);
-    secondary_ctx.lineTo(x, y + fontSize);
-    secondary_ctx.strokeStyle = 'red';
-    secondary_ctx.lineWidth = 2;
-    secondary_ctx.stroke();
-}
-
-function startCursorBlink() {
-    clearInterval(cursorBlinkInterval);
-    drawTextOnCanvas()
-    cursorBlinkInterval = setInterval(() => {
-        textCursorVisible = !textCursorVisible;
-        drawTextOnCanvas();
-    }, 500);
-}
-
-function createBoxWithDiagonalPoints(action) {
-    const lines = action.text.split(/(?<!\\\\)\\n/);
-    const allBoxPoints = [];
-    
-    const padding = 1;
-    const spacing = 8;
-    const lineHeight = calculateLineHeight(action.fontSize);
-
-    var fontString = "";
-    if (action.fontBold) fontString += "bold ";
-    if (action.fontItalic) fontString += "italic ";
-    fontString += action.fontSize + "px " + action.fontFamily;
-
-    ctx.font = fontString;
-    let currentY = action.y;
-    
-    // Process each line separately
-    for (let i = 0; i < lines.length; i++) {
-        const lineText = lines[i];
-        
-        const textWidth = ctx.measureText(lineText).width;
-        
-        // Calculate box for this line
-        const x = action.x - padding;
-        const y = currentY - padding;
-        const width = textWidth + padding * 2;
-        const height = action.fontSize + padding * 2;
-        
-        // Start with box corner points for this line
-        const points = [
-            [x, y],
-            [x + width, y],  
-            [x + width, y + height],
-            [x, y + height]
-        ];
-        
-        // Calculate diagonal lines for this box
-        const diagonalLength = Math.sqrt(width * width + height * height);
-        
-        // Generate lines in both directions
-        const directions = [
-            // Direction 1: y = x + b (top-left to bottom-right)
-            (i) => ({
-                startX: x + i,
-                startY: y,
-                endX: x + i + diagonalLength,
-                endY: y + diagonalLength,
-                isOpposite: false
-            }),
-            // Direction 2: y = -x + b (top-right to bottom-left)  
-            (i) => ({
-                startX: x + diagonalLength - i,
-                startY: y,
-                endX: x - i,
-                endY: y + diagonalLength,
-                isOpposite: true
-            })
-        ];
-        
-        directions.forEach(getLine => {
-            for (let j = -diagonalLength; j < diagonalLength; j += spacing) {
-                const line = getLine(j);
-                const intersection = lineIntersectsRect(
-                    line.startX, line.startY, line.endX, line.endY, 
-                    x, y, width, height,
-                    line.isOpposite
-                );
-                
-                if (intersection) {
-                    const [segmentStart, segmentEnd] = intersection;
-                    points.push(segmentStart, segmentEnd);
-                }
-            }
-        });
-        
-        // Add this line's box points to the combined array
-        allBoxPoints.push(...points);
-        
-        // Move Y position down for next line
-        currentY += lineHeight;
-    }
-    
-    return allBoxPoints;
-}
-
-// Updated unified intersection function
-function lineIntersectsRect(x1, y1, x2, y2, rectX, rectY, rectW, rectH, isOpposite = false) {
-    // Line equation: y = mx + b where m = 1 for normal, m = -1 for opposite
-    const m = isOpposite ? -1 : 1;
-    const b = y1 - m * x1;
-    
-    const intersections = [];
-    
-    // Intersection with left edge (x = rectX)
-    const yAtLeft = m * rectX + b;
-    if (yAtLeft >= rectY && yAtLeft <= rectY + rectH) {
-        if (x1 <= rectX && rectX <= x2 || x2 <= rectX && rectX <= x1) {
-            intersections.push([rectX, yAtLeft]);
-        }
-    }
-    
-    // Intersection with right edge (x = rectX + rectW)
-    const yAtRight = m * (rectX + rectW) + b;
-    if (yAtRight >= rectY && yAtRight <= rectY + rectH) {
-        if (x1 <= rectX + rectW && rectX + rectW <= x2 || 
-            x2 <= rectX + rectW && rectX + rectW <= x1) {
-            intersections.push([rectX + rectW, yAtRight]);
-        }
-    }
-    
-    // Intersection with top edge (y = rectY)
-    const xAtTop = (rectY - b) / m;
-    if (xAtTop >= rectX && xAtTop <= rectX + rectW) {
-        if (y1 <= rectY && rectY <= y2 || y2 <= rectY && rectY <= y1) {
-            intersections.push([xAtTop, rectY]);
-        }
-    }
-    
-    // Intersection with bottom edge (y = rectY + rectH)
-    const xAtBottom = (rectY + rectH - b) / m;
-    if (xAtBottom >= rectX && xAtBottom <= rectX + rectW) {
-        if (y1 <= rectY + rectH && rectY + rectH <= y2 || 
-            y2 <= rectY + rectH && rectY + rectH <= y1) {
-            intersections.push([xAtBottom, rectY + rectH]);
-        }
-    }
-    
-    if (intersections.length >= 2) {
-        intersections.sort((a, b) => a[0] - b[0]);
-        return [intersections[0], intersections[1]];
-    }
-    
-    return null;
-}
-
-function submitCurrentText() {
-    if (currentAction && currentAction.text && currentAction.text.length > 0) {
-
-        // Create and save box around the text
-        currentAction.points = createBoxWithDiagonalPoints(currentAction);
-        // Save the text entry
-        add_action_to_history(currentAction)
-        
-        // Clear current entry
-        textBox.blur()
-        secondary_ctx.clearRect(0, 0, canvas.width, canvas.height);   
-    }
-    textBox.value = ""
-}
-
-
-function pointerDownLineText(e) {
-    if (!e.isPrimary || !textWriting) { return; }
-    const rect = canvas.getBoundingClientRect();
-    const scaleX = canvas.width / rect.width;
-    const scaleY = canvas.height / rect.height;
-    
-    const clickX = (e.clientX - rect.left) * scaleX;
-    const clickY = (e.clientY - rect.top) * scaleY;
-    
-    submitCurrentText();
-    
-    var pen = getPenColorAndWidthByIndex(activePenIndex);
-    currentAction = {
-        points: [],
-        x: clickX,
-        y: clickY,
-        text: "",
-        color: pen[0],
-        width: pen[1],
-        opacity: pen[2],
-        visible: true,
-        type: 'T', // 'text'
-        fontFamily: fontFamily,
-        fontSize: fontSize,
-        fontBold: fontBold,
-        fontItalic: fontItalic
-    };
-    textBox.focus()
-};
-// Prevent arrow key cursor movement
-textBox.addEventListener('keydown', e => {
-    if(!textWriting)return
-    if (['ArrowLeft', 'ArrowRight', 'ArrowUp', 'ArrowDown'].includes(e.key)) {
-        e.preventDefault();
-    }
-    else if (e.key === 'Escape') {
-        submitCurrentText();
-    }
-    else if (e.altKey){
-        e.preventDefault()
-    }
-});
-textBox.addEventListener('input', () => {
-    if (!currentAction || !textWriting) return;
-    
-    currentAction.text = textBox.value
-    drawTextOnCanvas();
-});
-
-textBox.addEventListener('focus', () => startCursorBlink());
-textBox.addEventListener('blur', () => {clearInterval(cursorBlinkInterval); submitCurrentText();});
-// Prevent canvas click from stealing focus
-canvas_wrapper.addEventListener('pointerdown', e => {
-    if(!textWriting)return;
-    e.preventDefault(); // Prevent focus loss    
-    // Ensure textarea stays focused
-    textBox.focus();
-});
-
-// Helper functions for calculations
-function calculateLineHeight(fontSize) {
-    // Line height = font size + appropriate spacing
-    // For small fonts: add more relative spacing
-    // For large fonts: add less relative spacing
-    if (fontSize < 12) {
-        return fontSize + 8; // More spacing for small text
-    } else if (fontSize < 24) {
-        return fontSize + 6; // Medium spacing
-    } else {
-        return fontSize + 4; // Less spacing for large text
-    }
-}
-
-function calculateCursorOffset(fontSize) {
-    // Cursor offset should be proportional to font size
-    return Math.max(1, Math.floor(fontSize / 15));
-}
-
-function drawTextOnCanvas() {
-    if(!textWriting)return;
-    secondary_ctx.clearRect(0, 0, canvas.width, canvas.height);
-        
-    // Draw current entry text (dynamic)
-    if (currentAction) {
-        var lines = drawTextFromAction(secondary_ctx, currentAction)
-        
-        // Draw cursor if visible
-        if (textCursorVisible) {
-            const textWidth = lines ? secondary_ctx.measureText(lines[lines.length-1]).width + calculateCursorOffset(currentAction.fontSize) : 0;
-            var currentLine = lines ? lines.length-1 : 0
-            drawCursor(currentAction.x + textWidth, currentAction.y + currentLine * calculateLineHeight(currentAction.fontSize));
-        }
-    }
-}
-
-function drawTextFromAction(paramCtx, action){
-    var lines = null
-    if (action && action.type == 'T') {
-        if(action.text){
-            var lines = action.text.split(/(?<!\\\\)\\n/);//this is an escaped string as javascript is passed as a string into the python code
-            for(var i = 0; i< lines.length; i++){
-                var fontString = "";
-                if (action.fontBold) fontString += "bold ";
-                if (action.fontItalic) fontString += "italic ";
-                fontString += action.fontSize + "px " + action.fontFamily;
-                
-                paramCtx.font = fontString;
-                paramCtx.textBaseline = 'top';
-                paramCtx.fillText(lines[i], action.x , action.y + i * calculateLineHeight(action.fontSize));
-            }
-        }
-    }
-    return lines
-}
-
-function pointerDownLine(e) {
-    wrapper.classList.add('nopointer');
-	if (!e.isPrimary || calligraphy || strokeDelete || textWriting) { return; }
-	if (e.pointerType[0] == 'p' && pressureSensitivity) { drawingWithPressurePenOnly = true }
-	else if ( drawingWithPressurePenOnly) { return; }
-    var pen = getPenColorAndWidthByIndex(activePenIndex);
-    if(!isPointerDown){
-        event.preventDefault();
-        currentAction = {
-            points: [],
-            color: pen[0],
-            width: pen[1],
-            opacity: pen[2],
-            visible: true,
-            type: perfectFreehand ? 'P' : 'L', // 'simple', 'perfect'
-        };
-        currentAction.points.push([
-			e.offsetX,
-			e.offsetY,
-            (e.pointerType[0] == 'p' && pressureSensitivity) ? e.pressure : 2,//set pressure for perfect draw
-			(e.pointerType[0] == 'p' && pressureSensitivity) ? (1.0 + e.pressure * currentAction.width * 2) : currentAction.width]);//set pressure for simple lines
-        if(perfectFreehand){
-            const box = calculateClearBox(currentAction.points);
-            secondary_ctx.clearRect(box.x, box.y, box.width, box.height);
-            var path = new Path2D(getFreeDrawSvgPath(currentAction.points, currentAction.width, true)) 
-            secondary_ctx.fill(path)
-        }
-        else{
-            draw_secondary_path_at_some_point_async(currentAction.points[0][0],currentAction.points[0][1],currentAction.points[0][0],currentAction.points[0][1],currentAction.points[0][0],currentAction.points[0][1],currentAction.points[0][3])
-        }
-        start_drawing();
-    }
-}
-
-function pointerMoveLine(e) {
-	if (!e.isPrimary || calligraphy || strokeDelete || textWriting) { return; }
-	if (e.pointerType[0] != 'p' && drawingWithPressurePenOnly) { return; }
-    var pen = getPenColorAndWidthByIndex(activePenIndex);
-    if (isPointerDown) {
-        currentAction.points.push([
-			e.offsetX,
-			e.offsetY,
-            (e.pointerType[0] == 'p' && pressureSensitivity) ? e.pressure : 2,
-			(e.pointerType[0] == 'p' && pressureSensitivity) ? (1.0 + e.pressure * currentAction.width * 2) : currentAction.width]);
-        if(perfectFreehand){
-            const box = calculateClearBox(currentAction.points);
-            secondary_ctx.clearRect(box.x, box.y, box.width, box.height);
-            var path = new Path2D(getFreeDrawSvgPath(currentAction.points, currentAction.width, true)) 
-            secondary_ctx.fill(path)
-        }
-        else{
-            p1 = currentAction.points.length > 2 ? currentAction.points.length-3 : 0;
-            p2 = currentAction.points.length > 1 ? currentAction.points.length-2 : 0;
-            p3 = currentAction.points.length - 1;
-            draw_secondary_path_at_some_point_async(currentAction.points[p1][0],currentAction.points[p1][1],currentAction.points[p2][0],currentAction.points[p2][1],currentAction.points[p3][0],currentAction.points[p3][1],currentAction.points[p3][3])
-        }
+        'start_visible': bool(config.get('start_visible', False)),
+        'default_pen_index': int(config.get('default_pen_index', 1)),
+        'undoable_clears': int(config.get('undoable_clears', 10)),
+        'predicted_ink': bool(config.get('predicted_ink', False)),
+        'predicted_ink_lookahead_ms': float(config.get('predicted_ink_lookahead_ms', 16)),
+        'predicted_ink_measure': bool(config.get('predicted_ink_measure', False)),
+        'tiled_canvas': bool(config.get('tiled_canvas', True)),
+        'canvas_memory_mb': max(float(config.get('canvas_memory_mb', 256)), 16),
+        'committed_layer_scale': min(max(float(config.get('committed_layer_scale', 1)), 0.25), 1),
+        'render_worker': bool(config.get('render_worker', True)),
+        'render_worker_scripts': [web_asset_url(name) for name in render_worker_assets],
+        'fit_worker_scripts': [web_asset_url(name) for name in fit_worker_assets],
+        'perfect_freehand': ts_default_PerfFreehand == "true",
+        'calligraphy': ts_default_Calligraphy == "true",
+        'pressure_sensitivity': ts_pressure_sensitivity,
+        'small_canvas': ts_default_small_canvas,
+        'follow': ts_follow,
+        'low_latency': ts_low_latency,
+        'pen_colors': [ts_pen1_color, ts_pen2_color, ts_pen3_color, ts_pen4_color],
+        'pen_widths': [float(width) for width in (ts_pen1_width, ts_pen2_width, ts_pen3_width, ts_pen4_width)],
+        'pen_opacities': [float(opacity) for opacity in (ts_pen1_opacity, ts_pen2_opacity, ts_pen3_opacity, ts_pen4_opacity)],
+        'font_family': ts_font_family,
+        'font_size': ts_font_size,
+        'font_bold': ts_font_bold,
+        'font_italic': ts_font_italic,
     }
-}
-
-function pointerUpLine(e) {
-    wrapper.classList.remove('nopointer');
-    /* Needed for the last bit of the drawing. */
-	if (!e.isPrimary || calligraphy || strokeDelete || textWriting) { return; }
-	if (e.pointerType[0] != 'p' && drawingWithPressurePenOnly) { return; }
-    var pen = getPenColorAndWidthByIndex(activePenIndex);
-    if (isPointerDown) {
-        currentAction.points.push([
-			e.offsetX,
-			e.offsetY,
-            (e.pointerType[0] == 'p' && pressureSensitivity) ? e.pressure : 2,
-			(e.pointerType[0] == 'p' && pressureSensitivity) ? (1.0 + e.pressure * currentAction.width * 2) : currentAction.width]);
-
-        if(perfectFreehand){
-            const box = calculateClearBox(currentAction.points);
-            secondary_ctx.clearRect(box.x, box.y, box.width, box.height);
-            var path = new Path2D(getFreeDrawSvgPath(currentAction.points, currentAction.width,true)) 
-            secondary_ctx.fill(path)
-        }
-        else{
-            p1 = currentAction.points.length > 2 ? currentAction.points.length-3 : 0;
-            p2 = currentAction.points.length > 1 ? currentAction.points.length-2 : 0;
-            p3 = currentAction.points.length - 1;
-            draw_secondary_path_at_some_point_async(currentAction.points[p1][0],currentAction.points[p1][1],currentAction.points[p2][0],currentAction.points[p2][1],currentAction.points[p3][0],currentAction.points[p3][1],currentAction.points[p3][3])
-        }
-        add_action_to_history(currentAction)
-        secondary_ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);//clear the guide line in second canvas
-    } 
-	stop_drawing();
-    
-}
-
-var tempColor = ""; // The variable to change
-var eraseMode = false // Are we currently drawing the erase line?
-var intervalId = null; // To track the interval
-
-// Function to update the variable and display
-function updateVariable() {
-    variable += 1; // Increment the variable
-    status.textContent = `Variable Value: ${variable}`; // Update display
-}
-
-document.addEventListener('keydown', function(e) {
-    // For hold mode, start deleting when shift+d is pressed
-    if(textWriting)return;
-    if ((e.keyCode == 68 || e.key == "d") && e.shiftKey) {
-        e.preventDefault();
-        // Only activate if this is NOT a repeat event (first press)
-        if (!e.repeat) {
-            enter_stroke_delete_mode();
-        }
-    }
-
-});
-
-document.addEventListener('keyup', function(e) {
-    // For hold mode, stop deleting when shift+d is released
-    if ((e.keyCode == 68 || e.key == "d") && isDeleting) {
-        finishDelete()
-        exit_stroke_delete_mode();
-    }
-});
-// TODO chinese mode?
-// TODO save draw info in cards, no need to save redos
-// TODO make clear per side of card by marking which items have been cleared
-// TODO add merging of front into back for correct behaviour with saving draw info
-// TODO add toggle to not apply front card to the back one
-// TODO clear history button?
-document.addEventListener('keyup', function(e) {
-    // alt + z
-    if ((e.keyCode == 90 || e.key == "z") && e.altKey) {
-		e.preventDefault();
-        ts_undo();
-    }
-    // alt + y
-    if ((e.keyCode == 89 || e.keyCode == "y") && e.altKey) {
-        e.preventDefault();
-        ts_redo();
-    }
-    // /
-    if (e.key === ".") {
-        add_clear_marker();
-    }
-	// ,
-    if (e.key === ",") {
-        switch_visibility();
-    }
-    if ((e.keyCode == 84 || e.key == "t") && e.altKey) {
-        e.preventDefault();
-        switch_text_writing_mode();
-    }
-    if ((e.keyCode == 68 || e.key == "d") && e.altKey) {
-        e.preventDefault();
-        finishDelete()
-        switch_stroke_delete_mode();
-    }
-    // alt + c
-    if ((e.keyCode === 67 || e.key === "c") && e.altKey) {
-        e.preventDefault();
-        switch_calligraphy_mode();
-    }
-        // alt + x
-    if ((e.keyCode === 88 || e.key === "x") && e.altKey) {
-        e.preventDefault();
-        switch_perfect_freehand();
-    }
-    // alt + b
-    if ((e.keyCode === 66 || e.key === "b") && e.altKey) {
-        e.preventDefault();
-        switch_small_canvas();
-    }
-        // alt + 1
-    if ((e.keyCode === 49 || e.key === "1") && e.altKey) {
-        e.preventDefault();
-        activate_pen1();
-    }
-        // alt + 2
-    if ((e.keyCode === 50 || e.key === "2") && e.altKey) {
-        e.preventDefault();
-        activate_pen2();
-    }
-        // alt + 3
-    if ((e.keyCode === 51 || e.key === "3") && e.altKey) {
-        e.preventDefault();
-        activate_pen3();
-    }
-        // alt + 4
-    if ((e.keyCode === 52 || e.key === "4") && e.altKey) {
-        e.preventDefault();
-        activate_pen4();
-    }
-})
-
-// ----------------------------------------- Stroke Delete -----------------------------------------
 
+def blackboard_js():
+    """
+    Script tags loading the drawing engine from the add-on's web exports.
+    Each URL carries a hash of the file, so the webview can keep the files
+    (and their compiled code) cached until they actually change.
+    """
+    return "".join(
+        '<script src="%s"></script>' % web_asset_url(name) for name in web_assets
+    )
 
-function doLinesIntersect(line1, line2) {
-    function lineLine(x1, y1, x2, y2, x3, y3, x4, y4) {
-        // calculate the distance to intersection point
-        var uA = ((x4-x3)*(y1-y3) - (y4-y3)*(x1-x3)) / ((y4-y3)*(x2-x1) - (x4-x3)*(y2-y1));
-        var uB = ((x2-x1)*(y1-y3) - (y2-y1)*(x1-x3)) / ((y4-y3)*(x2-x1) - (x4-x3)*(y2-y1));
+class ReviewerPayload:
+    """
+    Builds the HTML appended to the reviewer.
 
-        // if uA and uB are between 0-1, lines are colliding
-        if (uA >= 0 && uA <= 1 && uB >= 0 && uB <= 1) {
-            return true;
-        }
-    return false;
-    }
-    // Iterate over all points in the two arrays
-    for (let i = 0; i < line1.length - 1; i++) {
-        for (let j = 0; j < line2.length - 1; j++) {
-            if (lineLine(line1[i][0], line1[i][1], line1[i + 1][0], line1[i + 1][1], line2[j][0], line2[j][1], line2[j + 1][0], line2[j + 1][1])) {
-                return true; // Lines intersect
-            }
+    The markup, styles and scripts never change while Anki is running, so they
+    are built once and kept. Only the small config block (a JSON object and the
+    CSS variables) is rebuilt, and only when one of the settings has changed.
+    """
+    def __init__(self):
+        self.invalidate()
+        self.builds = 0
+        self.config_builds = 0
+        self.build_ms = 0.0
+        self.config_build_ms = 0.0
+
+    def invalidate(self):
+        """
+        Drop everything that was memoized, the next render rebuilds it all.
+        """
+        self._body = None
+        self._config_key = None
+        self._config = None
+        self._addon_config = None
+
+    def addon_config(self):
+        if self._addon_config is None:
+            self._addon_config = mw.addonManager.getConfig(__name__) or {}
+        return self._addon_config
+
+    def body(self):
+        if self._body is None:
+            start = time.perf_counter()
+            self._body = (
+                blackboard_html() +
+                blackboard_css() +
+                blackboard_js()
+            )
+            self.builds += 1
+            self.build_ms = (time.perf_counter() - start) * 1000
+        return self._body
+
+    def config(self):
+        settings = blackboard_config()
+        css = blackboard_css_config()
+        key = (json.dumps(settings, sort_keys=True), css)
+        if key != self._config_key:
+            start = time.perf_counter()
+            self._config_key = key
+            self._config = (
+                css +
+                "<script>var ts_config = " +
+                key[0].replace("</", "<\\/") +
+                ";</script>"
+            )
+            self.config_builds += 1
+            self.config_build_ms = (time.perf_counter() - start) * 1000
+        return self._config
+
+    def render(self):
+        return self.config() + self.body()
+
+    def stats(self):
+        return {
+            'body_builds': self.builds,
+            'body_build_ms': round(self.build_ms, 3),
+            'body_size': len(self._body) if self._body is not None else 0,
+            'config_builds': self.config_builds,
+            'config_build_ms': round(self.config_build_ms, 3),
         }
-    }
 
-    return false; // No intersections
-}
+ts_payload = ReviewerPayload()
 
-function pointerDownStrokeDelete(e) {
-    wrapper.classList.add('nopointer');
-    if (!e.isPrimary || !strokeDelete) { return; }
-    submitCurrentText()
-    event.preventDefault();
-    // Use solid red for delete mode, not transparent
-    var pen = getPenColorAndWidthByIndex(activePenIndex);
-    currentAction = {
-        points: [],
-        color: "rgba(255, 0, 0, 1)",
-        width: 4,
-        opacity: '1',
-        visible: true,
-        type: 'D', // 'simple', 'perfect', or 'calligraphy'
-    };
-    secondary_ctx.strokeStyle = secondary_ctx.fillStyle = currentAction.color;
-    secondary_ctx.lineWidth = currentAction.width;
-
-    start_drawing();
-};
-
-function pointerMoveStrokeDelete(e) {
-    if (!e.isPrimary || !strokeDelete) { return; }
-    if(isPointerDown) {
-        var mousePos = [e.offsetX, e.offsetY];
-        if(currentAction.points.length != 0) {
-            if(getDist(mousePos,currentAction.points[currentAction.points.length-1])>=MIN_MOUSE_DIST)
-                currentAction.points.push(mousePos);
-            secondary_ctx.lineWidth = 4;
-            drawCurrentPath();
-        } else
-            currentAction.points.push(mousePos);
-    } 
-};
-
-function finishDelete(){
-    if (!strokeDelete || !currentAction.points || !currentAction.points.length) { return; }
-    stop_drawing();
-    var pen = getPenColorAndWidthByIndex(activePenIndex)
-    secondary_ctx.strokeStyle = pen[0] // active pen Color;
-    secondary_ctx.fillStyle = pen[0] //active pen Color;
-    secondary_ctx.lineWidth = pen[1] //active pen Color;
-    marked_lines = []
-    for (let lineIndex = 0; lineIndex < lineHistory.length; lineIndex++) {
-        const element = lineHistory[lineIndex];
-        if(!element.points || !element.type == 'D' || !element.visible) continue;
-        if(doLinesIntersect(element.points, currentAction.points)){
-            element.visible = false;//mark as deleted
-            marked_lines.push(lineIndex)//add reference for easy undo
+class DrawingStore:
+    """
+    Keeps the drawing of each card, so it is still there the next time the card
+    is shown. Drawings are kept in the format of stroke_codec.py in a SQLite file
+    in user_files, one per profile as card ids belong to a collection, and only
+    read when their card comes up.
+    """
+    def __init__(self):
+        self.card_id = None  # card whose drawing is on the board
+        self.saves = 0
+        self.last_save_bytes = 0
+        self.failed_saves = 0
+        self.pruned = 0
+
+    def path(self):
+        return file.with_name("user_files") / f"drawings-{mw.pm.name}.sqlite"
+
+    def connect(self):
+        path = self.path()
+        path.parent.mkdir(exist_ok=True)
+        db = sqlite3.connect(str(path))
+        db.execute("CREATE TABLE IF NOT EXISTS drawings "
+                   "(card_id INTEGER PRIMARY KEY, data BLOB NOT NULL, modified INTEGER NOT NULL)")
+        return db
+
+    def save(self, card_id, data):
+        """
+        Store what ts_export_drawing() returned for a card: the drawing base64
+        encoded, '' if there is none anymore, or None if it didn't change.
+        """
+        if data is None:
+            return
+        try:
+            drawing = base64.b64decode(data)
+            empty = not drawing or not stroke_codec.decode(drawing)
+        except ValueError as error:
+            # keep the drawing saved before, this runs in the middle of a review
+            print(f"AnkiDraw: not saving the drawing of card {card_id}: {error}")
+            self.failed_saves += 1
+            return
+        with closing(self.connect()) as db, db:
+            if empty:
+                db.execute("DELETE FROM drawings WHERE card_id = ?", (card_id,))
+                return
+            db.execute("INSERT OR REPLACE INTO drawings VALUES (?, ?, ?)", (card_id, drawing, int(time.time())))
+        self.saves += 1
+        self.last_save_bytes = len(drawing)
+
+    def load(self, card_id):
+        """
+        Return the drawing of a card base64 encoded, or None if it has none.
+        """
+        with closing(self.connect()) as db:
+            row = db.execute("SELECT data FROM drawings WHERE card_id = ?", (card_id,)).fetchone()
+        return base64.b64encode(row[0]).decode("ascii") if row else None
+
+    def prune(self):
+        """
+        Drop the drawings of cards that are no longer in the collection.
+        """
+        if mw.col is None or not self.path().exists():
+            return
+        with closing(self.connect()) as db, db:
+            saved = [card_id for (card_id,) in db.execute("SELECT card_id FROM drawings")]
+            if not saved:
+                return
+            existing = set(mw.col.db.list(f"SELECT id FROM cards WHERE id IN {ids2str(saved)}"))
+            gone = [(card_id,) for card_id in saved if card_id not in existing]
+            db.executemany("DELETE FROM drawings WHERE card_id = ?", gone)
+        self.pruned += len(gone)
+
+    def stats(self):
+        with closing(self.connect()) as db:
+            count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM drawings").fetchone()
+        return {
+            'saved_drawings': count,
+            'saved_drawing_bytes': size,
+            'drawing_saves': self.saves,
+            'last_drawing_bytes': self.last_save_bytes,
+            'failed_drawing_saves': self.failed_saves,
+            'pruned_drawings': self.pruned,
         }
-    }
-    if(marked_lines.length){
-        currentAction.deletedList = marked_lines;//add list of lines which were deleted to the list
-        currentAction.type = 'D'
-        add_action_to_history(currentAction);
-    }
-    secondary_ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);//clear the guide line in second canvas
-    ts_redraw()
-}
-
-function pointerUpStrokeDelete(e) {
-    wrapper.classList.remove('nopointer');
-    stop_drawing();
-    if (!e.isPrimary || !strokeDelete || !currentAction.points || !currentAction.points.length) { return; }
-    finishDelete();
-};
-
-// ----------------------------------------- Perfect Freehand -----------------------------------------
-
-// The rest of the code gets loaded in from PerfectFreehand.js
-
-function med(A, B) {
-  return [(A[0] + B[0]) / 2, (A[1] + B[1]) / 2];
-}
-
-// Trim SVG path data so number are each two decimal points. This
-// improves SVG exports, and prevents rendering errors on points
-// with long decimals.
-const TO_FIXED_PRECISION = /(\s?[A-Z]?,?-?[0-9]*\.[0-9]{0,2})(([0-9]|e|-)*)/g;
 
-function getSvgPathFromStroke(points){
-  if (!points.length) {
-    return "";
-  }
+ts_drawings = DrawingStore()
 
-  const max = points.length - 1;
+def ts_save_drawings_enabled():
+    return bool(ts_payload.addon_config().get('save_drawings', True))
 
-  return points
-    .reduce(
-      (acc, point, i, arr) => {
-        if (i === max) {
-          acc.push(point, med(point, arr[0]), "L", arr[0], "Z");
-        } else {
-          acc.push(point, med(point, arr[i + 1]));
-        }
-        return acc;
-      },
-      ["M", points[0], "Q"],
-    )
-    .join(" ")
-    .replace(TO_FIXED_PRECISION, "$1");
-}
+def ts_save_drawing(then=None):
+    """
+    Ask the reviewer for the drawing of the card on the board and store it.
+    then, if given, is called once it is stored, and never before the caller
+    returned, so the JS the caller runs next reaches the page first.
+    """
+    card_id = ts_drawings.card_id
+    if card_id is None or not ts_state_on or not ts_save_drawings_enabled():
+        if then:
+            QTimer.singleShot(0, then)
+        return
 
-function getFreeDrawSvgPath(inputPoints, width, complete) {
-  // Consider changing the options for simulated pressure vs real pressure
+    def store(data):
+        try:
+            ts_drawings.save(card_id, data)
+        finally:
+            if then:
+                then()
 
-  const options = {
-    simulatePressure: inputPoints[0][2] > 1,
-    size: width,
-    thinning: 0.6,
-    smoothing: 0.5,
-    streamline: 0.5,
-    easing: (t) => Math.sin((t * Math.PI) / 2), // https://easings.net/#easeOutSine
-    last: complete, // LastCommittedPoint is added on pointerup
-  };
+    mw.reviewer.web.evalWithCallback(
+        "typeof ts_export_drawing === 'function' ? ts_export_drawing() : null", store)
 
-  return getSvgPathFromStroke(getStroke(inputPoints, options));
-}
-/*
- -------------------------------- Caligrapher ------------------------------------------
- Created By: August Toman-Yih
- Git Repository: https://github.com/atomanyih/Calligrapher
-*/
-/* ------------------------------        script.js        -----------------------------*/
-
-// The rest of the code gets loaded in from Caligrapher.js
-
-//Modified to work with current canvas and board
-//share the same canvas with pressure drawing
- /*var canvas = document.getElementById('canvas'),
-    width = canvas.width,
-    height = canvas.height,
-    context = canvas.getContext("2d");
-	*/
-
-//FIXME REORGANIZE EBERYTING
-//--- constants ---//
-RESOLUTION = 4; 
-WEIGHT = 15;
-MIN_MOUSE_DIST = 5;
-SPLIT_THRESHOLD = 8;
-SQUARE_SIZE = 300;
-
-function drawCurrentPath() {
-    secondary_ctx.beginPath();
-    secondary_ctx.moveTo(currentAction.points[0][0],currentAction.points[0][1]);
-    for(var i = 1; i<currentAction.points.length; i++) {
-        secondary_ctx.lineTo(currentAction.points[i][0],currentAction.points[i][1]);
-    } 
-    secondary_ctx.stroke();
-}
+def ts_load_drawing(card):
+    """
+    Put the saved drawing of the card, if any, on the board, unless another
+    card came up in the meantime.
+    """
+    if card is not mw.reviewer.card:
+        return
+    ts_drawings.card_id = card.id if card and ts_save_drawings_enabled() else None
+    if ts_drawings.card_id is None:
+        return
+    data = ts_drawings.load(card.id)
+    if data:
+        execute_js(f"if (typeof ts_import_drawing === 'function') {{ ts_import_drawing({json.dumps(data)}); }}")
 
-function pointerDownCaligraphy(e) {
-    wrapper.classList.add('nopointer');
-    if (!e.isPrimary || !calligraphy) { return; }
-    event.preventDefault();//don't paint anything when clicking on buttons, especially for undo to work
-    var pen = getPenColorAndWidthByIndex(activePenIndex);
-    currentAction = {
-        points: [],
-        color: pen[0],
-        width: pen[1],
-        opacity: pen[2],
-        visible: true,
-        type: 'C', // 'simple', 'perfect', or 'calligraphy'
-    };
-    start_drawing();
-};
-
-function pointerMoveCaligraphy(e) {
-    if (!e.isPrimary || !calligraphy) { return; }
-    if(isPointerDown) {
-        var mousePos = [e.offsetX, e.offsetY];
-        if(currentAction.points.length != 0) {
-            if(getDist(mousePos,currentAction.points[currentAction.points.length-1])>=MIN_MOUSE_DIST)
-                currentAction.points.push(mousePos);
-            drawCurrentPath();
-        } else
-            currentAction.points.push(mousePos);
-    } 
-};
-
-function pointerUpCaligraphy(e) {
-    wrapper.classList.remove('nopointer');
-    stop_drawing();
-    if (!e.isPrimary || !calligraphy || !currentAction.points || !currentAction.points.length) { return; }
-    
-    add_action_to_history(currentAction)
-    secondary_ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);//clear the guide line in second canvas
-};
-</script>
-"""
+def ts_invalidate_payload():
+    """
+    Forget the memoized reviewer payload, e.g. after the add-on config changed.
+    """
+    ts_payload.invalidate()
 
 def custom(*args, **kwargs):
     global ts_state_on
     default = ts_default_review_html(*args, **kwargs)
     if not ts_state_on:
         return default
-    output = (
-        default +
-        blackboard_html() +
-        blackboard_css() +
-        blackboard_js() +
-        "<script>" +
-        caligrapher_js +
-        perfect_freehand_js+
-        "</script>"
-    )
-    return output
+    return default + ts_payload.render()
 mw.reviewer.revHtml = custom
 
 
@@ -1932,6 +685,12 @@ def ts_change_font_settings():
         
         execute_js("if (typeof ts_redraw === 'function') { ts_redraw(); }")
 
+def ts_set_pen_style(pen_number, **changes):
+    """
+    Rebuild the style of one pen in the reviewer, widths and opacities are sent as numbers.
+    """
+    execute_js(f"if (typeof set_pen_style === 'function') {{ set_pen_style({pen_number - 1}, {json.dumps(changes)}); }}")
+
 @slot()
 def ts_change_pen_color(pen_number):
     """
@@ -1947,8 +706,7 @@ def ts_change_pen_color(pen_number):
         globals()[f"ts_pen{pen_number}_color"] = qcolor.name()
         
         # Reload the reviewer to apply the new color
-        execute_js(f"pen{pen_number}Color = '{qcolor.name()}';")
-        execute_js("if (typeof update_pen_settings === 'function') { update_pen_settings(); }")
+        ts_set_pen_style(pen_number, color=qcolor.name())
 
 @slot()
 def ts_change_pen_width(pen_number):
@@ -1964,8 +722,7 @@ def ts_change_pen_width(pen_number):
         globals()[f"ts_pen{pen_number}_width"] = value
         
         # Reload the reviewer to apply the new width
-        execute_js(f"pen{pen_number}Width = '{value}';")
-        execute_js("if (typeof update_pen_settings === 'function') { update_pen_settings(); }")
+        ts_set_pen_style(pen_number, width=value)
 
 @slot()
 def ts_change_pen_opacity(pen_number):
@@ -1981,9 +738,7 @@ def ts_change_pen_opacity(pen_number):
         globals()[f"ts_pen{pen_number}_opacity"] = value
         
         # Reload the reviewer to apply the new opacity
-        execute_js(f"pen{pen_number}Opacity = '{value}';")
-        execute_js("if (typeof update_pen_settings === 'function') { update_pen_settings(); }")
-        execute_js("if (typeof ts_redraw === 'function') { ts_redraw(); }")
+        ts_set_pen_style(pen_number, opacity=value)
 
 class CustomDialog(QDialog):
     def __init__(self):
@@ -2145,6 +900,15 @@ def ts_change_follow_settings():
     execute_js("fullscreen_follow = " + str(ts_follow).lower() + ";")
     execute_js("if (typeof resize === 'function') { resize(); }")
 
+@slot()
+def ts_change_low_latency_settings():
+    """
+    Switch low latency ink, the live stroke skips page compositing where supported.
+    """
+    global ts_low_latency
+    ts_low_latency = not ts_low_latency
+    execute_js("if (typeof ts_set_low_latency === 'function') { ts_set_low_latency(" + str(ts_low_latency).lower() + "); }")
+
 @slot()
 def ts_change_small_default_settings():
     """
@@ -2185,6 +949,23 @@ def ts_change_auto_hide_pointer_settings():
     ts_switch()
     ts_switch()
 
+@slot()
+def ts_show_diagnostics():
+    """
+    Show the reviewer payload and drawing engine counters.
+    """
+    def show(js_stats):
+        lines = [f"{key}: {value}" for key, value in ts_payload.stats().items()]
+        lines += [f"{key}: {value}" for key, value in ts_drawings.stats().items()]
+        if js_stats:
+            lines += [f"{key}: {value}" for key, value in js_stats.items()]
+        showInfo("\n".join(lines), title="AnkiDraw diagnostics")
+
+    if mw.state == "review" and ts_state_on:
+        mw.reviewer.web.evalWithCallback("typeof ts_diagnostics === 'function' ? (ts_benchmark_dispatch(), ts_diagnostics()) : null", show)
+    else:
+        show(None)
+
 def checkProfile():
     if not ts_profile_loaded:
         showWarning("No profile loaded. AnkiPenDown may not work correctly.")
@@ -2234,7 +1015,7 @@ def ts_setup_menu():
     """
     Initialize menu. 
     """
-    global ts_menu_switch, ts_menu_auto_hide, ts_menu_auto_hide_pointer, ts_menu_small_default, ts_menu_zen_mode, ts_menu_follow, ts_menu_pressure
+    global ts_menu_switch, ts_menu_auto_hide, ts_menu_auto_hide_pointer, ts_menu_small_default, ts_menu_zen_mode, ts_menu_follow, ts_menu_pressure, ts_menu_low_latency
 
     try:
         mw.addon_view_menu
@@ -2252,10 +1033,12 @@ def ts_setup_menu():
     ts_menu_auto_hide = QAction("""Auto &hide toolbar when drawing""", mw, checkable=True)
     ts_menu_auto_hide_pointer = QAction("""Auto &hide pointer when drawing""", mw, checkable=True)
     ts_menu_follow = QAction("""&Follow when scrolling (speedup draw)""", mw, checkable=True)
+    ts_menu_low_latency = QAction("""&Low latency ink""", mw, checkable=True)
     ts_menu_small_default = QAction("""&Small Canvas by default (speedup draw)""", mw, checkable=True)
     ts_menu_zen_mode = QAction("""Enable Zen Mode(hide toolbar until disabled)""", mw, checkable=True)
     ts_toolbar_settings = QAction("""&Toolbar and canvas location settings""", mw)
     ts_font_settings = QAction("""Select &Font for text writing""", mw)    
+    ts_diagnostics_action = QAction("""Show drawing &diagnostics""", mw)
 
     ts_toggle_seq = QKeySequence("Ctrl+r")
     ts_menu_switch.setShortcut(ts_toggle_seq)
@@ -2295,6 +1078,7 @@ def ts_setup_menu():
     mw.addon_view_menu.addAction(ts_menu_auto_hide)
     mw.addon_view_menu.addAction(ts_menu_auto_hide_pointer)
     mw.addon_view_menu.addAction(ts_menu_follow)
+    mw.addon_view_menu.addAction(ts_menu_low_latency)
     mw.addon_view_menu.addAction(ts_menu_small_default)
     mw.addon_view_menu.addAction(ts_menu_zen_mode)
     mw.addon_view_menu.addMenu(ts_pen_color_menu)
@@ -2302,6 +1086,7 @@ def ts_setup_menu():
     mw.addon_view_menu.addMenu(ts_pen_opacity_menu)
     mw.addon_view_menu.addAction(ts_toolbar_settings)
     mw.addon_view_menu.addAction(ts_font_settings)
+    mw.addon_view_menu.addAction(ts_diagnostics_action)
 
     ts_menu_pen1_color.triggered.connect(lambda: ts_change_pen_color(1))
     ts_menu_pen2_color.triggered.connect(lambda: ts_change_pen_color(2))
@@ -2320,10 +1105,12 @@ def ts_setup_menu():
     ts_menu_auto_hide.triggered.connect(ts_change_auto_hide_settings)
     ts_menu_auto_hide_pointer.triggered.connect(ts_change_auto_hide_pointer_settings)
     ts_menu_follow.triggered.connect(ts_change_follow_settings)
+    ts_menu_low_latency.triggered.connect(ts_change_low_latency_settings)
     ts_menu_small_default.triggered.connect(ts_change_small_default_settings)
     ts_menu_zen_mode.triggered.connect(ts_change_zen_mode_settings)
     ts_toolbar_settings.triggered.connect(ts_change_toolbar_settings)
     ts_font_settings.triggered.connect(ts_change_font_settings)
+    ts_diagnostics_action.triggered.connect(ts_show_diagnostics)
 
 #
 # ONLOAD SECTION
@@ -2335,8 +1122,12 @@ def ts_onload():
     """
     addHook("unloadProfile", ts_save)
     addHook("profileLoaded", ts_load)
+    addHook("profileLoaded", ts_drawings.prune)
     addHook("showQuestion", clear_blackboard)
     addHook("showAnswer", resize_js)
+    addHook("showAnswer", ts_save_drawing)
+    addHook("reviewCleanup", ts_save_drawing)
+    mw.addonManager.setConfigUpdatedAction(__name__, lambda config: ts_invalidate_payload())
     ts_setup_menu()
 
 ts_onload()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# License: GNU GPL, version 3 or later; http://www.gnu.org/copyleft/gpl.html
+"""
+Binary format the drawing of a card is saved in.
+
+This is the same codec as StrokeCodec.js, which has the layout of the bytes.
+Both must keep writing exactly the same bytes for the same drawing. An action
+is a dict like the ones in lineHistory, with its points as a list of
+[x, y, pressure, width] (lines) or [x, y] (calligraphy) lists. Text actions
+have no points.
+"""
+
+import math
+import re
+
+VERSION = 1
+TYPES = "LPCT"
+QUANTUM = 8  # stored steps per pixel
+NO_PRESSURE = 2  # what push_line_point() stores without a pen
+
+
+def _round(value):
+    """
+    Round half up like Math.round, round() would round half to even.
+    """
+    return int(math.floor(value + 0.5))
+
+
+def _clamp(value, low, high):
+    return min(max(value, low), high)
+
+
+def _varint(out, value):
+    while value >= 128:
+        out.append(value % 128 + 128)
+        value //= 128
+    out.append(value)
+
+
+def _zigzag(out, value):
+    _varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+
+
+def _string(out, text):
+    utf8 = text.encode("utf-8")
+    _varint(out, len(utf8))
+    out += utf8
+
+
+def encode(actions):
+    """
+    Return the bytes of a drawing made of the given actions.
+    """
+    out = bytearray(b"AD")
+    out.append(VERSION)
+    _varint(out, len(actions))
+    for action in actions:
+        if action["type"] not in TYPES:
+            raise ValueError(f"can't encode action {action['type']!r}")
+        kind = TYPES.index(action["type"])
+        points = action.get("points") or []
+        pressure = kind < 2 and len(points) > 0 and points[0][2] != NO_PRESSURE
+        out.append(kind | (4 if pressure else 0) |
+                   (8 if action.get("fontBold") else 0) |
+                   (16 if action.get("fontItalic") else 0))
+        red, green, blue = (int(part) for part in re.findall(r"\d+", action["color"])[:3])
+        out += bytes((red, green, blue, _clamp(_round(action["opacity"] * 100), 0, 100)))
+        _varint(out, _round(action["width"] * 100))
+        if action["type"] == "T":
+            _zigzag(out, _round(action["x"] * QUANTUM))
+            _zigzag(out, _round(action["y"] * QUANTUM))
+            _varint(out, _round(action["fontSize"]))
+            _string(out, action["fontFamily"])
+            _string(out, action["text"])
+            continue
+        _varint(out, len(points))
+        last_x = last_y = 0
+        for point in points:
+            x = _round(point[0] * QUANTUM)
+            y = _round(point[1] * QUANTUM)
+            _zigzag(out, x - last_x)
+            _zigzag(out, y - last_y)
+            last_x, last_y = x, y
+        if pressure:
+            out += bytes(_clamp(_round(point[2] * 255), 0, 255) for point in points)
+    return bytes(out)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def byte(self):
+        if self.offset >= len(self.data):
+            raise ValueError("drawing is cut short")
+        value = self.data[self.offset]
+        self.offset += 1
+        return value
+
+    def varint(self):
+        value, scale = 0, 1
+        while True:
+            part = self.byte()
+            value += (part & 127) * scale
+            scale *= 128
+            if not part & 128:
+                return value
+
+    def zigzag(self):
+        value = self.varint()
+        return -(value + 1) // 2 if value % 2 else value // 2
+
+    def string(self):
+        length = self.varint()
+        if self.offset + length > len(self.data):
+            raise ValueError("drawing is cut short")
+        text = bytes(self.data[self.offset:self.offset + length]).decode("utf-8")
+        self.offset += length
+        return text
+
+
+def _number(value):
+    """
+    Format a number like JavaScript does in a template string, 1 and not 1.0.
+    """
+    return f"{value:g}"
+
+
+def decode(data):
+    """
+    Return the actions of a drawing, raise ValueError if data isn't one.
+    """
+    reader = _Reader(data)
+    if reader.byte() != 65 or reader.byte() != 68:
+        raise ValueError("not a drawing")
+    version = reader.byte()
+    if version != VERSION:
+        raise ValueError(f"unknown drawing version {version}")
+    actions = []
+    for _ in range(reader.varint()):
+        flags = reader.byte()
+        red, green, blue = reader.byte(), reader.byte(), reader.byte()
+        opacity = reader.byte() / 100
+        action = {
+            "type": TYPES[flags & 3],
+            "color": f"rgba({red}, {green}, {blue}, {_number(opacity)})",
+            "width": reader.varint() / 100,
+            "opacity": opacity,
+            "visible": True,
+        }
+        if action["type"] == "T":
+            action["x"] = reader.zigzag() / QUANTUM
+            action["y"] = reader.zigzag() / QUANTUM
+            action["fontSize"] = reader.varint()
+            action["fontFamily"] = reader.string()
+            action["text"] = reader.string()
+            action["fontBold"] = bool(flags & 8)
+            action["fontItalic"] = bool(flags & 16)
+            actions.append(action)
+            continue
+        x = y = 0
+        points = []
+        for _ in range(reader.varint()):
+            x += reader.zigzag()
+            y += reader.zigzag()
+            if action["type"] == "C":
+                points.append([x / QUANTUM, y / QUANTUM])
+            else:
+                points.append([x / QUANTUM, y / QUANTUM, NO_PRESSURE, action["width"]])
+        if flags & 4:
+            for point in points:
+                pressure = reader.byte() / 255
+                point[2] = pressure
+                point[3] = 1.0 + pressure * action["width"] * 2
+        action["points"] = points
+        actions.append(action)
+    return actions
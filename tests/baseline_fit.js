@@ -0,0 +1,129 @@
+// The curve fit as it was before it was solved in closed form (Caligrapher.js at the
+// baseline commit 3f24e20), kept as the reference the tests and the benchmark compare
+// against. coefficientHelper, gaussianElimination and its helpers are copied unchanged,
+// leastSquaresFit returns the control points instead of a Bezier and midpoint is
+// written out without the vector helpers.
+//
+// Its back substitution is only right when the second pivot search (which starts at
+// row 0 instead of row c) swaps the rows back. When it doesn't, the second inner
+// control point comes out as b0/a01 instead of the solution, see baseline_is_exact().
+
+function coefficientHelper(chord,ts) { //bad name
+    var c00 = 0, c01 = 0, c02x = 0, c02y = 0,
+        c10 = 0, c11 = 0, c12x = 0, c12y = 0,
+        x0 = chord[0][0],
+        y0 = chord[0][1],
+        x3 = chord[chord.length-1][0],
+        y3 = chord[chord.length-1][1];
+        
+    for(var i = 0; i<ts.length; i++) {
+        var t = ts[i],
+            px = chord[i][0],
+            py = chord[i][1];
+        c00 += 3*Math.pow(t,2)*Math.pow(1-t,4); //I'm doing it the dumb way cause it's easier to read
+        c01 += 3*Math.pow(t,3)*Math.pow(1-t,3);
+        c02x += t*Math.pow(1-t,2)*(px - Math.pow(1-t,3) * x0 - Math.pow(t,3) * x3);
+        c02y += t*Math.pow(1-t,2)*(py - Math.pow(1-t,3) * y0 - Math.pow(t,3) * y3);
+        
+        c10 += 3*Math.pow(t,3)*Math.pow(1-t,3);
+        c11 += 3*Math.pow(t,4)*Math.pow(1-t,2);
+        c12x += Math.pow(t,2)*(1-t)*(px - Math.pow(1-t,3) * x0 - Math.pow(t,3) * x3);
+        c12y += Math.pow(t,2)*(1-t)*(py - Math.pow(1-t,3) * y0 - Math.pow(t,3) * y3);
+    }
+    return [[[c00,c01,c02x],[c10,c11,c12x]],
+            [[c00,c01,c02y],[c10,c11,c12y]]];
+}
+
+function leastSquaresFit(chord,ts) {
+    if(chord.length < 4) {
+        var c1 = chord[0],
+            c4 = chord[chord.length-1],
+            c2 = midpoint(c1,c4,0.25),
+            c3 = midpoint(c1,c4,0.75);
+        return [c1,c2,c3,c4];
+    }
+    var cs = coefficientHelper(chord,ts),
+        xs = gaussianElimination(cs[0]),
+        ys = gaussianElimination(cs[1]);
+    
+    return [chord[0], [xs[0],ys[0]], [xs[1],ys[1]], chord[chord.length-1]];
+}
+
+function midpoint(p1,p2,t) {
+    return [p1[0]*(1-t) + p2[0]*t, p1[1]*(1-t) + p2[1]*t];
+}
+
+function vectorSum(v1, c, v2) {
+    var result = [];
+    for (var i = 0; i < v1.length; i++)
+        result[i] = v1[i] + c * v2[i];
+    return result;
+}
+
+function gaussianElimination(matrix) {
+    matrix = matrix.slice(0);
+    var numRows = matrix.length,
+        numCols = matrix[0].length,
+        sol = [];
+        
+    //matrixPrint(matrix);
+    
+    for(var c = 0; c<numRows; c++) {
+        var iMax = gElHelper(matrix,c);
+        
+        if(matrix[iMax][c] == 0)
+            throw "Matrix is singular"
+        swapRows(matrix,c,iMax);
+        
+        for(var d = c+1; d<numRows; d++) {
+            var mult = matrix[d][c]/matrix[c][c];
+            
+            matrix[d] = vectorSum(matrix[d],-mult,matrix[c]);
+        }
+    }
+    
+    for(var r = 0; r<numRows; r++) {
+        var i = numRows-r-1;
+        
+        for(var s = r+1; s<numRows; s++) {
+            var mult = -matrix[s][i]/matrix[r][i]
+            matrix[s] = vectorSum(matrix[s],mult,matrix[r]);
+        }
+        sol.push(matrix[r][numCols-1]/matrix[r][i]);
+    }
+    
+    return sol.reverse();
+}
+//Helper function finds the pos of the max in the column
+function gElHelper(matrix,c) {
+    var iMax = 0;
+    for(var i = c; i<matrix.length; i++) {
+        if(Math.abs(matrix[i][c])>Math.abs(matrix[iMax][c]))
+            iMax = i;
+    }
+    return iMax
+}
+
+function swapRows(matrix,r0,r1) {
+    var i = matrix[r0];
+    matrix[r0]=matrix[r1];
+    matrix[r1]=i;
+    return matrix;
+}
+
+// Whether the baseline solves the x system of chord exactly: after the forward step
+// the second pivot search has to bring the untouched row back to the top, which it
+// only does when that row's second coefficient is at least the reduced one.
+function baseline_is_exact(chord,ts) {
+    if(chord.length < 4) return true;
+    var matrix = coefficientHelper(chord,ts)[0],
+        top = matrix[0], other = matrix[1];
+    if(Math.abs(other[0]) > Math.abs(top[0])) {
+        top = matrix[1];
+        other = matrix[0];
+    }
+    var reduced = other[1] - other[0]/top[0]*top[1];
+    return !(Math.abs(reduced) > Math.abs(top[1]));
+}
+
+module.exports = { leastSquaresFit, baseline_is_exact };
@@ -0,0 +1,40 @@
+// Times the calligraphy curve fit against the baseline one on the kanji fixture:
+//   node tests/bench_caligrapher.js [rounds]
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+const baseline = require('./baseline_fit.js');
+const strokes = require('./fixtures/kanji_strokes.json');
+
+const rounds = +process.argv[2] || 50;
+const source = fs.readFileSync(path.join(__dirname, '../AnkiDraw/Caligrapher.js'), 'utf8');
+
+function load(fit) {
+    var context = vm.createContext({ Math, console });
+    vm.runInContext(source, context);
+    // fitStroke looks leastSquaresFit up as a global, so the baseline one can stand in for it
+    if (fit) context.leastSquaresFit = (chord, ts) => new context.Bezier(fit(chord, ts));
+    return context;
+}
+
+function time(run) {
+    run(); // warm up
+    var start = process.hrtime.bigint();
+    for (var i = 0; i < rounds; i++) run();
+    return Number(process.hrtime.bigint() - start) / 1e6 / rounds;
+}
+
+var current = load(), old = load(baseline.leastSquaresFit);
+var chords = strokes.flatMap(stroke => current.splitChord(stroke, current.detectCorners(stroke)))
+    .map(chord => ({ chord, ts: current.parameterize(chord) }));
+var solved = chords.filter(({ chord }) => chord.length >= 4); // shorter ones become straight curves
+var differing = chords.filter(({ chord, ts }) => !baseline.baseline_is_exact(chord, ts)).length;
+
+console.log(`${strokes.length} strokes, ${chords.length} chords (${solved.length} of 4+ points), ` +
+    `${differing} where the baseline fit is off, ms per round of ${rounds}`);
+[['leastSquaresFit', context => () => chords.forEach(({ chord, ts }) => context.leastSquaresFit(chord, ts))],
+    ['  on 4+ points', context => () => solved.forEach(({ chord, ts }) => context.leastSquaresFit(chord, ts))],
+    ['fitStroke', context => () => strokes.forEach(stroke => context.fitStroke(stroke))]].forEach(([name, job]) => {
+    var before = time(job(old)), after = time(job(current));
+    console.log(`${name.padEnd(16)} baseline ${before.toFixed(3).padStart(8)}  now ${after.toFixed(3).padStart(8)}  ${(before / after).toFixed(1)}x`);
+});
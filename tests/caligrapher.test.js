@@ -0,0 +1,113 @@
+// Checks the closed form curve fit in Caligrapher.js against the fit it replaced,
+// run with: node --test tests/
+const test = require('node:test');
+const assert = require('node:assert');
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+const baseline = require('./baseline_fit.js');
+const strokes = require('./fixtures/kanji_strokes.json');
+
+const calligrapher = vm.createContext({ Math, console });
+vm.runInContext(fs.readFileSync(path.join(__dirname, '../AnkiDraw/Caligrapher.js'), 'utf8'), calligrapher);
+const { leastSquaresFit, parameterize, fitStroke, splitChord, detectCorners } = calligrapher;
+
+// The chords fitStroke fits a stroke as, with their parameters
+function chordsOf(stroke) {
+    return splitChord(stroke, detectCorners(stroke)).map(chord => ({ chord, ts: parameterize(chord) }));
+}
+
+function pointOn(controlPoints, t) {
+    var u = 1 - t;
+    return [0, 1].map(axis => u * u * u * controlPoints[0][axis] + 3 * t * u * u * controlPoints[1][axis] +
+        3 * t * t * u * controlPoints[2][axis] + t * t * t * controlPoints[3][axis]);
+}
+
+function squaredError(chord, ts, controlPoints) {
+    return chord.reduce((sum, point, i) => {
+        var fitted = pointOn(controlPoints, ts[i]);
+        return sum + (fitted[0] - point[0]) ** 2 + (fitted[1] - point[1]) ** 2;
+    }, 0);
+}
+
+function maxDifference(a, b) {
+    return Math.max(...a.map((point, i) => Math.max(Math.abs(point[0] - b[i][0]), Math.abs(point[1] - b[i][1]))));
+}
+
+function assertClose(actual, expected, tolerance) {
+    assert.strictEqual(actual.length, expected.length);
+    assert.ok(maxDifference(actual, expected) < tolerance, `${JSON.stringify(actual)} instead of ${JSON.stringify(expected)}`);
+}
+
+test('matches the baseline fit on every kanji fixture chord it solves exactly', () => {
+    var compared = 0;
+    strokes.forEach(stroke => chordsOf(stroke).forEach(({ chord, ts }) => {
+        if (!baseline.baseline_is_exact(chord, ts)) return;
+        assertClose(leastSquaresFit(chord, ts).controlPoints, baseline.leastSquaresFit(chord, ts), 1e-9);
+        compared++;
+    }));
+    assert.ok(compared > 100);
+});
+
+// The baseline's back substitution gets the second inner control point wrong when
+// det > a00 * a01, i.e. when the points bunch up near both ends of the chord. There
+// the new fit is expected to differ, and to be the actual least squares solution.
+test('fits better than the baseline where its back substitution fails', () => {
+    var fixture = strokes.flatMap(chordsOf).filter(({ chord, ts }) => !baseline.baseline_is_exact(chord, ts));
+    var arches = [[[0, 0], [1, 1], [99, 1], [100, 0]], [[0, 0], [10, 20], [90, 20], [100, 0]]]
+        .map(chord => ({ chord, ts: parameterize(chord) }));
+    assert.ok(fixture.length > 0, 'the fixture strokes cover the case');
+    fixture.concat(arches).forEach(({ chord, ts }) => {
+        assert.ok(!baseline.baseline_is_exact(chord, ts));
+        var fitted = leastSquaresFit(chord, ts).controlPoints,
+            old = baseline.leastSquaresFit(chord, ts);
+        assert.ok(squaredError(chord, ts, fitted) < squaredError(chord, ts, old));
+        // a least squares solution doesn't get better when an inner control point moves
+        [1, 2].forEach(index => [[0, 0.01], [0, -0.01], [0.01, 0], [-0.01, 0]].forEach(step => {
+            var moved = fitted.map(point => point.slice());
+            moved[index][0] += step[0];
+            moved[index][1] += step[1];
+            assert.ok(squaredError(chord, ts, moved) >= squaredError(chord, ts, fitted));
+        }));
+    });
+    // four points are fitted exactly
+    arches.forEach(({ chord, ts }) => assert.ok(squaredError(chord, ts, leastSquaresFit(chord, ts).controlPoints) < 1e-20));
+});
+
+test('fitStroke fits the same chords, ends on the stroke', () => {
+    strokes.forEach(stroke => {
+        var curves = fitStroke(stroke), chords = chordsOf(stroke);
+        assert.strictEqual(curves.length, chords.length);
+        curves.forEach((curve, i) => assertClose(curve.controlPoints, leastSquaresFit(chords[i].chord, chords[i].ts).controlPoints, 1e-12));
+        assertClose([curves[0].controlPoints[0]], [stroke[0]], 1e-12);
+        assertClose([curves[curves.length - 1].controlPoints[3]], [stroke[stroke.length - 1]], 1e-12);
+    });
+});
+
+test('recovers the control points of an exact cubic', () => {
+    const controlPoints = [[0, 0], [30, 80], [90, -40], [120, 10]];
+    const ts = [], chord = [];
+    for (let i = 0; i <= 30; i++) {
+        ts.push(i / 30);
+        chord.push(pointOn(controlPoints, i / 30));
+    }
+    assertClose(leastSquaresFit(chord, ts).controlPoints, controlPoints, 1e-9);
+});
+
+test('falls back to a straight curve when there is nothing to fit', () => {
+    const straight = [[0, 0], [25, 50], [75, 150], [100, 200]];
+    const short = [[0, 0], [40, 7], [100, 200]];
+    assertClose(leastSquaresFit(short, [0, 0.5, 1]).controlPoints, straight, 1e-12);
+    assertClose(baseline.leastSquaresFit(short, [0, 0.5, 1]), straight, 1e-12);
+    // all points at one parameter make the system singular, the baseline gave NaN or threw
+    const chord = [[0, 0], [10, 5], [60, 90], [70, 30], [100, 200]];
+    assertClose(leastSquaresFit(chord, [0.5, 0.5, 0.5, 0.5, 0.5]).controlPoints, straight, 1e-12);
+    assert.ok(Number.isNaN(baseline.leastSquaresFit(chord, [0.5, 0.5, 0.5, 0.5, 0.5])[1][0]));
+    assertClose(leastSquaresFit(chord, [0, 0, 0, 0, 0]).controlPoints, straight, 1e-12);
+    assert.throws(() => baseline.leastSquaresFit(chord, [0, 0, 0, 0, 0]), /singular/);
+    // a chord that never moves parameterizes to NaN
+    const still = [[5, 5], [5, 5], [5, 5], [5, 5], [5, 5]];
+    const curve = leastSquaresFit(still, parameterize(still));
+    assert.ok(curve.controlPoints.every(point => point.every(Number.isFinite)));
+    assert.ok(Number.isNaN(baseline.leastSquaresFit(still, parameterize(still))[1][0]));
+});
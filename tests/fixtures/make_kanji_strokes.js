@@ -0,0 +1,70 @@
+// Writes kanji_strokes.json, the pen samples the curve fit tests and benchmark run on:
+//   node tests/fixtures/make_kanji_strokes.js
+//
+// Each stroke follows the waypoints of a kanji stroke the way a pen does: it slows down
+// at both ends and at every bend (a minimum jerk profile per piece), is sampled at
+// 120 Hz with some timing jitter, and has a little hand tremor. The output is a list of
+// strokes, each a list of [x, y] samples in CSS pixels, as the calligraphy tool records
+// them. It is seeded, so it always writes the same file.
+const fs = require('fs');
+const path = require('path');
+
+// Waypoints in a 100 x 100 box, one list per stroke, in stroke order
+const KANJI = {
+    '永': [[[46, 6], [52, 14]], [[30, 24], [56, 22], [52, 30], [52, 88], [44, 82]], [[18, 42], [38, 40], [14, 68]],
+        [[78, 30], [60, 48]], [[56, 48], [70, 68], [90, 84]]],
+    '木': [[[10, 34], [90, 32]], [[50, 8], [50, 94]], [[48, 36], [30, 66], [10, 82]], [[52, 36], [72, 62], [92, 78]]],
+    '日': [[[24, 12], [24, 90]], [[24, 12], [76, 12], [76, 90]], [[26, 50], [74, 50]], [[26, 88], [74, 88]]],
+    '山': [[[50, 8], [50, 86]], [[16, 34], [16, 86], [84, 86]], [[84, 30], [84, 90]]],
+    '川': [[[22, 14], [22, 60], [12, 88]], [[50, 22], [50, 74]], [[80, 10], [80, 92]]],
+    '口': [[[20, 20], [20, 84]], [[20, 20], [80, 20], [80, 84]], [[22, 82], [78, 82]]],
+    '人': [[[50, 8], [46, 50], [34, 74], [10, 92]], [[48, 40], [66, 70], [92, 90]]],
+    '大': [[[10, 36], [90, 34]], [[50, 8], [48, 46], [32, 74], [10, 92]], [[52, 46], [70, 72], [92, 90]]],
+    '水': [[[50, 6], [50, 90], [42, 84]], [[16, 34], [38, 32], [14, 72]], [[80, 22], [58, 46]], [[54, 44], [70, 70], [92, 88]]],
+    '心': [[[24, 36], [30, 48]], [[34, 24], [32, 78], [40, 88], [76, 88], [80, 76]], [[50, 22], [58, 34]], [[74, 30], [88, 52]]],
+};
+const SAMPLE_MS = 1000 / 120;
+const PEN_SPEED = 0.6; // px per ms at full speed
+
+var seed = 20261018;
+function random() { // mulberry32
+    seed = (seed + 0x6D2B79F5) | 0;
+    var t = Math.imul(seed ^ (seed >>> 15), 1 | seed);
+    t = (t + Math.imul(t ^ (t >>> 7), 61 | t)) ^ t;
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+}
+
+function tremor() {
+    return (random() + random() + random() - 1.5) * 0.4;
+}
+
+// Pen position at time ms along the pieces between the waypoints
+function write_stroke(waypoints) {
+    var pieces = [], start = 0;
+    for (var i = 1; i < waypoints.length; i++) {
+        var a = waypoints[i - 1], b = waypoints[i],
+            duration = 60 + Math.hypot(b[0] - a[0], b[1] - a[1]) / PEN_SPEED * 1.875;
+        pieces.push({ a, b, start, duration });
+        start += duration;
+    }
+    var samples = [];
+    for (var time = 0; time <= start; time += SAMPLE_MS * (0.8 + random() * 0.4)) {
+        var piece = pieces.find(p => time <= p.start + p.duration) || pieces[pieces.length - 1],
+            tau = Math.min((time - piece.start) / piece.duration, 1),
+            s = tau * tau * tau * (10 - 15 * tau + 6 * tau * tau);
+        samples.push([piece.a[0] + (piece.b[0] - piece.a[0]) * s + tremor(),
+            piece.a[1] + (piece.b[1] - piece.a[1]) * s + tremor()]);
+    }
+    return samples;
+}
+
+var strokes = [];
+[140, 220].forEach((size, row) => Object.keys(KANJI).forEach((kanji, column) => {
+    var left = 20 + column * (size + 20), top = 20 + row * 260;
+    KANJI[kanji].forEach(stroke => {
+        var waypoints = stroke.map(p => [left + p[0] * size / 100, top + p[1] * size / 100]);
+        strokes.push(write_stroke(waypoints).map(p => [Math.round(p[0] * 100) / 100, Math.round(p[1] * 100) / 100]));
+    });
+}));
+fs.writeFileSync(path.join(__dirname, 'kanji_strokes.json'), '[\n' + strokes.map(s => JSON.stringify(s)).join(',\n') + '\n]\n');
+console.log(strokes.length + ' strokes, ' + strokes.reduce((n, s) => n + s.length, 0) + ' samples');
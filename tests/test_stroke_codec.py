@@ -0,0 +1,161 @@
+"""
+Tests for stroke_codec.py, and that StrokeCodec.js writes the same bytes.
+"""
+
+import json
+import shutil
+import struct
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ADDON = Path(__file__).resolve().parents[1] / "AnkiDraw"
+sys.path.insert(0, str(ADDON))  # the package itself needs Anki, the codec doesn't
+
+import stroke_codec  # noqa: E402
+
+
+def f32(value):
+    """
+    Round a number the way the Float32Array of a PointBuffer stores it.
+    """
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+
+def line(kind, points, width=3, pressure=True):
+    return {
+        "type": kind,
+        "color": "rgba(20, 120, 255, 0.8)",
+        "width": width,
+        "opacity": 0.8,
+        "points": [[f32(x), f32(y), f32(p) if pressure else stroke_codec.NO_PRESSURE, width] for x, y, p in points],
+    }
+
+
+def drawing():
+    return [
+        line("L", [(10.5, 20.25, 0.3), (12.125, 19.875, 0.55), (9, 25.5, 1)], width=2.5),
+        line("P", [(100, 100, 0), (90.375, 80.625, 0), (95, 120, 0)], pressure=False),
+        {
+            "type": "C",
+            "color": "rgba(0, 0, 0, 1)",
+            "width": 4,
+            "opacity": 1,
+            "points": [[f32(x), f32(y)] for x, y in ((5, 5), (6.5, 7.25), (30, 2))],
+        },
+        {
+            "type": "T",
+            "color": "rgba(255, 0, 0, 0.5)",
+            "width": 1,
+            "opacity": 0.5,
+            "x": 40.125,
+            "y": -3.5,
+            "fontSize": 24,
+            "fontFamily": "Noto Sans",
+            "text": "naïve 日本 ✓",
+            "fontBold": True,
+            "fontItalic": False,
+        },
+    ]
+
+
+def assert_same_drawing(decoded, actions):
+    assert len(decoded) == len(actions)
+    for got, action in zip(decoded, actions):
+        assert got["type"] == action["type"]
+        assert got["opacity"] == pytest.approx(action["opacity"], abs=0.005)
+        assert got["width"] == pytest.approx(action["width"], abs=0.005)
+        if action["type"] == "T":
+            assert got["x"] == pytest.approx(action["x"], abs=1 / 16)
+            assert got["y"] == pytest.approx(action["y"], abs=1 / 16)
+            for key in ("fontSize", "fontFamily", "text", "fontBold", "fontItalic"):
+                assert got[key] == action[key]
+            continue
+        assert len(got["points"]) == len(action["points"])
+        for point, expected in zip(got["points"], action["points"]):
+            assert point[0] == pytest.approx(expected[0], abs=1 / 16)
+            assert point[1] == pytest.approx(expected[1], abs=1 / 16)
+            if action["type"] == "C":
+                assert len(point) == 2
+            else:
+                assert point[2] == pytest.approx(expected[2], abs=1 / 255)
+
+
+def test_round_trip_of_every_action_type():
+    actions = drawing()
+    decoded = stroke_codec.decode(stroke_codec.encode(actions))
+    assert_same_drawing(decoded, actions)
+    assert decoded[0]["color"] == "rgba(20, 120, 255, 0.8)"
+    assert decoded[1]["points"][0][2] == stroke_codec.NO_PRESSURE
+    assert decoded[3]["fontBold"] and not decoded[3]["fontItalic"]
+
+
+def test_encoding_is_stable():
+    data = stroke_codec.encode(drawing())
+    assert stroke_codec.encode(stroke_codec.decode(data)) == data
+
+
+def test_negative_and_large_deltas():
+    points = [(0, 0, 0.5), (-0.125, -3000.5, 0.5), (5000.875, 12, 0.5), (-1e5, 1e5, 0.5), (-1e5, 1e5, 0.5)]
+    actions = [line("L", points)]
+    data = stroke_codec.encode(actions)
+    assert_same_drawing(stroke_codec.decode(data), actions)
+    # steps of 1/8 px stay exact
+    assert [point[:2] for point in stroke_codec.decode(data)[0]["points"]] == [[x, y] for x, y, _ in points]
+
+
+@pytest.mark.parametrize("value", [0, -1, 1, -2, 63, -64, 64, 8191, -8192, 2 ** 40, -(2 ** 40)])
+def test_zigzag_round_trip(value):
+    out = bytearray()
+    stroke_codec._zigzag(out, value)
+    assert stroke_codec._Reader(bytes(out)).zigzag() == value
+
+
+def test_empty_drawing():
+    data = stroke_codec.encode([])
+    assert data == b"AD\x01\x00"
+    assert stroke_codec.decode(data) == []
+
+
+def test_truncated_drawing_raises():
+    data = stroke_codec.encode(drawing())
+    for end in range(len(data)):
+        with pytest.raises(ValueError):
+            stroke_codec.decode(data[:end])
+
+
+@pytest.mark.parametrize("data", [b"", b"XD\x01\x00", b"AD\x02\x00", b"AD\x01\x05", b"AD\x01\x01\x00\x00\x00\x00\x64\xff"])
+def test_corrupt_drawing_raises(data):
+    with pytest.raises(ValueError):
+        stroke_codec.decode(data)
+
+
+def test_unknown_action_type_raises():
+    with pytest.raises(ValueError):
+        stroke_codec.encode([dict(line("L", [(0, 0, 0.5)]), type="X")])
+
+
+ENCODE_IN_JS = """
+const fs = require('fs'), vm = require('vm');
+const page = vm.createContext({ Math, Float32Array, Uint8Array, Array, TextEncoder, TextDecoder, Map, Set, console });
+for (const name of ['Renderer.js', 'StrokeCodec.js'])
+    vm.runInContext(fs.readFileSync(process.argv[1] + '/' + name, 'utf8'), page, { filename: name });
+const actions = JSON.parse(fs.readFileSync(0, 'utf8'));
+actions.forEach(action => { if (action.points) action.points = page.PointBuffer.from(action.points, action.type == 'C' ? 2 : 4); });
+const bytes = page.encode_drawing(actions);
+const again = page.encode_drawing(page.decode_drawing(bytes));
+process.stdout.write(JSON.stringify([Buffer.from(bytes).toString('hex'), Buffer.from(again).toString('hex')]));
+"""
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node to run StrokeCodec.js")
+def test_javascript_writes_the_same_bytes():
+    actions = drawing() + [line("L", [(0, 0, 0.5), (-0.125, -3000.5, 0.25), (5000.875, 12, 0.75)])]
+    result = subprocess.run(["node", "-e", ENCODE_IN_JS, str(ADDON)], input=json.dumps(actions),
+                            capture_output=True, text=True, check=True)
+    js, js_again = (bytes.fromhex(data) for data in json.loads(result.stdout))
+    assert js == stroke_codec.encode(actions)
+    assert js_again == js
+    assert stroke_codec.encode(stroke_codec.decode(js)) == js